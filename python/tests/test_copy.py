@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from vtool import util_file
+
+
+def _write(filepath, data):
+    with open(filepath, 'wb') as open_file:
+        open_file.write(data)
+
+
+def _read(filepath):
+    with open(filepath, 'rb') as open_file:
+        return open_file.read()
+
+
+def test_copy_when_kernel_copies_return_zero(tmpdir, monkeypatch):
+    source = str(tmpdir.join('source.bin'))
+    destination = str(tmpdir.join('destination.bin'))
+
+    data = os.urandom(300000)
+    _write(source, data)
+
+    # like procfs or some network mounts, that return 0 without copying.
+    monkeypatch.setattr(os, 'copy_file_range', lambda *args: 0, raising=False)
+    monkeypatch.setattr(os, 'sendfile', lambda *args: 0, raising=False)
+
+    assert util_file.copy_file_contents(source, destination) == len(data)
+    assert _read(destination) == data
+
+
+def test_short_copy_is_an_error(tmpdir, monkeypatch):
+    source_folder = tmpdir.mkdir('source')
+    _write(str(source_folder.join('a.bin')), b'x' * 1000)
+
+    monkeypatch.setattr(util_file, 'copy_file_contents', lambda source, destination, size=None: 0)
+
+    copy_plan = util_file.CopyPlan()
+    copy_plan.add_folder(str(source_folder), str(tmpdir.join('destination')))
+    stats = copy_plan.run()
+
+    assert stats['errors'] == 1
+    assert stats['files'] == 0
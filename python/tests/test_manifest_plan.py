@@ -0,0 +1,33 @@
+from vtool.process_manager import process
+
+
+def test_disabled_script_disables_scripts_below_a_missing_folder():
+    scripts = ['a.py', 'a/b/c.py', 'a/b/c/d.py', 'e.py']
+    states = [False, True, True, True]
+
+    plan = process.ManifestPlan(scripts, states)
+
+    assert plan.get_entry('a/b/c').parent is plan.get_entry('a')
+    assert not plan.is_enabled('a/b/c')
+    assert not plan.is_enabled('a/b/c/d')
+    assert plan.is_enabled('e')
+
+
+def test_parent_listed_after_its_child():
+    scripts = ['a/b/c.py', 'a.py']
+    states = [True, False]
+
+    plan = process.ManifestPlan(scripts, states)
+
+    assert not plan.is_enabled('a/b/c')
+
+
+def test_enabled_parent_above_a_missing_folder():
+    scripts = ['a.py', 'a/b/c.py', 'x/y.py']
+    states = [True, True, True]
+
+    plan = process.ManifestPlan(scripts, states)
+
+    assert plan.is_enabled('a/b/c')
+    assert plan.get_entry('x/y').parent is None
+    assert plan.is_enabled('x/y')
@@ -0,0 +1,64 @@
+import os
+
+from vtool.process_manager import process_index
+
+
+def setup_function(function):
+    process_index.ProcessIndex.clear()
+
+
+def teardown_function(function):
+    process_index.ProcessIndex.clear()
+
+
+def _make_tree(root):
+    for path in ['a/b/c/.code', 'a/b/d', 'a/bb/e', 'a/x', 'f/g']:
+        os.makedirs(os.path.join(root, path))
+
+
+def _get_index(root):
+    index = process_index.ProcessIndex(root)
+    index.build()
+    process_index.ProcessIndex.indexes[index.root] = index
+    return index
+
+
+def test_invalidate_drops_the_subtree_and_the_parent(tmpdir, monkeypatch):
+    monkeypatch.setattr(process_index.ProcessIndex, 'save', lambda self: None)
+
+    root = str(tmpdir)
+    _make_tree(root)
+
+    index = _get_index(root)
+    root = index.root
+
+    before = set(index.nodes)
+
+    process_index.ProcessIndex.invalidate(root + '/a/b')
+
+    dropped = set([root + '/a', root + '/a/b', root + '/a/b/c', root + '/a/b/d'])
+
+    assert set(index.nodes) == before - dropped
+    assert root + '/a/bb' in index.nodes
+
+
+def test_invalidate_under_a_dropped_folder(tmpdir, monkeypatch):
+    monkeypatch.setattr(process_index.ProcessIndex, 'save', lambda self: None)
+
+    root = str(tmpdir)
+    _make_tree(root)
+
+    index = _get_index(root)
+    root = index.root
+
+    process_index.ProcessIndex.invalidate(root + '/a/b')
+
+    # a isn't in the index anymore, the folders still under it are dropped with it.
+    process_index.ProcessIndex.invalidate(root + '/a')
+
+    assert not [path for path in index.nodes if path == root + '/a' or path.startswith(root + '/a/')]
+    assert root + '/f/g' in index.nodes
+
+    found, found_non = index.find_processes(root + '/a/b', True)
+    assert found == ['c']
+    assert found_non == ['d']
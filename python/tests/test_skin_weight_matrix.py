@@ -0,0 +1,143 @@
+from vtool import data
+
+
+class _MockSkin(object):
+    """
+    Influence indices on the skin cluster, not in the order of the influence list, like after influences were removed.
+    """
+
+    def __init__(self, influence_indices):
+        self.influence_indices = influence_indices
+
+    def get_influence_index(self, influence):
+        return self.influence_indices.get(influence)
+
+
+class _MockProgressBar(object):
+
+    def __init__(self, *args):
+        pass
+
+    def status(self, message):
+        pass
+
+    def inc(self):
+        pass
+
+    def end(self):
+        pass
+
+    def break_signaled(self):
+        return False
+
+
+class _MockCmds(object):
+
+    def __init__(self):
+        self.values = {}
+
+    def setAttr(self, attribute, value):
+        self.values[attribute] = value
+
+
+class _MockDeform(object):
+
+    def __init__(self, influence_indices):
+        self.influence_indices = influence_indices
+
+    def get_skin_influences(self, skin_cluster, return_dict=False):
+        return dict(self.influence_indices)
+
+
+class _MockMayaLib(object):
+
+    def __init__(self, influence_indices):
+        self.deform = _MockDeform(influence_indices)
+        self.core = self
+
+    ProgressBar = _MockProgressBar
+
+
+def _get_influence_dict():
+    return {'joint_a': {'weights': [1.0, 0, 0, 0.25, 0]},
+            'joint_b': {'weights': [0, 1.0, 0, 0.75, 0]},
+            'joint_c': {'weights': [0, 0, 0.5, 0, 1.0]},
+            'joint_gone': {'weights': [0, 0, 0.5, 0, 0]}}
+
+
+def _get_per_attribute_weights(monkeypatch, influences, influence_dict, influence_indices):
+    """
+    The weights the per attribute fallback sets, as {(vertex, influence index): weight}.
+    """
+
+    cmds = _MockCmds()
+
+    monkeypatch.setattr(data, 'cmds', cmds, raising=False)
+    monkeypatch.setattr(data, 'maya_lib', _MockMayaLib(influence_indices), raising=False)
+
+    skin_data = object.__new__(data.SkinWeightData)
+    assert skin_data._set_skin_weights_per_attribute('skin', influences, influence_dict, 'mesh')
+
+    weights = {}
+
+    for attribute, value in cmds.values.items():
+        vertex = int(attribute.split('weightList[')[1].split(']')[0])
+        index = int(attribute.split('weights[')[1].split(']')[0])
+        weights[(vertex, index)] = value
+
+    return weights
+
+
+def _get_matrix_weights(weights, influence_indices, vertex_count):
+    found = {}
+
+    influence_count = len(influence_indices)
+
+    for vertex in range(vertex_count):
+        for inc, index in enumerate(influence_indices):
+            weight = weights[vertex * influence_count + inc]
+            if weight:
+                found[(vertex, index)] = weight
+
+    return found
+
+
+def test_matrix_matches_per_attribute_weights(monkeypatch):
+    # joint_gone isn't in the scene, so it isn't on the skin cluster.
+    influence_indices = {'joint_a': 3, 'joint_b': 0, 'joint_c': 7}
+
+    influences = ['joint_a', 'joint_b', 'joint_c', 'joint_gone']
+    influence_dict = _get_influence_dict()
+
+    weights, indices, vertex_count = data.get_skin_weight_matrix(_MockSkin(influence_indices), influences,
+                                                                 influence_dict)
+
+    assert indices == [3, 0, 7]
+    assert vertex_count == 5
+    assert len(weights) == vertex_count * len(indices)
+
+    # vertex major, all influences of vertex 3 together.
+    assert weights[9:12] == [0.25, 0.75, 0.0]
+
+    expected = _get_per_attribute_weights(monkeypatch, influences, influence_dict, influence_indices)
+
+    assert _get_matrix_weights(weights, indices, vertex_count) == expected
+
+
+def test_influence_without_weights_is_skipped():
+    influence_indices = {'joint_a': 1, 'joint_b': 0}
+
+    influence_dict = _get_influence_dict()
+    influence_dict['joint_b'] = {}
+
+    weights, indices, vertex_count = data.get_skin_weight_matrix(_MockSkin(influence_indices),
+                                                                 ['joint_a', 'joint_b', 'joint_missing'],
+                                                                 influence_dict)
+
+    assert indices == [1]
+    assert weights == [1.0, 0.0, 0.0, 0.25, 0.0]
+    assert vertex_count == 5
+
+
+def test_no_influences_on_the_skin():
+    assert data.get_skin_weight_matrix(_MockSkin({}), ['joint_a'], _get_influence_dict()) == ([], [], 0)
@@ -0,0 +1,50 @@
+import os
+
+from vtool import util_file
+
+
+module_text = 'class A(object):\n    pass\n\n\ndef g(a, b=2):\n    pass\n'
+
+
+def _write_module(tmpdir, text):
+    filepath = str(tmpdir.join('module.py'))
+
+    with open(filepath, 'w') as open_file:
+        open_file.write(text)
+
+    return filepath
+
+
+def setup_function(function):
+    util_file.SymbolIndex.clear()
+
+
+def test_complete_right_after_save(tmpdir):
+    filepath = _write_module(tmpdir, module_text)
+
+    expected = util_file.get_defined(filepath)
+
+    assert util_file.SymbolIndex.get_defined(filepath, wait=5) == expected
+
+    for inc in range(3):
+        assert util_file.SymbolIndex.get_defined(filepath, wait=0) == expected
+
+    stats = util_file.SymbolIndex.get_stats()
+
+    assert stats['misses'] == 1
+    assert stats['hits'] == 3
+
+
+def test_change_within_mtime_is_parsed_again(tmpdir):
+    filepath = _write_module(tmpdir, module_text)
+
+    util_file.SymbolIndex.parse(filepath)
+
+    file_stat = os.stat(filepath)
+
+    # same size and mtime, only the text tells them apart.
+    _write_module(tmpdir, module_text.replace('class A', 'class B'))
+    os.utime(filepath, (file_stat.st_atime, file_stat.st_mtime))
+
+    assert util_file.SymbolIndex.get_defined(filepath, wait=5) == util_file.get_defined(filepath)
+    assert util_file.get_defined(filepath)[0].startswith('B')
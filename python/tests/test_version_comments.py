@@ -0,0 +1,46 @@
+from vtool import util_file
+
+
+legacy_log = '\n'.join(['version = 1; comment = "first"; user = "anna"',
+                        'version = 2; comment = "two lines',
+                        'of comment"; user = "ben"',
+                        'not a comment record',
+                        'version = 3; comment = "third"; user = "anna"'])
+
+
+def _write_log(tmpdir):
+    filepath = str(tmpdir.join('comments.txt'))
+
+    with open(filepath, 'w') as open_file:
+        open_file.write(legacy_log)
+
+    return filepath
+
+
+def test_read_multi_line_legacy_comment(tmpdir):
+    comments = util_file.VersionComments(_write_log(tmpdir))
+
+    assert comments.get(1) == ('first', 'anna')
+    assert comments.get(2) == ('two lines\nof comment', 'ben')
+    assert comments.get(3) == ('third', 'anna')
+
+
+def test_add_migrates_without_losing_lines(tmpdir):
+    filepath = _write_log(tmpdir)
+
+    util_file.VersionComments(filepath).add(4, 'fourth', 'cleo')
+
+    comments = util_file.VersionComments(filepath).read()
+
+    assert comments == {1: ('first', 'anna'),
+                        2: ('two lines\nof comment', 'ben'),
+                        3: ('third', 'anna'),
+                        4: ('fourth', 'cleo')}
+
+    with open(filepath) as open_file:
+        lines = open_file.read().splitlines()
+
+    assert 'not a comment record' in lines
+    assert not [line for line in lines if line.startswith('version =')]
+
+    assert not util_file.VersionComments(filepath).migrate()
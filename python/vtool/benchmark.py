@@ -0,0 +1,778 @@
+# Copyright (C) 2022 Louis Vottero louis.vot@gmail.com    All rights reserved.
+
+"""
+Micro benchmarks for Vetala internals. These run outside of Maya.
+
+Usage:
+    python -m vtool.benchmark sort
+    python -m vtool.benchmark versions
+    python -m vtool.benchmark manifest
+    python -m vtool.benchmark processes
+    python -m vtool.benchmark copy
+    python -m vtool.benchmark settings
+    python -m vtool.benchmark settings_reads
+    python -m vtool.benchmark code_files
+    python -m vtool.benchmark symbols
+    python -m vtool.benchmark outline
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+import sys
+import time
+import random
+import os
+import shutil
+import tempfile
+import subprocess
+
+from . import util
+from . import util_file
+
+
+def time_function(function, repeat=3):
+    """
+    Run function repeat times.
+
+    Returns:
+        float: The fastest run in seconds.
+    """
+
+    best = None
+
+    for _ in range(repeat):
+        start = time.time()
+        function()
+        seconds = time.time() - start
+
+        if best is None or seconds < best:
+            best = seconds
+
+    return best
+
+
+def show_results(title, columns, rows):
+    util.show(title)
+    util.show('\t'.join(columns))
+
+    for row in rows:
+        util.show('\t'.join([str(value) for value in row]))
+
+
+class _RecursiveQuickSort(object):
+    """
+    The list copying quick sort util.QuickSort used before it moved to the builtin sort. Kept to benchmark against.
+    """
+
+    def __init__(self, list_of_numbers):
+        self.list_of_numbers = list_of_numbers
+        self.follower_list = []
+
+    def _sort(self, list_of_numbers, follower_list):
+
+        count = len(list_of_numbers)
+
+        if count <= 1:
+            return list_of_numbers, follower_list
+
+        pivot = list_of_numbers[0]
+
+        less, equal, greater = [], [], []
+        less_follow, equal_follow, greater_follow = [], [], []
+
+        for inc in range(0, count):
+            value = list_of_numbers[inc]
+            follower_value = follower_list[inc]
+
+            if value < pivot:
+                less.append(value)
+                less_follow.append(follower_value)
+            elif value == pivot:
+                equal.append(value)
+                equal_follow.append(follower_value)
+            else:
+                greater.append(value)
+                greater_follow.append(follower_value)
+
+        less, less_follow = self._sort(less, less_follow)
+        greater, greater_follow = self._sort(greater, greater_follow)
+
+        return less + equal + greater, less_follow + equal_follow + greater_follow
+
+    def set_follower_list(self, list_of_anything):
+        self.follower_list = list_of_anything
+
+    def run(self):
+        return self._sort(self.list_of_numbers, self.follower_list)
+
+
+def sort(sizes=(10000, 100000, 1000000), repeat=3):
+    """
+    Compare the old recursive quick sort with util.QuickSort on random and already sorted input, with a follower list.
+
+    Returns:
+        list: Rows of [input, size, old seconds, new seconds]. Old seconds is None when it hit the recursion limit.
+    """
+
+    rows = []
+
+    for size in sizes:
+        random_numbers = [random.randint(0, size) for _ in range(size)]
+        sorted_numbers = list(range(size))
+        followers = ['version.%s' % inc for inc in range(size)]
+
+        for name, numbers in (('random', random_numbers), ('sorted', sorted_numbers)):
+
+            def run_old():
+                quick_sort = _RecursiveQuickSort(numbers)
+                quick_sort.set_follower_list(followers)
+                quick_sort.run()
+
+            def run_new():
+                quick_sort = util.QuickSort(numbers)
+                quick_sort.set_follower_list(followers)
+                quick_sort.run()
+
+            try:
+                old_seconds = round(time_function(run_old, repeat), 4)
+            except RuntimeError:
+                # RecursionError is a RuntimeError
+                old_seconds = None
+
+            new_seconds = round(time_function(run_new, repeat), 4)
+
+            rows.append([name, size, old_seconds, new_seconds])
+
+    show_results('Sort benchmark (seconds, best of %s)' % repeat, ['input', 'size', 'old', 'new'], rows)
+
+    return rows
+
+
+def _write_weight_files(folder, file_count, file_kb):
+    """
+    Fake skin weight data, ascii floats like the .weights files.
+    """
+
+    line_count = file_kb * 1024 // 20
+
+    for inc in range(file_count):
+        lines = ['%.10f' % random.random() for _ in range(line_count)]
+
+        with open(os.path.join(folder, 'joint_%s.weights' % inc), 'w') as open_file:
+            open_file.write('\n'.join(lines))
+
+
+def versions(file_count=50, file_kb=256, version_count=3, changed_files=2):
+    """
+    Compare version folders saved as plain copies, to the deduplicated store and as compressed archives.
+    Each mode saves version_count versions of a folder, changing changed_files files between saves,
+    then checks out the first version.
+
+    Returns:
+        list: Rows of [mode, disk MB, seconds per save, seconds to check out]
+    """
+
+    modes = [('copy', False, None), ('store', True, None), ('deflate', False, 'deflate')]
+
+    if getattr(util_file.zipfile, 'ZIP_ZSTANDARD', None) is not None:
+        modes.append(('zstd', False, 'zstd'))
+
+    rows = []
+
+    for mode, deduplicate, compression in modes:
+
+        temp_folder = tempfile.mkdtemp()
+
+        try:
+            data_folder = os.path.join(temp_folder, 'skin')
+            os.makedirs(data_folder)
+
+            random.seed(0)
+            _write_weight_files(data_folder, file_count, file_kb)
+
+            save_seconds = 0
+
+            for inc in range(version_count):
+                if inc:
+                    for changed_inc in range(changed_files):
+                        path = os.path.join(data_folder, 'joint_%s.weights' % changed_inc)
+                        with open(path, 'a') as open_file:
+                            open_file.write('\n%s' % inc)
+
+                version_file = util_file.VersionFile(data_folder)
+                version_file.set_deduplicate(deduplicate)
+                version_file.set_compression(compression)
+
+                start = time.time()
+                version_file.save('benchmark')
+                save_seconds += time.time() - start
+
+            version_folder = os.path.join(temp_folder, '.version')
+            disk_size = util_file.get_folder_size(version_folder)
+
+            start = time.time()
+            util_file.VersionFile(temp_folder).get_version_path(1)
+            restore_seconds = time.time() - start
+
+            rows.append([mode, round(disk_size, 2), round(save_seconds / version_count, 4), round(restore_seconds, 4)])
+        finally:
+            shutil.rmtree(temp_folder, onerror=util_file.delete_read_only_error)
+
+    show_results('Version benchmark, %s files of %s KB, %s versions' % (file_count, file_kb, version_count),
+                 ['mode', 'disk MB', 'save', 'checkout'], rows)
+
+    return rows
+
+
+def _get_synthetic_manifest(entry_count, group_size=10, depth=3):
+    """
+    Nested script names like group_1.py, group_1/group_3.py, group_1/group_3/script_7.py with about one in ten scripts off.
+    """
+
+    scripts = []
+    states = []
+
+    def add(parent, level):
+        for inc in range(group_size):
+            if len(scripts) >= entry_count:
+                return
+
+            name = 'script_%s' % len(scripts)
+            if parent:
+                name = '%s/%s' % (parent, name)
+
+            scripts.append(name + '.py')
+            states.append(random.random() > 0.1)
+
+            if level < depth:
+                add(name, level + 1)
+
+    while len(scripts) < entry_count:
+        add(None, 1)
+
+    return scripts, states
+
+
+def _old_run_states(scripts, states):
+    """
+    The parent state check Process.run used before ManifestPlan.
+    """
+
+    state_dict = {}
+    runs = []
+
+    for inc in range(0, len(scripts)):
+        state = states[inc]
+        script = scripts[inc]
+
+        state_dict[util_file.remove_extension(script)] = state
+
+        if state:
+            parent_state = True
+
+            for key in state_dict:
+                if script.find(key) > -1:
+                    parent_state = state_dict[key]
+
+                    if parent_state == False:
+                        break
+
+            runs.append(parent_state)
+
+    return runs
+
+
+def manifest(sizes=(600, 2000, 10000), repeat=3):
+    """
+    Compare the old per script parent check in Process.run with making a ManifestPlan and walking it.
+
+    Returns:
+        list: Rows of [entries, old seconds, plan seconds]
+    """
+
+    from .process_manager import process
+
+    rows = []
+
+    for size in sizes:
+        random.seed(0)
+        scripts, states = _get_synthetic_manifest(size)
+
+        def run_old():
+            _old_run_states(scripts, states)
+
+        def run_new():
+            manifest_plan = process.ManifestPlan(scripts, states)
+            [entry.enabled for entry in manifest_plan.get_entries() if entry.state]
+
+        old_seconds = round(time_function(run_old, repeat), 4)
+        new_seconds = round(time_function(run_new, repeat), 4)
+
+        rows.append([size, old_seconds, new_seconds])
+
+    show_results('Manifest state benchmark (seconds, best of %s)' % repeat, ['entries', 'old', 'plan'], rows)
+
+    return rows
+
+
+def _old_find_processes(directory, return_also_non_process_list=False):
+    """
+    process.find_processes before it answered from the process index.
+    """
+
+    from .process_manager import process
+
+    found = []
+    found_non = []
+
+    for folder in os.listdir(directory):
+
+        if folder.startswith('.'):
+            continue
+
+        full_path = util_file.join_path(directory, folder)
+
+        if process.is_process(full_path):
+            found.append(folder)
+        elif return_also_non_process_list:
+            if process.is_interesting_folder(folder, directory):
+                found_non.append(folder)
+
+    return found, found_non
+
+
+def _make_process_tree(folder, folder_count, children=8):
+    """
+    Folders of processes, each with a few sub processes and .code and .data folders.
+    """
+
+    made = 0
+    stack = [folder]
+
+    while stack and made < folder_count:
+        parent = stack.pop(0)
+
+        for inc in range(children):
+            if made >= folder_count:
+                break
+
+            if inc % 3:
+                path = os.path.join(parent, 'process_%s' % inc)
+                os.makedirs(os.path.join(path, '.code', 'build'))
+                os.makedirs(os.path.join(path, '.data', 'skin'))
+            else:
+                path = os.path.join(parent, 'group_%s' % inc)
+                os.makedirs(path)
+
+            made += 1
+            stack.append(path)
+
+
+def processes(folder_count=5000, repeat=3, invalidate_count=1000):
+    """
+    Compare browsing a project tree the way the process view expands it, with the old find_processes
+    and with the process index, walked fresh and loaded from its saved file.
+
+    Returns:
+        list: Rows of [mode, seconds]
+    """
+
+    from .process_manager import process
+    from .process_manager import process_index
+
+    temp_folder = tempfile.mkdtemp()
+
+    def expand(find_function):
+        stack = [temp_folder]
+        while stack:
+            directory = stack.pop()
+            found, found_non = find_function(directory, True)
+            stack += [os.path.join(directory, name) for name in found + found_non]
+
+    def expand_indexed():
+        expand(process.find_processes)
+
+    def walk_index():
+        process_index.ProcessIndex.clear()
+        index = process_index.ProcessIndex(temp_folder)
+        index.build()
+        process_index.ProcessIndex.indexes[index.root] = index
+        expand_indexed()
+
+    def load_index():
+        process_index.ProcessIndex.clear()
+        expand_indexed()
+
+    def invalidate():
+        # like creating folders inside data folders, which drops nothing the process view uses from the index.
+        for inc in range(invalidate_count):
+            process_index.ProcessIndex.invalidate(os.path.join(process_paths[inc % len(process_paths)], '.data', 'skin', 'sub'))
+
+    try:
+        _make_process_tree(temp_folder, folder_count)
+
+        # let the folders age past the racy window, or the index lists them again every time.
+        time.sleep(util_file.ScanCache.racy_seconds)
+
+        process_paths = process_index.ProcessIndex.get(temp_folder).get_processes()
+
+        rows = [['old', round(time_function(lambda: expand(_old_find_processes), repeat), 4)],
+                ['walk index', round(time_function(walk_index, repeat), 4)],
+                ['load index', round(time_function(load_index, repeat), 4)],
+                ['indexed', round(time_function(expand_indexed, repeat), 4)],
+                ['%s invalidates' % invalidate_count, round(time_function(invalidate, repeat), 4)]]
+    finally:
+        process_index.ProcessIndex.clear()
+        shutil.rmtree(temp_folder, onerror=util_file.delete_read_only_error)
+
+    show_results('Process tree benchmark, %s folders (seconds, best of %s)' % (folder_count, repeat),
+                 ['mode', 'seconds'], rows)
+
+    return rows
+
+
+def _make_file_tree(folder, file_count, files_per_folder=100, max_kb=16):
+    random.seed(0)
+
+    for inc in range(file_count):
+        sub_folder = os.path.join(folder, 'group_%s' % (inc // (files_per_folder * 10)), 'folder_%s' % (inc // files_per_folder))
+
+        if not inc % files_per_folder:
+            os.makedirs(sub_folder)
+
+        with open(os.path.join(sub_folder, 'file_%s.weights' % inc), 'wb') as open_file:
+            open_file.write(os.urandom(random.randint(1, max_kb) * 1024))
+
+
+def copy(file_count=50000, repeat=1):
+    """
+    Compare copying a tree of small files with cp -r, shutil.copytree and util_file.copy_dir at 1 and 8 threads.
+
+    Returns:
+        list: Rows of [mode, seconds]
+    """
+
+    temp_folder = tempfile.mkdtemp()
+    source = os.path.join(temp_folder, 'source')
+
+    def clean(name):
+        path = os.path.join(temp_folder, name)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        return path
+
+    modes = []
+
+    if not util.is_windows():
+        modes.append(['cp -r', lambda: subprocess.check_call(['cp', '-r', source, clean('cp')])])
+
+    modes.append(['shutil.copytree', lambda: shutil.copytree(source, clean('copytree'))])
+
+    for threads in (1, 8):
+
+        def run_copy_dir(threads=threads):
+            util_file.CopyPlan.default_threads = threads
+            util_file.copy_dir(source, clean('copy_dir'))
+
+        modes.append(['copy_dir %s threads' % threads, run_copy_dir])
+
+    default_threads = util_file.CopyPlan.default_threads
+
+    rows = []
+
+    try:
+        os.makedirs(source)
+        _make_file_tree(source, file_count)
+
+        for mode, function in modes:
+            rows.append([mode, round(time_function(function, repeat), 4)])
+    finally:
+        util_file.CopyPlan.default_threads = default_threads
+        shutil.rmtree(temp_folder, onerror=util_file.delete_read_only_error)
+
+    show_results('Copy benchmark, %s files (seconds, best of %s)' % (file_count, repeat), ['mode', 'seconds'], rows)
+
+    return rows
+
+
+def settings(data_count=200, option_count=200):
+    """
+    Count the settings files written while a process gets data folders and options.
+
+    Returns:
+        list: Rows of [step, writes, skipped writes, seconds]
+    """
+
+    from . import data
+    from .process_manager import process
+
+    temp_folder = tempfile.mkdtemp()
+
+    process_inst = process.Process('settings_benchmark')
+    process_inst.set_directory(temp_folder)
+    process_inst.create()
+
+    def create_data():
+        for inc in range(data_count):
+            process_inst.create_data('data_%s' % inc, 'maya.ascii')
+
+    def set_sub_folders():
+        for inc in range(data_count):
+            data_folder = data.DataFolder('data_%s' % inc, process_inst.get_data_path())
+            data_folder.set_data_type('maya.ascii')
+            data_folder.set_sub_folder('sub')
+
+    def add_options():
+        for inc in range(option_count):
+            process_inst.add_option('option_%s' % inc, inc, 'group')
+
+    def add_options_batched():
+        with process_inst.batch_options():
+            process_inst.clear_options()
+            add_options()
+
+    rows = []
+
+    try:
+        for step, function in [['create data', create_data],
+                               ['sub folders', set_sub_folders],
+                               ['add options', add_options],
+                               ['add options again', add_options],
+                               ['add options batched', add_options_batched]]:
+
+            util_file.SettingsFile.clear_write_stats()
+            start = time.time()
+            function()
+            seconds = time.time() - start
+
+            stats = util_file.SettingsFile.get_write_stats()
+            rows.append([step, stats['writes'], stats['skipped_writes'], round(seconds, 4)])
+    finally:
+        shutil.rmtree(temp_folder, onerror=util_file.delete_read_only_error)
+
+    show_results('Settings benchmark, %s data folders, %s options' % (data_count, option_count),
+                 ['step', 'writes', 'skipped', 'seconds'], rows)
+
+    return rows
+
+
+def settings_reads(data_count=2000, repeat=3):
+    """
+    Compare reading the data type and sub folder of every data folder the way the data view refreshes,
+    with every file parsed again and with the shared settings cache.
+
+    Returns:
+        list: Rows of [mode, seconds, hits, misses]
+    """
+
+    from .process_manager import process
+
+    temp_folder = tempfile.mkdtemp()
+
+    process_inst = process.Process('settings_benchmark')
+    process_inst.set_directory(temp_folder)
+    process_inst.create()
+
+    names = ['data_%s' % inc for inc in range(data_count)]
+
+    def refresh():
+        for name in names:
+            process_inst.get_data_current_sub_folder_and_type(name)
+
+    def refresh_uncached():
+        util_file.SettingsCache.clear()
+        refresh()
+
+    rows = []
+
+    try:
+        for name in names:
+            process_inst.create_data(name, 'maya.ascii')
+
+        # let the files age past the racy window, or they are parsed again every time.
+        time.sleep(util_file.ScanCache.racy_seconds)
+
+        for mode, function in [['parsed', refresh_uncached], ['cached', refresh]]:
+            util_file.SettingsCache.clear()
+            refresh()
+
+            util_file.SettingsCache.hits = 0
+            util_file.SettingsCache.misses = 0
+
+            seconds = time_function(function, repeat)
+
+            stats = util_file.SettingsCache.get_stats()
+            rows.append([mode, round(seconds, 4), stats['hits'], stats['misses']])
+    finally:
+        util_file.SettingsCache.clear()
+        shutil.rmtree(temp_folder, onerror=util_file.delete_read_only_error)
+
+    show_results('Settings read benchmark, %s data folders (seconds, best of %s)' % (data_count, repeat),
+                 ['mode', 'seconds', 'hits', 'misses'], rows)
+
+    return rows
+
+
+def _old_get_type_instance(data_type):
+    """
+    The lookup DataManager did before the data type registry: instance every data class, then pick one.
+    """
+
+    from . import data
+
+    available_data = [data_class() for data_class in data.DataTypeRegistry.registered]
+
+    return next((instance for instance in available_data if instance.is_type_match(data_type)), None)
+
+
+def code_files(folder_count=200, repeat=3):
+    """
+    Compare listing the code files of a process whose code folders have no .py of their own,
+    looking up their data type the old way and with the registry.
+
+    Returns:
+        list: Rows of [mode, seconds]
+    """
+
+    from . import data
+    from .process_manager import process
+
+    temp_folder = tempfile.mkdtemp()
+
+    process_inst = process.Process('code_benchmark')
+    process_inst.set_directory(temp_folder)
+    process_inst.create()
+
+    get_instance = data.DataTypeRegistry.__dict__['get_instance']
+
+    def list_code_files():
+        files = process_inst.get_code_files()
+        assert len(files) >= folder_count
+
+    def list_code_files_old():
+        data.DataTypeRegistry.get_instance = staticmethod(_old_get_type_instance)
+        try:
+            list_code_files()
+        finally:
+            data.DataTypeRegistry.get_instance = get_instance
+
+    try:
+        for inc in range(folder_count):
+            data.DataFolder('manifest_%s' % inc, process_inst.get_code_path(), 'script.manifest')
+
+        rows = [['instance every type', round(time_function(list_code_files_old, repeat), 4)],
+                ['registry', round(time_function(list_code_files, repeat), 4)]]
+    finally:
+        shutil.rmtree(temp_folder, onerror=util_file.delete_read_only_error)
+
+    show_results('Code file listing benchmark, %s folders (seconds, best of %s)' % (folder_count, repeat),
+                 ['mode', 'seconds'], rows)
+
+    return rows
+
+
+def symbols(repeat=20):
+    """
+    Compare what a completion on a module of vtool.maya_lib costs, parsing the module every time
+    and looking it up in the symbol index. Also shows how long each module took to index.
+
+    Returns:
+        list: Rows of [module, lines, parse seconds, lookup seconds, index seconds]
+    """
+
+    folder = util_file.join_path(util_file.get_dirname(__file__), 'maya_lib')
+
+    modules = ['rigs.py', 'attr.py', 'core.py']
+
+    rows = []
+
+    util_file.SymbolIndex.clear()
+
+    for module in modules:
+        filepath = util_file.join_path(folder, module)
+
+        def parse():
+            util_file.get_defined(filepath)
+            util_file.get_ast_class_sub_functions(filepath, 'Rig')
+
+        def lookup():
+            util_file.SymbolIndex.get_defined(filepath, wait=10)
+            util_file.SymbolIndex.get_class_members(filepath, 'Rig', wait=10)
+
+        line_count = len(util_file.get_file_lines(filepath))
+
+        parse_seconds = time_function(parse, 3)
+
+        util_file.SymbolIndex.request(filepath)
+        lookup()
+
+        rows.append([module,
+                     line_count,
+                     round(parse_seconds, 4),
+                     round(time_function(lookup, repeat), 6),
+                     round(util_file.SymbolIndex.get_parse_seconds(filepath), 4)])
+
+    show_results('Completion symbol benchmark (seconds, best of %s)' % repeat,
+                 ['module', 'lines', 'parse', 'lookup', 'index'], rows)
+
+    return rows
+
+
+def outline(repeat=5):
+    """
+    Compare parsing the outline of maya_lib/rigs.py again after a one line edit
+    with updating it, for an edit in the smallest and in the biggest class.
+
+    Returns:
+        list: Rows of [edit, full parse seconds, update seconds, lines parsed by the update]
+    """
+
+    filepath = util_file.join_path(util_file.get_dirname(__file__), 'maya_lib/rigs.py')
+
+    lines = util_file.get_file_lines(filepath)
+
+    parse_python = util_file.ParsePython(filepath)
+
+    classes = [scope for scope in parse_python.main_scope.children if scope.scope_type == 'class']
+    classes.sort(key=lambda scope: scope.end_line - scope.start_line)
+
+    rows = []
+
+    for scope in [classes[0], classes[-1]]:
+
+        edit = 'class %s' % scope.name
+
+        edited_lines = list(lines)
+        edited_lines[scope.end_line - 1] += '  # edit'
+
+        original_text = '\n'.join(lines)
+        edited_text = '\n'.join(edited_lines)
+
+        def full():
+            util_file.ParsePython(text=edited_text)
+
+        def update():
+            parse_python.update(edited_text)
+            parse_python.update(original_text)
+
+        update_seconds = time_function(update, repeat) / 2.0
+
+        parse_python.update(edited_text)
+        parsed_lines = parse_python.parsed_lines
+        parse_python.update(original_text)
+
+        rows.append([edit, round(time_function(full, repeat), 4), round(update_seconds, 4), parsed_lines])
+
+    show_results('Outline benchmark, %s lines (seconds, best of %s)' % (len(lines), repeat),
+                 ['edit', 'full', 'update', 'lines parsed'], rows)
+
+    return rows
+
+
+if __name__ == '__main__':
+    benchmark_name = 'sort'
+    if len(sys.argv) > 1:
+        benchmark_name = sys.argv[1]
+
+    globals()[benchmark_name]()
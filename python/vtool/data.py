@@ -5,9 +5,18 @@ from __future__ import absolute_import
 import json
 import traceback
 import threading
+import array
+import hashlib
+import sys
+import time
 import os
 
-from . import util, util_file, usd
+from . import util, util_file, usd, util_weights
+
+if util.python_version < 3:
+    import Queue as queue
+else:
+    import queue
 
 if util.in_maya:
     import maya.cmds as cmds
@@ -26,56 +35,115 @@ from vtool import logger
 log = logger.get_logger(__name__)
 
 
+class DataTypeRegistry(object):
+    """
+    The data classes by their data type, eg. maya.ascii
+    The table is made the first time a type is looked up. Only the class of the type asked for is instanced.
+    """
+
+    # Data classes in the order they are offered.
+    registered = []
+
+    # data_type: data class
+    types = None
+    type_order = []
+
+    @classmethod
+    def register(cls, data_class):
+        """
+        Add a data class. If two classes have the same data type, the first registered is used.
+        """
+
+        cls.registered.append(data_class)
+        cls.types = None
+
+    @classmethod
+    def _build(cls):
+
+        types = {}
+        type_order = []
+
+        for data_class in cls.registered:
+
+            # _data_type only returns the type name, the class doesn't need its __init__ to answer.
+            data_type = data_class.__new__(data_class)._data_type()
+
+            if data_type in types:
+                continue
+
+            types[data_type] = data_class
+            type_order.append(data_type)
+
+        cls.type_order = type_order
+        cls.types = types
+
+    @classmethod
+    def get_types(cls):
+        """
+        Returns:
+            list: The data types in the order they were registered.
+        """
+
+        if cls.types is None:
+            cls._build()
+
+        return list(cls.type_order)
+
+    @classmethod
+    def get_class(cls, data_type):
+
+        if cls.types is None:
+            cls._build()
+
+        return cls.types.get(data_type)
+
+    @classmethod
+    def get_instance(cls, data_type):
+        """
+        Returns:
+            Data: A new instance of the data class of data_type, or None if the type isn't registered.
+        """
+
+        data_class = cls.get_class(data_type)
+
+        if data_class:
+            return data_class()
+
+
 class DataManager(object):
     """
     Manages data types
     """
 
-    def __init__(self):
-        self.available_data = [MayaAsciiFileData(),
-                               MayaBinaryFileData(),
-                               MayaShotgunFileData(),
-                               ScriptManifestData(),
-                               ScriptPythonData(),
-                               ControlCvData(),
-                               ControlColorData(),
-                               MayaControlAttributeData(),
-                               MayaControlRotateOrderData(),
-                               SkinWeightData(),
-                               DeformerWeightData(),
-                               BlendshapeWeightData(),
-                               PoseData(),
-                               MayaAttributeData(),
-                               AnimationData(),
-                               ControlAnimationData(),
-                               MayaShadersData(),
-                               FbxData(),
-                               UsdData(),
-                               HoudiniFileData(),
-                               HoudiniNodeData(),
-                               UnrealGraphData()
-                               ]
+    @property
+    def available_data(self):
+        return [DataTypeRegistry.get_instance(data_type) for data_type in DataTypeRegistry.get_types()]
 
     def get_available_types(self):
-        types = [data.get_type() for data in self.available_data]
-        return types
+        return DataTypeRegistry.get_types()
 
     def get_type_instance(self, data_type):
-        return next((data for data in self.available_data if data.is_type_match(data_type)), None)
+        return DataTypeRegistry.get_instance(data_type)
 
 class DataFolder(object):
     """
     A folder with a json file for tracking data
     """
 
-    def __init__(self, name, filepath):
+    def __init__(self, name, filepath, data_type=None):
+        """
+        Args:
+            name (str): The name of the data folder.
+            filepath (str): The folder it is in.
+            data_type (str): Saved with the default settings if the folder is new.
+        """
 
         new_path = util_file.join_path(filepath, name)
         self.filepath = util_file.get_dirname(new_path)
         self.name = util_file.get_basename(new_path)
         self.folder_path = None
 
-        self.data_type = None
+        self.data_type = data_type
 
         test_path = util_file.join_path(self.filepath, self.name)
 
@@ -116,7 +184,11 @@ class DataFolder(object):
 
         self._load_settings()
 
-        self.settings.set('name', self.name)
+        with self.settings.batch():
+            self.settings.set('name', self.name)
+
+            if self.data_type and not self.settings.get('data_type'):
+                self.settings.set('data_type', str(self.data_type))
 
         data_type = self.settings.get('data_type')
 
@@ -192,14 +264,15 @@ class DataFolder(object):
         if not self.settings:
             self._load_folder()
 
-        self.settings.set('sub_folder', name)
+        with self.settings.batch():
+            self.settings.set('sub_folder', name)
 
-        sub_folder = util_file.join_path(self.folder_path, '.sub/%s' % name)
+            sub_folder = util_file.join_path(self.folder_path, '.sub/%s' % name)
 
-        util_file.create_dir(sub_folder)
+            util_file.create_dir(sub_folder)
 
-        if self.data_type:
-            self.settings.set('data_type', str(self.data_type))
+            if self.data_type:
+                self.settings.set('data_type', str(self.data_type))
 
     def set_sub_folder_to_default(self):
 
@@ -233,8 +306,7 @@ class DataFolder(object):
         if not data_type:
             return
 
-        data_manager = DataManager()
-        instance = data_manager.get_type_instance(data_type)
+        instance = DataTypeRegistry.get_instance(data_type)
 
         if instance:
             instance.set_directory(self.folder_path)
@@ -984,6 +1056,18 @@ class SkinWeightData(MayaCustomData):
         Import available skin cluster weights for geo, or only the weights on selected geo.
     """
 
+    binary_file_name = 'skin.weights.bin'
+    binary_header_name = 'skin.weights.header'
+    binary_version = 1
+
+    def __init__(self, name=None):
+        super(SkinWeightData, self).__init__(name)
+
+        self._weight_decoder = None
+        self._decode_timings = {}
+        self._export_report = {}
+        self._thread_state = threading.local()
+
     def _data_name(self):
         return 'weights_skinCluster'
 
@@ -1015,10 +1099,38 @@ class SkinWeightData(MayaCustomData):
 
         return found
 
+    def _message(self, function, message):
+        """
+        Show a message, or hold it for the main thread when reading ahead on a background thread.
+        Maya commands are not safe to call off the main thread.
+        """
+        deferred = getattr(self._thread_state, 'deferred', None)
+
+        if deferred is not None:
+            deferred.append((function, message))
+            return
+
+        function(message)
+
+    def _prefetch_influences(self, folder_path):
+        self._thread_state.deferred = []
+
+        try:
+            influence_dict = self._get_influences(folder_path)
+        finally:
+            deferred = self._thread_state.deferred
+            self._thread_state.deferred = None
+
+        return influence_dict, deferred
+
     # @util.stop_watch_wrapper
     def _get_influences(self, folder_path):
 
-        util.show('Getting weight data from disk')
+        self._message(util.show, 'Getting weight data from disk')
+
+        if has_binary_skin_weights(folder_path):
+            return read_binary_skin_weights(folder_path)
+
         files = []
 
         try:
@@ -1038,7 +1150,6 @@ class SkinWeightData(MayaCustomData):
         for line_dict in map(eval, filter(None, util_file.get_file_lines(info_file))):
             influence_dict.update(line_dict)
 
-        threads = []
         weights_dict = {}
 
         single_file = False
@@ -1047,11 +1158,11 @@ class SkinWeightData(MayaCustomData):
             single_file = self.settings.get('single file')
 
         if found_single_file_weights and influences:
-            util.warning('Found single file weights, but export told not to use it.')
+            self._message(util.warning, 'Found single file weights, but export told not to use it.')
         if not single_file and found_single_file_weights and not influences:
             single_file = True
-            util.warning('Import skin weights told not to use single file.'
-                         ' There is no exported individual joint weights.  Using single file instead.')
+            self._message(util.warning, 'Import skin weights told not to use single file.'
+                                        ' There is no exported individual joint weights.  Using single file instead.')
 
         if single_file and found_single_file_weights:
             path = util_file.join_path(folder_path, 'all.skin.weights')
@@ -1059,34 +1170,42 @@ class SkinWeightData(MayaCustomData):
                 weights_dict[split_line[0]] = eval(split_line[1])
 
         if influences and single_file and not found_single_file_weights:
-            util.warning('Import skin weights told to use single file. There is no single file weights exported.'
-                         ' Using individual joint weights instead.')
+            self._message(util.warning, 'Import skin weights told to use single file.'
+                                        ' There is no single file weights exported.'
+                                        ' Using individual joint weights instead.')
 
         if not influences and not weights_dict:
-            util.warning('Found no single file weights or individual influence weights.'
-                         ' It appears the skin weights were not exported.')
+            self._message(util.warning, 'Found no single file weights or individual influence weights.'
+                                        ' It appears the skin weights were not exported.')
             return
 
         if not weights_dict:
-            for influence in influences:
-
-                try:
-                    read_thread = ReadWeightFileThread(influence_dict, folder_path, influence)
-                    threads.append(read_thread)
-                    read_thread.start()
-                    # read_thread.run()
-                except:
-                    util.error(traceback.format_exc())
-                    util.show('Errors with %s weight file.' % influence)
-
-            for thread in threads:
-                thread.join()
+            decoder = self._get_weight_decoder()
+            decoder.decode(folder_path, influences, influence_dict)
+            self._decode_timings.update(decoder.get_timings())
         else:
             for influence in influence_dict:
                 influence_dict[influence]['weights'] = weights_dict[influence]
 
         return influence_dict
 
+    def _get_weight_decoder(self):
+        if not self._weight_decoder:
+            decoder = WeightFileDecoder()
+
+            worker_count = self.settings.get('decode workers')
+            if worker_count is not None:
+                decoder.set_worker_count(worker_count)
+
+            self._weight_decoder = decoder
+
+        return self._weight_decoder
+
+    def _close_weight_decoder(self):
+        if self._weight_decoder:
+            self._weight_decoder.close()
+            self._weight_decoder = None
+
     def _test_shape(self, mesh, shape_types):
         return any(map(lambda x: maya_lib.core.has_shape_of_type(mesh, x), shape_types))
 
@@ -1258,44 +1377,59 @@ class SkinWeightData(MayaCustomData):
 
             results = []
 
-            for inc in range(0, key_count):
-
-                current_key = keys[inc]
+            # read and decode the next mesh folder on a background thread while the current mesh is applied.
+            prefetch_paths = [util_file.join_path(path, key) for key in keys if len(cmds.ls(mesh_dict[key])) == 1]
+            prefetch = WeightFolderPrefetcher(self._prefetch_influences, prefetch_paths)
+            prefetch.start()
 
-                mesh = mesh_dict[current_key]
-
-                if len(cmds.ls(mesh)) > 1:
-                    maya_lib.core.print_warning('Non unique. Could not find weights for %s' % mesh)
-                    progress_ui.inc()
-                    continue
+            try:
+                for inc in range(0, key_count):
 
-                nicename = maya_lib.core.get_basename(mesh)
-                progress_ui.status('Importing skin weights on: %s    - initializing' % nicename)
-                # cmds.refresh()
-                folder_path = util_file.join_path(path, current_key)
+                    current_key = keys[inc]
 
-                first = True
-                if path_inc > 0:
-                    first = False
+                    mesh = mesh_dict[current_key]
 
-                result = self.import_skin_weights(folder_path, mesh, first=first)
-                if not result:
-                    maya_lib.core.print_warning('Import %s data failed on %s' % (self.name, mesh))
-                results.append(result)
+                    if len(cmds.ls(mesh)) > 1:
+                        maya_lib.core.print_warning('Non unique. Could not find weights for %s' % mesh)
+                        progress_ui.inc()
+                        continue
 
-                if not (inc + 1) >= key_count:
-                    next_key = keys[inc + 1]
-                    next_mesh = mesh_dict[next_key]
-                    nicename = maya_lib.core.get_basename(next_mesh)
+                    nicename = maya_lib.core.get_basename(mesh)
                     progress_ui.status('Importing skin weights on: %s    - initializing' % nicename)
+                    # cmds.refresh()
+                    folder_path = util_file.join_path(path, current_key)
+
+                    first = True
+                    if path_inc > 0:
+                        first = False
+
+                    influence_dict = None
+                    prefetched = prefetch.get(folder_path)
+                    if prefetched:
+                        influence_dict, messages = prefetched
+                        for function, message in messages:
+                            function(message)
+
+                    result = self.import_skin_weights(folder_path, mesh, first=first, influence_dict=influence_dict)
+                    if not result:
+                        maya_lib.core.print_warning('Import %s data failed on %s' % (self.name, mesh))
+                    results.append(result)
+
+                    if not (inc + 1) >= key_count:
+                        next_key = keys[inc + 1]
+                        next_mesh = mesh_dict[next_key]
+                        nicename = maya_lib.core.get_basename(next_mesh)
+                        progress_ui.status('Importing skin weights on: %s    - initializing' % nicename)
 
-                progress_ui.inc()
+                    progress_ui.inc()
 
-                if util.break_signaled():
-                    break
+                    if util.break_signaled():
+                        break
 
-                if progress_ui.break_signaled():
-                    break
+                    if progress_ui.break_signaled():
+                        break
+            finally:
+                prefetch.stop()
 
             progress_ui.end()
 
@@ -1319,7 +1453,82 @@ class SkinWeightData(MayaCustomData):
     def set_single_file(self, bool_value):
         self.settings.set('single file', bool_value)
 
-    def import_skin_weights(self, directory, mesh, first=True):  # TODO: This beast needs to be broken apart.
+    def set_binary(self, bool_value):
+        self.settings.set('binary', bool_value)
+
+    def set_decode_workers(self, count):
+        """
+        Set how many processes decode .weights files on import. 0 or 1 decodes serially.
+        """
+        self.settings.set('decode workers', count)
+
+    def set_incremental(self, bool_value):
+        self.settings.set('incremental', bool_value)
+
+    def get_export_report(self):
+        """
+        Returns:
+            dict: Counts from the last export. keys: 'written files', 'skipped files', 'skipped bytes'
+        """
+        return self._export_report
+
+    def get_decode_timings(self):
+        """
+        Returns:
+            dict: dict[weight filepath] = seconds it took to decode, for files read since the last import started.
+        """
+        return self._decode_timings
+
+    def convert_weights_format(self, binary=True):
+        """
+        Convert the exported mesh folders between the text .weights layout and the binary layout.
+
+        Args:
+            binary (bool): If True convert text weights to binary, otherwise convert binary weights to text.
+
+        Returns:
+            list: The mesh folders that were converted.
+        """
+
+        converted = []
+
+        for path in self.get_existing():
+            for folder in util_file.get_folders(path):
+
+                folder_path = util_file.join_path(path, folder)
+                is_binary = has_binary_skin_weights(folder_path)
+
+                if is_binary == binary:
+                    continue
+
+                influence_dict = self._get_influences(folder_path)
+
+                if not influence_dict:
+                    continue
+
+                if binary:
+                    write_binary_skin_weights(folder_path, influence_dict)
+
+                    for filename in util_file.get_files_with_extension('weights', folder_path):
+                        util_file.delete_file(filename, folder_path)
+                else:
+                    write_text_skin_weights(folder_path, influence_dict)
+
+                    util_file.delete_file(self.binary_file_name, folder_path)
+                    util_file.delete_file(self.binary_header_name, folder_path)
+
+                converted.append(folder_path)
+
+        self._close_weight_decoder()
+
+        return converted
+
+    def import_skin_weights(self, directory, mesh, first=True,
+                            influence_dict=None):  # TODO: This beast needs to be broken apart.
+        """
+        Args:
+            influence_dict (dict): Influences already read from directory. If None they are read from disk.
+        """
 
         nicename = maya_lib.core.get_basename(mesh)
         short_name = cmds.ls(mesh)
@@ -1392,7 +1601,8 @@ class SkinWeightData(MayaCustomData):
 
         self._progress_ui.status('Importing skin weights on: %s    - getting influences' % nicename)
 
-        influence_dict = self._get_influences(directory)
+        if influence_dict is None:
+            influence_dict = self._get_influences(directory)
 
         self._progress_ui.status('Importing skin weights on: %s    - got influences' % nicename)
         if not influence_dict:
@@ -1483,34 +1693,19 @@ class SkinWeightData(MayaCustomData):
                 skin_inst.add_influence(influence)
             skin_cluster = skin_inst.get_skin()
 
-            weights_found = []
-            influences_found = []
-
-            # prep skin import data
-            import maya.api.OpenMaya as OM
-            weight_array = OM.MDoubleArray()
-
-            for influence in influences:
-
-                if influence not in influence_dict or 'weights' not in influence_dict[influence]:
-                    util.warning('Weights missing for influence %s' % influence)
-                    continue
-
-                weights_found.append(influence_dict[influence]['weights'])
-                influences_found.append(influence)
+            weights, influence_indices, vertex_count = get_skin_weight_matrix(skin_inst, influences, influence_dict)
 
-            for inc in range(0, len(weights_found[0])):
-
-                for inc2 in range(0, len(influences_found)):
-
-                    weight = weights_found[inc2][inc]
+            if weights:
+                try:
+                    maya_lib.api.set_skin_weights(skin_cluster, weights, 0, influence_array=influence_indices)
+                except:
+                    util.warning('Bulk skin weight import failed on %s. Setting weights one at a time.' % nicename)
+                    log.warning(traceback.format_exc())
 
-                    if isinstance(weight, int):
-                        weight = float(weight)
-                    weight_array.append(weight)
+                    cmds.setAttr('%s.normalizeWeights' % skin_cluster, 0)
+                    maya_lib.deform.set_skin_weights_to_zero(skin_cluster)
 
-            if len(weights_found) == len(influences_found):
-                maya_lib.api.set_skin_weights(skin_cluster, weight_array, 0)
+                    self._set_skin_weights_per_attribute(skin_cluster, influences, influence_dict, short_name)
 
         if not new_way:
 
@@ -1525,57 +1720,8 @@ class SkinWeightData(MayaCustomData):
 
             maya_lib.deform.set_skin_weights_to_zero(skin_cluster)
 
-            influence_index_dict = maya_lib.deform.get_skin_influences(skin_cluster, return_dict=True)
-
-            progress_ui = maya_lib.core.ProgressBar('import skin', len(list(influence_dict.keys())))
-
-            for influence in influences:
-                orig_influence = influence
-                if influence.count('|') > 1:
-                    split_influence = influence.split('|')
-                    if len(split_influence) > 1:
-                        influence = split_influence[-1]
-
-                message = 'importing skin mesh: %s,  influence: %s' % (short_name, influence)
-
-                progress_ui.status(message)
-
-                if 'weights' not in influence_dict[orig_influence]:
-                    util.warning('Weights missing for influence %s' % influence)
-                    return
-
-                weights = influence_dict[orig_influence]['weights']
-
-                if influence not in influence_index_dict:
-                    continue
-
-                index = influence_index_dict[influence]
-
-                attr = '%s.weightList[*].weights[%s]' % (skin_cluster, index)
-
-                # this wasn't faster, zipping zero weights is much faster than setting all the weights
-                # cmds.setAttr(attr, *weights )
-
-                for inc in range(0, len(weights)):
-
-                    weight = float(weights[inc])
-
-                    if weight == 0 or weight < 0.0001:
-                        continue
-
-                    attr = '%s.weightList[%s].weights[%s]' % (skin_cluster, inc, index)
-
-                    cmds.setAttr(attr, weight)
-
-                progress_ui.inc()
-
-                if util.break_signaled():
-                    break
-
-                if progress_ui.break_signaled():
-                    break
-
-            progress_ui.end()
+            if not self._set_skin_weights_per_attribute(skin_cluster, influences, influence_dict, short_name):
+                return
 
         cmds.skinCluster(skin_cluster, edit=True, normalizeWeights=1)
         cmds.skinCluster(skin_cluster, edit=True, forceNormalizeWeights=True)
@@ -1603,20 +1749,93 @@ class SkinWeightData(MayaCustomData):
 
         return True
 
+    def _set_skin_weights_per_attribute(self, skin_cluster, influences, influence_dict, short_name):
+        """
+        Slow path that sets every non zero weight with cmds.setAttr. Used for nurbs and when the bulk api call fails.
+        """
+
+        influence_index_dict = maya_lib.deform.get_skin_influences(skin_cluster, return_dict=True)
+
+        progress_ui = maya_lib.core.ProgressBar('import skin', len(list(influence_dict.keys())))
+
+        for influence in influences:
+            orig_influence = influence
+            if influence.count('|') > 1:
+                split_influence = influence.split('|')
+                if len(split_influence) > 1:
+                    influence = split_influence[-1]
+
+            message = 'importing skin mesh: %s,  influence: %s' % (short_name, influence)
+
+            progress_ui.status(message)
+
+            if 'weights' not in influence_dict[orig_influence]:
+                util.warning('Weights missing for influence %s' % influence)
+                progress_ui.end()
+                return False
+
+            weights = influence_dict[orig_influence]['weights']
+
+            if influence not in influence_index_dict:
+                continue
+
+            index = influence_index_dict[influence]
+
+            # this wasn't faster, zipping zero weights is much faster than setting all the weights
+            # cmds.setAttr(attr, *weights )
+
+            for inc in range(0, len(weights)):
+
+                weight = float(weights[inc])
+
+                if weight == 0 or weight < 0.0001:
+                    continue
+
+                attr = '%s.weightList[%s].weights[%s]' % (skin_cluster, inc, index)
+
+                cmds.setAttr(attr, weight)
+
+            progress_ui.inc()
+
+            if util.break_signaled():
+                break
+
+            if progress_ui.break_signaled():
+                break
+
+        progress_ui.end()
+
+        return True
+
     @util.stop_watch_wrapper
     def import_data(self, filepath=None, selection=None):
         if selection is None:
             selection = []
+
+        self._decode_timings = {}
+
         if util.is_in_maya():
             cmds.undoInfo(state=False)
-            self._import_maya_data(filepath, selection)
+            try:
+                self._import_maya_data(filepath, selection)
+            finally:
+                self._close_weight_decoder()
         cmds.undoInfo(state=True)
 
     def export_data(self, comment, selection=None, single_file=False, version_up=True, blend_weights=True,
-                    long_names=False, second_only=False):  # TODO: This needs to be broken apart as well.
+                    long_names=False, second_only=False, binary=False,
+                    incremental=False):  # TODO: This needs to be broken apart as well.
+        """
+        Args:
+            incremental (bool): Only rewrite influence .weights files whose weights hash changed since the last export.
+                Hashes are recorded in influence.info. Only used when exporting one file per influence.
+        """
 
         if selection is None:
             selection = []
+
+        self._export_report = {'written files': 0, 'skipped files': 0, 'skipped bytes': 0}
+        incremental = incremental and not single_file and not binary
         watch = util.StopWatch()
         watch.start('SkinWeightData.export_data', feedback=False)
         watch.feedback = True
@@ -1683,11 +1902,18 @@ class SkinWeightData(MayaCustomData):
 
                     geo_path = util_file.join_path(path, thing_filename)
 
+                    previous_hashes = {}
+                    previous_files = []
+
                     if util_file.is_dir(geo_path, case_sensitive=True):
                         files = util_file.get_files(geo_path)
 
-                        for filename in files:
-                            util_file.delete_file(filename, geo_path)
+                        if incremental:
+                            previous_hashes = get_influence_hashes(geo_path)
+                            previous_files = files
+                        else:
+                            for filename in files:
+                                util_file.delete_file(filename, geo_path)
 
                     else:
                         geo_path = util_file.create_dir(thing_filename, path)
@@ -1705,6 +1931,8 @@ class SkinWeightData(MayaCustomData):
                     info_lines = []
                     settings_lines = []
                     weights_dict = {}
+                    position_dict = {}
+                    written_files = []
 
                     for influence in weights:
 
@@ -1716,10 +1944,20 @@ class SkinWeightData(MayaCustomData):
                         if not weight_list:
                             continue
 
-                        if not single_file:
+                        if not single_file and not binary:
                             thread = LoadWeightFileThread()
 
-                            influence_line = thread.run(influence, skin, weights[influence], geo_path)
+                            influence_line = thread.run(influence, skin, weights[influence], geo_path,
+                                                        previous_hashes)
+
+                            if thread.filename:
+                                written_files.append(thread.filename)
+
+                                if thread.skipped:
+                                    self._export_report['skipped files'] += 1
+                                    self._export_report['skipped bytes'] += thread.skipped_bytes
+                                else:
+                                    self._export_report['written files'] += 1
                         else:
                             influence_name = maya_lib.deform.get_skin_influence_at_index(influence, skin)
                             sub_weights = weights[influence]
@@ -1731,16 +1969,30 @@ class SkinWeightData(MayaCustomData):
 
                             influence_position = cmds.xform(influence_name, q=True, ws=True, t=True)
                             influence_line = "{'%s' : {'position' : %s}}" % (influence_name, str(influence_position))
+                            position_dict[influence_name] = influence_position
 
                         if influence_line:
                             info_lines.append(influence_line)
 
-                    if single_file:
+                    if binary:
+                        binary_dict = {}
+                        for key in weights_dict:
+                            binary_dict[key] = {'position': position_dict[key], 'weights': weights_dict[key]}
+
+                        write_binary_skin_weights(geo_path, binary_dict)
+
+                    elif single_file:
                         filepath = util_file.create_file('all.skin.weights', geo_path)
 
                         lines = ['%s=%s' % (key, str(weights_dict[key])) for key in weights_dict]
                         util_file.write_lines(filepath, lines)
 
+                    for filename in previous_files:
+                        if filename.endswith('.weights') and filename not in written_files:
+                            util_file.delete_file(filename, geo_path)
+                        if filename in (self.binary_file_name, self.binary_header_name):
+                            util_file.delete_file(filename, geo_path)
+
                     util_file.write_lines(info_file, info_lines)
 
                     blend_weights_attr = '%s.blendWeights' % skin
@@ -1800,6 +2052,11 @@ class SkinWeightData(MayaCustomData):
         if found_one:
             maya_lib.core.print_help('skin weights exported.')
 
+        if incremental:
+            skipped_megabytes = round(self._export_report['skipped bytes'] * 0.000001, 2)
+            util.show('Incremental export wrote %s influence files, skipped %s unchanged files (%s MB).' %
+                      (self._export_report['written files'], self._export_report['skipped files'], skipped_megabytes))
+
         if version_up:
             util_file.get_permission(path)
             version = util_file.VersionFile(path)
@@ -1844,7 +2101,16 @@ class LoadWeightFileThread(threading.Thread):
     def __init__(self):
         super(LoadWeightFileThread, self).__init__()
 
-    def run(self, influence_index, skin, weights, path):
+        self.filename = None
+        self.skipped = False
+        self.skipped_bytes = 0
+
+    def run(self, influence_index, skin, weights, path, previous_hashes=None):
+        """
+        Args:
+            previous_hashes (dict): dict[influence_name] = weights hash from the last export.
+                If the hash still matches and the file exists, the file is not rewritten.
+        """
 
         influence_name = maya_lib.deform.get_skin_influence_at_index(influence_index, skin)
 
@@ -1852,7 +2118,25 @@ class LoadWeightFileThread(threading.Thread):
             return
 
         influence_filename = influence_name.replace(':', '-')
-        filepath = util_file.create_file('%s.weights' % influence_filename, path)
+        self.filename = '%s.weights' % influence_filename
+
+        weights_text = str(weights)
+        weights_hash = get_weights_hash(weights_text)
+
+        influence_position = cmds.xform(influence_name, q=True, ws=True, t=True)
+        influence_line = "{'%s' : {'position' : %s, 'hash' : '%s'}}" % (influence_name,
+                                                                       str(influence_position),
+                                                                       weights_hash)
+
+        existing_path = util_file.join_path(path, self.filename)
+
+        if previous_hashes and previous_hashes.get(influence_name) == weights_hash:
+            if util_file.is_file(existing_path):
+                self.skipped = True
+                self.skipped_bytes = os.path.getsize(existing_path)
+                return influence_line
+
+        filepath = util_file.create_file(self.filename, path)
 
         if not filepath:
             filepath = util_file.join_path(path, influence_name)
@@ -1865,45 +2149,514 @@ class LoadWeightFileThread(threading.Thread):
 
         util_file.get_permission(filepath)
 
-        util_file.write_lines(filepath, str(weights))
+        util_file.write_lines(filepath, weights_text)
 
-        influence_position = cmds.xform(influence_name, q=True, ws=True, t=True)
-        return "{'%s' : {'position' : %s}}" % (influence_name, str(influence_position))
+        return influence_line
+
+
+def get_weights_hash(weights_text):
+    return hashlib.md5(weights_text.encode()).hexdigest()
+
+
+def get_influence_hashes(folder_path):
+    """
+    Get the weight hashes recorded in influence.info by the last export.
+
+    Returns:
+        dict: dict[influence_name] = hash
+    """
+    info_file = util_file.join_path(folder_path, 'influence.info')
+
+    hashes = {}
+
+    if not util_file.is_file(info_file):
+        return hashes
+
+    for line in filter(None, util_file.get_file_lines(info_file)):
+        try:
+            line_dict = eval(line)
+        except:
+            continue
+
+        for influence in line_dict:
+            if 'hash' in line_dict[influence]:
+                hashes[influence] = line_dict[influence]['hash']
+
+    return hashes
+
+
+def get_skin_weight_matrix(skin, influences, influence_dict):
+    """
+    Assemble imported weights into one flat, vertex major list so they can be set with a single
+    MFnSkinCluster.setWeights call. This has no Maya calls of its own, skin only needs get_influence_index.
+
+    Args:
+        skin (object): Something with get_influence_index(influence_name), like maya_lib.deform.SkinCluster.
+        influences (list): Influence names, in the order they should be assembled.
+        influence_dict (dict): dict[influence_name]['weights'] = [weight per vertex]
+
+    Returns:
+        tuple: (weights, influence_indices, vertex_count)
+        weights holds vertex_count * len(influence_indices) floats, all influences for vertex 0 first.
+    """
+
+    columns = []
+    influence_indices = []
+
+    for influence in influences:
+
+        if influence not in influence_dict or not influence_dict[influence].get('weights'):
+            util.warning('Weights missing for influence %s' % influence)
+            continue
+
+        index = skin.get_influence_index(influence)
+
+        if index is None:
+            util.warning('Influence %s is not on the skin cluster' % influence)
+            continue
+
+        columns.append(influence_dict[influence]['weights'])
+        influence_indices.append(int(index))
+
+    if not columns:
+        return [], [], 0
+
+    vertex_count = min(len(column) for column in columns)
+
+    if vertex_count != max(len(column) for column in columns):
+        util.warning('Influence weight lists have different lengths. Using the first %s vertices.' % vertex_count)
+
+    weights = [float(weight) for vertex_weights in zip(*columns) for weight in vertex_weights]
+
+    return weights, influence_indices, vertex_count
+
+
+class WeightFileDecoder(object):
+    """
+    Decodes .weights files on a bounded process pool.
+    Parsing is cpu bound, so threads are serialized by the GIL. Falls back to decoding serially when
+    there are only a few files, only one worker, or a pool could not be started.
+    After the pool fails once, every later decode is serial.
+    """
+
+    def __init__(self):
+
+        self.worker_count = None
+        self.chunk_size = 4
+        self.minimum_file_count = 16
+        self.use_processes = True
+
+        # Seconds to wait for the pool to decode the files of one mesh, eg. when a worker died.
+        self.timeout = 300.0
+
+        self._pool = None
+        self._timings = {}
+
+    def _get_worker_count(self):
+        if self.worker_count is not None:
+            return self.worker_count
+
+        try:
+            import multiprocessing
+            return min(multiprocessing.cpu_count(), 8)
+        except NotImplementedError:
+            return 1
 
+    def _get_pool(self):
 
-class ReadWeightFileThread(threading.Thread):
+        if self._pool:
+            return self._pool
 
-    def __init__(self, influence_dict, folder_path, influence):
-        super(ReadWeightFileThread, self).__init__()
+        if util.python_version < 3:
+            util.warning('Weight decode processes need python 3. Decoding serially.')
+            return
+
+        import multiprocessing
+
+        context = multiprocessing.get_context('spawn')
+
+        if util.is_in_maya():
+            mayapy = util_file.get_mayapy()
+            if not mayapy or not util_file.is_file(mayapy):
+                util.warning('Could not find mayapy at %s for weight decode processes. Decoding serially.' % mayapy)
+                return
+            context.set_executable(mayapy)
+
+        self._pool = context.Pool(self._get_worker_count())
+
+        return self._pool
+
+    def _decode_parallel(self, file_paths):
+
+        pool = None
+
+        try:
+            pool = self._get_pool()
+        except:
+            log.warning(traceback.format_exc())
+            util.warning('Could not start weight decode processes. Decoding serially.')
 
-        self.influence_dict = influence_dict
-        self.folder_path = folder_path
-        self.influence = influence
+        if not pool:
+            self.use_processes = False
+            return
 
-    def run(self):
+        try:
+            return pool.map_async(util_weights.decode_weight_file, file_paths, self.chunk_size).get(self.timeout)
+        except:
+            util.error(traceback.format_exc())
+            util.warning('Weight decode processes failed. Decoding serially.')
+            self.use_processes = False
+            self.close(terminate=True)
 
-        influence_dict = self.influence_dict
-        folder_path = self.folder_path
-        influence = self.influence
+    def _decode_serial(self, file_paths):
+        results = []
+
+        for file_path in file_paths:
+            try:
+                results.append(util_weights.decode_weight_file(file_path))
+            except:
+                util.error(traceback.format_exc())
+                util.show('Errors with %s weight file.' % file_path)
 
-        file_path = util_file.join_path(folder_path, influence)
+        return results
 
-        influence = influence.split('.')[0]
-        influence = influence.replace('-', ':')
+    def set_worker_count(self, count):
+        self.worker_count = count
 
-        lines = util_file.get_file_lines(file_path)
+    def set_chunk_size(self, count):
+        self.chunk_size = max(1, count)
 
-        if not lines:
-            influence_dict[influence]['weights'] = None
-            return influence_dict
+    def set_use_processes(self, bool_value):
+        self.use_processes = bool_value
 
-        weights = json.loads(lines[0])
+    def decode(self, folder_path, filenames, influence_dict):
+        """
+        Decode weight files into influence_dict[influence]['weights'].
+
+        Args:
+            folder_path (str): The mesh folder.
+            filenames (list): .weights file names found in the folder.
+            influence_dict (dict): Influence info read from influence.info.
+
+        Returns:
+            dict: influence_dict
+        """
+        file_paths = [util_file.join_path(folder_path, filename) for filename in filenames]
 
-        if influence in influence_dict:
-            influence_dict[influence]['weights'] = weights
+        watch_start = time.time()
+
+        results = None
+
+        parallel = self.use_processes and len(file_paths) >= self.minimum_file_count
+        if parallel and self._get_worker_count() > 1:
+            results = self._decode_parallel(file_paths)
+
+        if results is None:
+            results = self._decode_serial(file_paths)
+
+        for file_path, weights, seconds in results:
+            self._timings[file_path] = seconds
+
+            influence = util_file.get_basename(file_path).split('.')[0]
+            influence = influence.replace('-', ':')
+
+            if influence in influence_dict:
+                influence_dict[influence]['weights'] = weights
+
+        log.info('Decoded %s weight files in %s seconds' % (len(results), round(time.time() - watch_start, 3)))
 
         return influence_dict
 
+    def get_timings(self):
+        """
+        Returns:
+            dict: dict[weight filepath] = seconds spent decoding the file.
+        """
+        return self._timings
+
+    def close(self, terminate=False):
+        """
+        Args:
+            terminate (bool): Stop the workers without waiting for them, eg. when one of them hangs.
+        """
+        if self._pool:
+            if terminate:
+                self._pool.terminate()
+            else:
+                self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+class WeightFolderPrefetcher(object):
+    """
+    Reads mesh weight folders on a background thread, ahead of the mesh that is being applied to the scene.
+    The queue is bounded, so at most depth folders are held in memory waiting to be applied.
+
+    Args:
+        read_function (function): Called with a folder path on the background thread.
+        folder_paths (list): Folder paths in the order they will be asked for.
+        depth (int): How many folders to read ahead.
+    """
+
+    _done = object()
+
+    def __init__(self, read_function, folder_paths, depth=1):
+
+        self.read_function = read_function
+        self.folder_paths = list(folder_paths)
+
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._stop_event = threading.Event()
+        self._finished = False
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def _run(self):
+
+        for folder_path in self.folder_paths:
+
+            if self._stop_event.is_set() or util.break_signaled():
+                break
+
+            try:
+                result = self.read_function(folder_path)
+            except:
+                log.error(traceback.format_exc())
+                result = None
+
+            if not self._put((folder_path, result)):
+                return
+
+        self._put((None, self._done))
+
+    def start(self):
+        if self.folder_paths:
+            self._thread.start()
+        else:
+            self._finished = True
+
+    def get(self, folder_path):
+        """
+        Get the result read for folder_path. Results for folders that were skipped by the caller are dropped.
+
+        Returns:
+            The value returned by read_function, or None if folder_path was not read ahead.
+        """
+
+        if self._finished or folder_path not in self.folder_paths:
+            return
+
+        while True:
+            path, result = self._queue.get()
+
+            if result is self._done:
+                self._finished = True
+                return
+
+            if path == folder_path:
+                return result
+
+    def stop(self):
+        self._stop_event.set()
+
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+        if self._thread.is_alive():
+            self._thread.join()
+
+        self._finished = True
+
+# --- skin weights binary format
+
+
+def _get_array_typecode(letters, item_size):
+    for letter in letters:
+        if array.array(letter).itemsize == item_size:
+            return letter
+
+
+def _read_binary_column(binary_file, header, column):
+    """
+    Reads one column of a binary skin weights file. Uses numpy.memmap when numpy is available.
+    """
+    column_type, offset = header['columns'][column]
+    count = header['entry_count']
+
+    if not count:
+        return []
+
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+    if numpy is not None:
+        return numpy.memmap(binary_file, dtype='<%s' % column_type, mode='r', offset=offset, shape=(count,))
+
+    if column_type == 'f8':
+        typecode = _get_array_typecode('d', 8)
+    else:
+        typecode = _get_array_typecode('IL', 4)
+
+    values = array.array(typecode)
+
+    with open(binary_file, 'rb') as open_file:
+        open_file.seek(offset)
+        values.fromfile(open_file, count)
+
+    if sys.byteorder != 'little':
+        values.byteswap()
+
+    return values
+
+
+def has_binary_skin_weights(folder_path):
+    header_file = util_file.join_path(folder_path, SkinWeightData.binary_header_name)
+    binary_file = util_file.join_path(folder_path, SkinWeightData.binary_file_name)
+
+    return bool(util_file.is_file(header_file) and util_file.is_file(binary_file))
+
+
+def write_binary_skin_weights(folder_path, influence_dict):
+    """
+    Write skin weights as a single sparse (vertex, influence, weight) file plus a json index header.
+    The binary file holds three little endian columns: uint32 vertex ids, uint32 influence ids and float64 weights.
+    Entries are ordered by influence, so the header can store where each influence starts and how many entries it has.
+
+    Args:
+        folder_path (str): The mesh folder to write into.
+        influence_dict (dict): dict[influence_name] = {'position': [x,y,z], 'weights': [weight per vertex]}
+
+    Returns:
+        str: The path to the binary file.
+    """
+
+    uint_code = _get_array_typecode('IL', 4)
+    float_code = _get_array_typecode('d', 8)
+
+    vertices = array.array(uint_code)
+    influence_ids = array.array(uint_code)
+    weights = array.array(float_code)
+
+    vertex_count = 0
+    influences = []
+
+    for influence_index, influence in enumerate(sorted(influence_dict)):
+
+        influence_weights = influence_dict[influence].get('weights') or []
+        vertex_count = max(vertex_count, len(influence_weights))
+
+        start = len(weights)
+
+        for vertex_index, weight in enumerate(influence_weights):
+            if not weight:
+                continue
+            vertices.append(vertex_index)
+            influence_ids.append(influence_index)
+            weights.append(float(weight))
+
+        position = influence_dict[influence].get('position')
+        influences.append([influence, position, start, len(weights) - start])
+
+    entry_count = len(weights)
+
+    if sys.byteorder != 'little':
+        for column in (vertices, influence_ids, weights):
+            column.byteswap()
+
+    binary_file = util_file.create_file(SkinWeightData.binary_file_name, folder_path)
+    header_file = util_file.create_file(SkinWeightData.binary_header_name, folder_path)
+
+    with open(binary_file, 'wb') as open_file:
+        vertices.tofile(open_file)
+        influence_ids.tofile(open_file)
+        weights.tofile(open_file)
+
+    header = {'version': SkinWeightData.binary_version,
+              'vertex_count': vertex_count,
+              'entry_count': entry_count,
+              'columns': {'vertex': ['u4', 0],
+                          'influence': ['u4', entry_count * 4],
+                          'weight': ['f8', entry_count * 8]},
+              'influences': influences}
+
+    util_file.set_json(header_file, header)
+
+    return binary_file
+
+
+def read_binary_skin_weights(folder_path):
+    """
+    Read skin weights written by write_binary_skin_weights.
+
+    Returns:
+        dict: dict[influence_name] = {'position': [x,y,z], 'weights': [weight per vertex]}
+    """
+    header_file = util_file.join_path(folder_path, SkinWeightData.binary_header_name)
+    binary_file = util_file.join_path(folder_path, SkinWeightData.binary_file_name)
+
+    header = util_file.get_json(header_file)
+
+    if not header:
+        return
+
+    if header.get('version', 0) > SkinWeightData.binary_version:
+        util.warning('Skin weights at %s were written by a newer version of Vetala.' % folder_path)
+        return
+
+    vertex_count = header['vertex_count']
+
+    vertices = _read_binary_column(binary_file, header, 'vertex')
+    weights = _read_binary_column(binary_file, header, 'weight')
+
+    influence_dict = {}
+
+    for influence, position, start, count in header['influences']:
+
+        influence_weights = [0.0] * vertex_count
+
+        for inc in range(start, start + count):
+            influence_weights[int(vertices[inc])] = float(weights[inc])
+
+        influence_dict[influence] = {'position': position, 'weights': influence_weights}
+
+    return influence_dict
+
+
+def write_text_skin_weights(folder_path, influence_dict):
+    """
+    Write skin weights in the text layout, one .weights file per influence plus influence.info.
+    """
+    info_lines = []
+
+    for influence in influence_dict:
+
+        influence_filename = influence.replace(':', '-')
+        filepath = util_file.create_file('%s.weights' % influence_filename, folder_path)
+
+        util_file.write_lines(filepath, str(influence_dict[influence].get('weights')))
+
+        position = influence_dict[influence].get('position')
+        info_lines.append("{'%s' : {'position' : %s}}" % (influence, str(position)))
+
+    info_file = util_file.create_file('influence.info', folder_path)
+    util_file.write_lines(info_file, info_lines)
+
 
 class BlendshapeWeightData(MayaCustomData):
 
@@ -4029,6 +4782,31 @@ class UsdData(CustomData):
         version.save(comment)
 
 
+for data_class in [MayaAsciiFileData,
+                   MayaBinaryFileData,
+                   MayaShotgunFileData,
+                   ScriptManifestData,
+                   ScriptPythonData,
+                   ControlCvData,
+                   ControlColorData,
+                   MayaControlAttributeData,
+                   MayaControlRotateOrderData,
+                   SkinWeightData,
+                   DeformerWeightData,
+                   BlendshapeWeightData,
+                   PoseData,
+                   MayaAttributeData,
+                   AnimationData,
+                   ControlAnimationData,
+                   MayaShadersData,
+                   FbxData,
+                   UsdData,
+                   HoudiniFileData,
+                   HoudiniNodeData,
+                   UnrealGraphData]:
+    DataTypeRegistry.register(data_class)
+
+
 def read_ldr_file(filepath):
     lines = util_file.get_file_lines(filepath)
 
@@ -1793,12 +1793,8 @@ def set_skin_weights(skin_cluster, weights=0, index=0, components=None, influenc
     if influence_array:
         influence_count = len(influence_array)
 
-        int_influence_array = om.MIntArray()
-
-        for inc in range(0, influence_count):
-            int_influence_array.append(influence_array[inc])
-
-        influence_array = int_influence_array
+        if not isinstance(influence_array, om.MIntArray):
+            influence_array = om.MIntArray(influence_array)
 
     if not influence_array:
         influence_dag_paths = skin_fn.influenceObjects()
@@ -1815,9 +1811,8 @@ def set_skin_weights(skin_cluster, weights=0, index=0, components=None, influenc
 
     if weight_array is None:
         if isinstance(weights, list) or isinstance(weights, tuple):
-            weight_array = om.MDoubleArray()
-            for weight in weights:
-                weight_array.append(weight)
+            # building the array in one call is much faster than appending a weight at a time
+            weight_array = om.MDoubleArray(weights)
 
         if not isinstance(weights, list) and not isinstance(weights, tuple):
             weight_array = om.MDoubleArray()
@@ -1,18 +1,46 @@
 # Copyright (C) 2022 Louis Vottero louis.vot@gmail.com    All rights reserved.
 
+"""
+Run with no arguments, this builds the process in VETALA_CURRENT_PROCESS. Process.run_batch launches it that way in mayapy.
+
+Run with process paths, it builds them all, each in its own interpreter running this file, a few at a time.
+
+Usage:
+    python -m vtool.process_manager.batch -j 4 --interpreter mayapy /projects/chars/*
+    python -m vtool.process_manager.batch --depends /projects/chars/hero=/projects/chars/base /projects/chars/*
+"""
+
+from __future__ import print_function
+
 import os
 import sys
 
-print('Using Pyton Version:\t', sys.version)
-source_path = os.environ['VETALA_PATH']
-source_path = os.path.dirname(source_path)
-sys.path.insert(0, source_path)
-print('Using Vetala Path: ', source_path)
+
+def _get_source_path():
+    vetala_path = os.environ.get('VETALA_PATH')
+
+    if vetala_path:
+        return os.path.dirname(vetala_path)
+
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+if __name__ == '__main__':
+    print('Using Pyton Version:\t', sys.version)
+    source_path = _get_source_path()
+    sys.path.insert(0, source_path)
+    print('Using Vetala Path: ', source_path)
 
 import vtool.util
 import vtool.util_file
 
 import traceback
+import glob
+import time
+import shlex
+import argparse
+import datetime
+import subprocess
 
 
 def main():
@@ -20,7 +48,10 @@ def main():
           '-----------------------------------------------------\n\n')
 
     process_path = os.environ['VETALA_CURRENT_PROCESS']
-    settings = os.environ['VETALA_SETTINGS']
+    settings = os.environ.get('VETALA_SETTINGS')
+
+    is_worker = os.environ.get('VETALA_BATCH_WORKER') == 'True'
+    failed = False
 
     print('\n')
     print('Using Vetala Process:\t', process_path)
@@ -61,9 +92,14 @@ def main():
 
         process_inst.set_directory(process_path)
         try:
-            process_inst.run()
+            status_list = process_inst.run()
+
+            for status_entry in status_list or []:
+                if status_entry[1] not in ('Success', 'Skipped', 'Cached'):
+                    failed = True
         except:
             vtool.util.error(traceback.format_exc())
+            failed = True
 
         vtool.util.show('Batch finished.\n\n')
 
@@ -75,9 +111,14 @@ def main():
 
     else:
         vtool.util.show('Could not get current process.  Batch finished, nothing processed.')
+        failed = True
 
     vtool.util.show('\n\nAll done!')
 
+    if is_worker:
+        print('\n\n------- END OF VETALA BATCH ----------------------------------------------------------\n\n\n\n\n')
+        return int(failed)
+
     python_version = sys.version_info.major
     if python_version == 3:
         input('\n\nPress Any Key and Enter to Exit')
@@ -87,5 +128,334 @@ def main():
     print('\n\n------- END OF VETALA BATCH ----------------------------------------------------------\n\n\n\n\n')
 
 
+def expand_process_paths(patterns):
+    """
+    Args:
+        patterns (list): Process paths. Glob patterns are expanded.
+
+    Returns:
+        list: Paths of the processes found, in the order given. Folders that aren't processes are left out.
+    """
+
+    from vtool.process_manager import process
+
+    found = []
+
+    for pattern in patterns:
+
+        paths = sorted(glob.glob(pattern)) or [pattern]
+
+        for path in paths:
+            path = vtool.util_file.fix_slashes(os.path.abspath(path))
+
+            if path in found:
+                continue
+
+            if not process.is_process(path):
+                vtool.util.warning('Not a process: %s' % path)
+                continue
+
+            found.append(path)
+
+    return found
+
+
+class BatchBuild(object):
+    """
+    Build processes in parallel, each in a new interpreter running this file.
+
+    A process starts after the processes it depends on have built.
+    Processes inside another process in the batch are its dependencies, the same way run_deadline orders jobs.
+    If a dependency fails, the processes depending on it are skipped.
+
+    Args:
+        process_paths (list): Paths of the processes to build.
+        workers (int): How many interpreters to run at once.
+        interpreter (str): The command that runs python, eg. mayapy or python.
+            A list of arguments works too. Defaults to mayapy, or this python if Maya isn't found.
+        log_directory (str): Where to write one log per process and summary.json. Defaults to a new folder in temp.
+    """
+
+    poll_seconds = 0.1
+
+    def __init__(self, process_paths, workers=None, interpreter=None, log_directory=None):
+
+        self.process_paths = [vtool.util_file.fix_slashes(path) for path in process_paths]
+
+        self.workers = workers or 1
+        self.interpreter = interpreter
+        self.log_directory = log_directory
+
+        self._dependencies = {}
+
+        for path in self.process_paths:
+            self._dependencies[path] = []
+
+        for path in self.process_paths:
+            for other_path in self.process_paths:
+                if other_path.startswith(path + '/'):
+                    self.add_dependency(path, other_path)
+
+    def _get_log_directory(self):
+        if not self.log_directory:
+            stamp = datetime.datetime.now().strftime('%Y_%m_%d__%H_%M_%S')
+            self.log_directory = vtool.util_file.join_path(vtool.util_file.get_temp_dir(), 'vetala_batch_%s' % stamp)
+
+        vtool.util_file.create_dir(self.log_directory)
+
+        return self.log_directory
+
+    def _get_log_name(self, process_path):
+        name = process_path.strip('/').replace('/', '_').replace(':', '')
+
+        return vtool.util_file.join_path(self._get_log_directory(), name + '.log')
+
+    def _get_environment(self, process_path):
+
+        environment = dict(os.environ)
+
+        environment['VETALA_PATH'] = os.path.dirname(os.path.abspath(vtool.__file__))
+        environment['VETALA_CURRENT_PROCESS'] = process_path
+        environment['VETALA_BATCH_WORKER'] = 'True'
+
+        return environment
+
+    def _start(self, process_path):
+
+        log_path = self._get_log_name(process_path)
+        log_file = open(log_path, 'w')
+
+        try:
+            popen = subprocess.Popen(self.get_command(),
+                                     stdout=log_file,
+                                     stderr=subprocess.STDOUT,
+                                     env=self._get_environment(process_path))
+        except OSError:
+            log_file.write(traceback.format_exc())
+            log_file.close()
+            return None, log_path
+
+        return (popen, log_file, time.time()), log_path
+
+    def add_dependency(self, process_path, depends_on_path):
+        """
+        Build process_path after depends_on_path. Dependencies on processes that aren't in the batch are ignored.
+        """
+
+        process_path = vtool.util_file.fix_slashes(process_path)
+        depends_on_path = vtool.util_file.fix_slashes(depends_on_path)
+
+        dependencies = self._dependencies.setdefault(process_path, [])
+
+        if depends_on_path not in dependencies:
+            dependencies.append(depends_on_path)
+
+    def get_dependencies(self, process_path):
+        return [path for path in self._dependencies.get(process_path, []) if path in self._dependencies]
+
+    def get_order(self):
+        """
+        Returns:
+            list: The process paths sorted so every process comes after its dependencies, otherwise in the order given.
+                None if the dependencies have a cycle.
+        """
+
+        order = []
+        done = set()
+
+        remaining = list(self.process_paths)
+
+        while remaining:
+            ready = [path for path in remaining if all(dependency in done for dependency in self.get_dependencies(path))]
+
+            if not ready:
+                vtool.util.error('Batch dependencies have a cycle between: %s' % ', '.join(remaining))
+                return
+
+            for path in ready:
+                order.append(path)
+                done.add(path)
+                remaining.remove(path)
+
+        return order
+
+    def get_command(self):
+        """
+        Returns:
+            list: The interpreter arguments followed by this file.
+        """
+
+        interpreter = self.interpreter
+
+        if not interpreter:
+            interpreter = vtool.util_file.get_mayapy()
+
+            if not interpreter or not vtool.util_file.is_file(interpreter):
+                interpreter = sys.executable
+
+            interpreter = [interpreter]
+
+        if vtool.util.is_str(interpreter):
+            interpreter = shlex.split(interpreter, posix=not vtool.util.is_windows())
+
+        batch_file = os.path.abspath(__file__)
+        if batch_file.endswith('.pyc'):
+            batch_file = batch_file[:-1]
+
+        return list(interpreter) + [batch_file]
+
+    def run(self):
+        """
+        Build every process and show a summary.
+
+        Returns:
+            list: A dict per process, in build order, with process, status, seconds, return_code and log.
+                status is success, fail, skipped when a dependency failed, or error when the interpreter didn't start.
+        """
+
+        order = self.get_order()
+
+        if order is None:
+            return
+
+        vtool.util.show('Batch building %s processes, %s at a time. Logs: %s' % (len(order),
+                                                                               self.workers,
+                                                                               self._get_log_directory()))
+
+        results = {}
+        running = {}
+        pending = list(order)
+
+        while pending or running:
+
+            for process_path in list(pending):
+
+                if len(running) >= self.workers:
+                    break
+
+                dependencies = self.get_dependencies(process_path)
+
+                failed_dependencies = [path for path in dependencies
+                                       if path in results and results[path]['status'] != 'success']
+
+                if failed_dependencies:
+                    pending.remove(process_path)
+                    results[process_path] = {'process': process_path,
+                                              'status': 'skipped',
+                                              'seconds': 0,
+                                              'return_code': None,
+                                              'log': None}
+                    vtool.util.warning('Skipping %s, it depends on %s' % (process_path, failed_dependencies[0]))
+                    continue
+
+                if not all(path in results for path in dependencies):
+                    continue
+
+                pending.remove(process_path)
+
+                job, log_path = self._start(process_path)
+
+                if not job:
+                    results[process_path] = {'process': process_path,
+                                              'status': 'error',
+                                              'seconds': 0,
+                                              'return_code': None,
+                                              'log': log_path}
+                    vtool.util.warning('Could not start %s' % process_path)
+                    continue
+
+                vtool.util.show('Started %s' % process_path)
+
+                running[process_path] = (job, log_path)
+
+            for process_path, ((popen, log_file, start), log_path) in list(running.items()):
+
+                return_code = popen.poll()
+
+                if return_code is None:
+                    continue
+
+                log_file.close()
+                running.pop(process_path)
+
+                status = 'success'
+                if return_code:
+                    status = 'fail'
+
+                results[process_path] = {'process': process_path,
+                                          'status': status,
+                                          'seconds': round(time.time() - start, 2),
+                                          'return_code': return_code,
+                                          'log': log_path}
+
+                vtool.util.show('Finished %s: %s' % (process_path, status))
+
+            if running:
+                time.sleep(self.poll_seconds)
+
+        ordered_results = [results[path] for path in order]
+
+        vtool.util_file.set_json(vtool.util_file.join_path(self._get_log_directory(), 'summary.json'), ordered_results)
+
+        show_summary(ordered_results)
+
+        return ordered_results
+
+
+def show_summary(results):
+
+    lines = ['\n%-10s %10s   %s' % ('status', 'seconds', 'process')]
+
+    for result in results:
+        lines.append('%-10s %10s   %s' % (result['status'], result['seconds'], result['process']))
+
+    vtool.util.show('\n'.join(lines) + '\n')
+
+
+def run_batch(args):
+    """
+    Command line for BatchBuild.
+
+    Returns:
+        int: 1 if any process didn't build, otherwise 0.
+    """
+
+    parser = argparse.ArgumentParser(description='Build Vetala processes in parallel.')
+    parser.add_argument('processes', nargs='+', help='Process paths or glob patterns.')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='How many processes to build at once.')
+    parser.add_argument('--interpreter', help='Command that runs python. Defaults to mayapy.')
+    parser.add_argument('--logs', help='Folder for the logs and summary.json')
+    parser.add_argument('--depends', action='append', default=[], metavar='PROCESS=DEPENDENCY',
+                        help='Build PROCESS after DEPENDENCY. Can be repeated.')
+
+    options = parser.parse_args(args)
+
+    process_paths = expand_process_paths(options.processes)
+
+    if not process_paths:
+        vtool.util.warning('No processes found.')
+        return 1
+
+    batch = BatchBuild(process_paths, options.workers, options.interpreter, options.logs)
+
+    for depends in options.depends:
+        process_path, depends_on_path = depends.split('=', 1)
+        batch.add_dependency(os.path.abspath(process_path), os.path.abspath(depends_on_path))
+
+    results = batch.run()
+
+    if not results:
+        return 1
+
+    for result in results:
+        if result['status'] != 'success':
+            return 1
+
+    return 0
+
+
 if __name__ == '__main__':
-    main()
+    if len(sys.argv) > 1:
+        sys.exit(run_batch(sys.argv[1:]))
+
+    sys.exit(main())
@@ -0,0 +1,309 @@
+# Copyright (C) 2022 Louis Vottero louis.vot@gmail.com    All rights reserved.
+
+"""
+Incremental process builds.
+
+While a process builds with Process.run(incremental=True), a BuildRecord notes per manifest script
+the hash of its code, a signature of every data folder it imported and the value of every option it read.
+After each script that succeeds a checkpoint is saved into the .build folder of the process: the Maya scene, and the put and runtime values.
+
+The next incremental build compares the record to the process, opens the checkpoint of the last script that is still up to date
+and runs the manifest from the first script that changed.
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import json
+import pickle
+import hashlib
+
+from .. import util
+from .. import util_file
+
+in_maya = util.is_in_maya()
+
+if in_maya:
+    import maya.cmds as cmds
+
+build_folder_name = '.build'
+
+
+def get_build_folder(process_path):
+    return util_file.join_path(process_path, build_folder_name)
+
+
+def get_file_hash(filepath):
+    """
+    Returns:
+        str: sha1 of the file contents, or None if the file can't be read.
+    """
+
+    file_hash = hashlib.sha1()
+
+    try:
+        with open(filepath, 'rb') as open_file:
+            for chunk in iter(lambda: open_file.read(1024 * 1024), b''):
+                file_hash.update(chunk)
+    except (IOError, OSError):
+        return
+
+    return file_hash.hexdigest()
+
+
+def get_data_signature(folder):
+    """
+    A signature of the files in a data folder and its sub folders, from their names, sizes and modified times.
+    Versions are left out, saving a version doesn't change the data.
+
+    Returns:
+        str: None if the folder doesn't exist.
+    """
+
+    if not folder or not util_file.is_dir(folder):
+        return
+
+    signature = hashlib.sha1()
+
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted([dirname for dirname in dirs if dirname != '.version'])
+
+        for filename in sorted(files):
+            filepath = os.path.join(root, filename)
+
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue
+
+            relative = os.path.relpath(filepath, folder).replace('\\', '/')
+
+            signature.update(('%s|%s|%s\n' % (relative, stat.st_size, stat.st_mtime)).encode('utf-8'))
+
+    return signature.hexdigest()
+
+
+def get_option_signature(value):
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class BuildRecord(object):
+    """
+    What each script of the last incremental build depended on, and its checkpoints.
+
+    Args:
+        process_path (str): The process folder.
+    """
+
+    record_name = 'record.json'
+
+    def __init__(self, process_path):
+        self.process_path = process_path
+        self.folder = get_build_folder(process_path)
+
+        self.entries = []
+        self.previous_entries = []
+
+        self._current = None
+
+        record_path = util_file.join_path(self.folder, self.record_name)
+
+        record = None
+        if util_file.is_file(record_path):
+            record = util_file.get_json(record_path)
+
+        if record:
+            self.previous_entries = record.get('scripts', [])
+
+    def _get_checkpoint_path(self, index, extension):
+        return util_file.join_path(self.folder, 'checkpoint_%s.%s' % (index, extension))
+
+    def start_script(self, script):
+        self._current = {'script': script,
+                         'code': {},
+                         'data': [],
+                         'options': [],
+                         'status': None,
+                         'skip_children': False,
+                         'checkpoint': False}
+
+    def end_script(self, status, skip_children=False):
+        if not self._current:
+            return
+
+        self._current['status'] = status
+        self._current['skip_children'] = skip_children
+
+        self.entries.append(self._current)
+        self._current = None
+
+    def add_cached(self, index):
+        """
+        Keep the entry of the last build at index, for a script that was skipped because it was up to date.
+        """
+
+        self.entries.append(self.previous_entries[index])
+
+    def add_code(self, filepath):
+        if not self._current:
+            return
+
+        self._current['code'][filepath] = get_file_hash(filepath)
+
+    def add_data(self, name, sub_folder, folder):
+        if not self._current:
+            return
+
+        data = [name, sub_folder, get_data_signature(folder)]
+
+        if data not in self._current['data']:
+            self._current['data'].append(data)
+
+    def add_option(self, name, group, value):
+        if not self._current:
+            return
+
+        option = [name, group, get_option_signature(value)]
+
+        if option not in self._current['options']:
+            self._current['options'].append(option)
+
+    def get_invalid_reason(self, index, script, get_data_folder, get_option):
+        """
+        Check the entry of the last build at index against the process as it is now.
+
+        Args:
+            index (int): Position of the script among the scripts the build runs.
+            script (str): The script the build runs at index.
+            get_data_folder (function): Takes a data name and sub folder and returns its folder.
+            get_option (function): Takes an option name and group and returns its value.
+
+        Returns:
+            str: Why the script needs to run again, or None if it is up to date.
+        """
+
+        if index >= len(self.previous_entries):
+            return 'not in the last build'
+
+        entry = self.previous_entries[index]
+
+        if entry['script'] != script:
+            return 'the manifest changed'
+
+        if entry['status'] != 'Success':
+            return 'it failed in the last build'
+
+        for filepath, file_hash in entry['code'].items():
+            if get_file_hash(filepath) != file_hash:
+                return 'code changed: %s' % filepath
+
+        for name, sub_folder, signature in entry['data']:
+            if get_data_signature(get_data_folder(name, sub_folder)) != signature:
+                if sub_folder:
+                    return 'data changed: %s sub folder %s' % (name, sub_folder)
+                return 'data changed: %s' % name
+
+        for name, group, signature in entry['options']:
+            if get_option_signature(get_option(name, group)) != signature:
+                return 'option changed: %s' % name
+
+    def has_checkpoint(self, index):
+        if index >= len(self.previous_entries) or not self.previous_entries[index].get('checkpoint'):
+            return False
+
+        if not util_file.is_file(self._get_checkpoint_path(index, 'state')):
+            return False
+
+        if in_maya and not util_file.is_file(self._get_checkpoint_path(index, 'mb')):
+            return False
+
+        return True
+
+    def save_checkpoint(self, index, state):
+        """
+        Save the scene and state after the last script ended.
+
+        Args:
+            index (int): Position of the script among the scripts the build runs.
+            state (dict): Put and runtime values. Values that can't be pickled mean no checkpoint.
+
+        Returns:
+            bool
+        """
+
+        if not self.entries:
+            return False
+
+        entry = self.entries[-1]
+
+        util_file.create_dir(self.folder)
+
+        try:
+            state_data = pickle.dumps(state, 2)
+        except Exception:
+            util.warning('Put or runtime values could not be saved. No checkpoint after %s' % entry['script'])
+            return False
+
+        if in_maya:
+            scene_name = cmds.file(q=True, sn=True)
+
+            try:
+                cmds.file(rename=self._get_checkpoint_path(index, 'mb'))
+                cmds.file(save=True, type='mayaBinary', force=True)
+            except Exception:
+                util.warning('Could not save checkpoint scene after %s' % entry['script'])
+                return False
+            finally:
+                # an untitled scene is named untitled again, so saving it doesn't overwrite the checkpoint.
+                cmds.file(rename=scene_name or 'untitled')
+
+        with open(self._get_checkpoint_path(index, 'state'), 'wb') as open_file:
+            open_file.write(state_data)
+
+        entry['checkpoint'] = True
+
+        return True
+
+    def load_checkpoint(self, index):
+        """
+        Open the checkpoint scene saved after the script at index.
+
+        Returns:
+            dict: The put and runtime values saved with it.
+        """
+
+        if in_maya:
+            scene_name = cmds.file(q=True, sn=True)
+            cmds.file(self._get_checkpoint_path(index, 'mb'), f=True, o=True, prompt=False)
+            cmds.file(rename=scene_name or 'untitled')
+
+        with open(self._get_checkpoint_path(index, 'state'), 'rb') as open_file:
+            return pickle.loads(open_file.read())
+
+    def write(self):
+        """
+        Save the record of this build and remove checkpoints it no longer has.
+        """
+
+        util_file.create_dir(self.folder)
+
+        util_file.set_json(util_file.join_path(self.folder, self.record_name), {'scripts': self.entries})
+
+        for filename in util_file.get_files(self.folder):
+            if not filename.startswith('checkpoint_'):
+                continue
+
+            index = filename[len('checkpoint_'):].split('.')[0]
+
+            if index.isdigit() and int(index) < len(self.entries) and self.entries[int(index)].get('checkpoint'):
+                continue
+
+            util_file.delete_file(filename, self.folder)
+
+    def clear(self):
+        self.entries = []
+        self.previous_entries = []
+
+        if util_file.is_dir(self.folder):
+            util_file.delete_dir(self.folder)
@@ -0,0 +1,302 @@
+# Copyright (C) 2022 Louis Vottero louis.vot@gmail.com    All rights reserved.
+
+"""
+Per script profiling of process builds.
+
+A BuildProfiler records wall time, cpu time and the growth of peak memory for every script run while it is set on a process,
+and writes them as a Chrome trace timeline into the .profile folder of the process.
+Open the timeline in chrome://tracing or https://ui.perfetto.dev
+
+Usage:
+    python -m vtool.process_manager.build_profile diff old_build.json new_build.json
+    python -m vtool.process_manager.build_profile diff process_path
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import sys
+import time
+import datetime
+import threading
+
+from .. import util
+from .. import util_file
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+profile_folder_name = '.profile'
+
+
+def get_cpu_time():
+    if util.python_version < 3:
+        return time.clock()
+
+    return time.process_time()
+
+
+def get_peak_memory():
+    """
+    Returns:
+        int: Peak resident memory of this process in bytes, or None if it can't be read on this platform.
+    """
+
+    if resource:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # linux reports kilobytes, mac bytes.
+        if sys.platform == 'darwin':
+            return peak
+        return peak * 1024
+
+    if psutil:
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, 'peak_wset', memory_info.rss)
+
+
+def get_profile_folder(process_path):
+    return util_file.join_path(process_path, profile_folder_name)
+
+
+def get_timelines(process_path):
+    """
+    Returns:
+        list: Timeline files of the process, oldest first.
+    """
+
+    folder = get_profile_folder(process_path)
+
+    if not util_file.is_dir(folder):
+        return []
+
+    files = [filename for filename in util_file.get_files(folder) if filename.startswith('build_') and filename.endswith('.json')]
+
+    return [util_file.join_path(folder, filename) for filename in sorted(files)]
+
+
+class BuildProfiler(object):
+    """
+    Records every script a process runs while the profiler is set on it with Process.set_profiler, or with Process.run(profile=True)
+
+    Args:
+        use_cprofile (bool): Also run cProfile per script and save the stats as .prof files next to the timeline.
+    """
+
+    def __init__(self, use_cprofile=False):
+        self.use_cprofile = use_cprofile
+
+        self.events = []
+        self.name = None
+
+        self._stack = []
+        self._profiles = {}
+        self._build_start = None
+        self._build_cpu = None
+        self._thread_id = threading.current_thread().ident
+
+        self._timestamp = datetime.datetime.now().strftime('%Y_%m_%d__%H_%M_%S_%f')
+
+    def _get_microseconds(self, seconds):
+        return int((seconds - self._build_start) * 1000000)
+
+    def start_build(self, name=None):
+        self.name = name
+        self.events = []
+        self._build_start = time.time()
+        self._build_cpu = get_cpu_time()
+
+    def end_build(self):
+        if self._build_start is None:
+            return
+
+        end = time.time()
+
+        self.events.append({'name': self.name or 'build',
+                            'cat': 'build',
+                            'ph': 'X',
+                            'ts': 0,
+                            'dur': self._get_microseconds(end),
+                            'pid': os.getpid(),
+                            'tid': self._thread_id,
+                            'args': {'cpu': get_cpu_time() - self._build_cpu}})
+
+    def start_script(self, script):
+        if self._build_start is None:
+            self.start_build()
+
+        profiler = None
+
+        # cProfile can't nest, scripts run by a script are only timed.
+        if self.use_cprofile and not any(entry[4] for entry in self._stack):
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        self._stack.append((script, time.time(), get_cpu_time(), get_peak_memory(), profiler))
+
+    def end_script(self, status=None):
+        if not self._stack:
+            return
+
+        script, start, cpu_start, memory_start, profiler = self._stack.pop()
+
+        if profiler:
+            profiler.disable()
+
+        end = time.time()
+
+        args = {'script': script,
+                'cpu': get_cpu_time() - cpu_start,
+                'status': status}
+
+        memory_end = get_peak_memory()
+        if memory_start is not None and memory_end is not None:
+            args['peak_memory_delta'] = memory_end - memory_start
+
+        if profiler:
+            self._profiles[len(self.events)] = profiler
+
+        self.events.append({'name': util_file.get_basename(script) or script,
+                            'cat': 'script',
+                            'ph': 'X',
+                            'ts': self._get_microseconds(start),
+                            'dur': int((end - start) * 1000000),
+                            'pid': os.getpid(),
+                            'tid': self._thread_id,
+                            'args': args})
+
+    def get_script_times(self):
+        """
+        Returns:
+            dict: script: wall seconds, summed if the script ran more than once.
+        """
+
+        return get_script_times({'traceEvents': self.events})
+
+    def write(self, process_path):
+        """
+        Write the timeline into the .profile folder of the process.
+
+        Returns:
+            str: The timeline file.
+        """
+
+        folder = util_file.create_dir(profile_folder_name, process_path)
+
+        filepath = util_file.join_path(folder, 'build_%s.json' % self._timestamp)
+
+        for index, profiler in self._profiles.items():
+            event = self.events[index]
+            stats_path = util_file.join_path(folder, 'build_%s_%s_%s.prof' % (self._timestamp, index, event['name']))
+            profiler.dump_stats(stats_path)
+            event['args']['cprofile'] = stats_path
+
+        data = {'traceEvents': self.events,
+                'displayTimeUnit': 'ms',
+                'otherData': {'process': process_path,
+                              'name': self.name,
+                              'date': self._timestamp}}
+
+        util_file.set_json(filepath, data)
+
+        return filepath
+
+
+def get_script_times(timeline):
+    """
+    Args:
+        timeline (dict): Timeline data, or the path to a timeline file.
+
+    Returns:
+        dict: script: wall seconds, summed if the script ran more than once.
+    """
+
+    if util.is_str(timeline):
+        timeline = util_file.get_json(timeline)
+
+    found = {}
+
+    for event in timeline.get('traceEvents', []):
+        if event.get('cat') != 'script':
+            continue
+
+        script = event.get('args', {}).get('script') or event['name']
+
+        found[script] = found.get(script, 0) + event['dur'] / 1000000.0
+
+    return found
+
+
+def diff_timelines(old_timeline, new_timeline):
+    """
+    Returns:
+        list: Rows of [script, old seconds, new seconds, change in seconds], biggest slow down first.
+            Scripts missing from one of the builds have None for its seconds.
+    """
+
+    old_times = get_script_times(old_timeline)
+    new_times = get_script_times(new_timeline)
+
+    rows = []
+
+    for script in set(old_times) | set(new_times):
+        old_seconds = old_times.get(script)
+        new_seconds = new_times.get(script)
+
+        change = (new_seconds or 0) - (old_seconds or 0)
+
+        rows.append([script, old_seconds, new_seconds, change])
+
+    rows.sort(key=lambda row: row[3], reverse=True)
+
+    return rows
+
+
+def show_diff(rows):
+
+    def format_seconds(seconds):
+        if seconds is None:
+            return '-'
+        return '%.3f' % seconds
+
+    print('%10s %10s %10s   %s' % ('old', 'new', 'change', 'script'))
+
+    for script, old_seconds, new_seconds, change in rows:
+        print('%10s %10s %+10.3f   %s' % (format_seconds(old_seconds), format_seconds(new_seconds), change, script))
+
+
+def main(args):
+
+    if len(args) < 2 or args[0] != 'diff':
+        print(__doc__)
+        return 1
+
+    if len(args) == 2:
+        timelines = get_timelines(args[1])
+
+        if len(timelines) < 2:
+            print('Need two builds in %s to diff.' % get_profile_folder(args[1]))
+            return 1
+
+        old_timeline, new_timeline = timelines[-2:]
+    else:
+        old_timeline, new_timeline = args[1:3]
+
+    print('old: %s\nnew: %s\n' % (old_timeline, new_timeline))
+
+    show_diff(diff_timelines(old_timeline, new_timeline))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -4,15 +4,20 @@ from __future__ import absolute_import
 
 import os
 import sys
+import time
 import traceback
 import string
 import subprocess
 import inspect
+import contextlib
 from functools import wraps
 
 from .. import util
 from .. import util_file
 from .. import data
+from . import build_profile
+from . import build_cache
+from . import process_index
 
 in_maya = False
 
@@ -57,6 +62,7 @@ def get_current_process_instance():
 def find_processes(directory=None, return_also_non_process_list=False, stop_at_one=False):
     """
     This will try to find the processes in the supplied directory.
+    The answer comes from the process_index.ProcessIndex of the project.
     
     Args:
         directory(str): The directory to search for processes.
@@ -70,7 +76,11 @@ def find_processes(directory=None, return_also_non_process_list=False, stop_at_o
     found = []
     found_non = []
 
-    if not directory:
+    index = None
+    if directory:
+        index = process_index.ProcessIndex.get(directory)
+
+    if not index:
         if return_also_non_process_list:
             return [found, found_non]
         else:
@@ -79,34 +89,7 @@ def find_processes(directory=None, return_also_non_process_list=False, stop_at_o
 
     log.debug('Find Processes %s' % directory)
 
-    root = directory
-    dirs = []
-    try:
-        dirs = os.listdir(directory)
-    except:
-        pass
-
-    for folder in dirs:
-
-        if stop_at_one:
-            # only check found not found_non, because function is find "processes"
-            if found:
-                break
-
-            if found_non and return_also_non_process_list:
-                break
-
-        if folder.startswith('.'):
-            continue
-
-        full_path = util_file.join_path(directory, folder)
-
-        if is_process(full_path):
-            found.append(folder)
-        else:
-            if return_also_non_process_list:
-                if is_interesting_folder(folder, directory):
-                    found_non.append(folder)
+    found, found_non = index.find_processes(directory, return_also_non_process_list, stop_at_one)
 
     if not return_also_non_process_list:
         return found
@@ -194,6 +177,27 @@ def get_unused_process_name(directory=None, name=None):
 __internal_script_running = None
 
 
+def _run_script_function(process_inst, function, script, hard_error, settings, return_status):
+    """
+    Run the function wrapped by decorator_process_run_script, recording it when the process has a profiler.
+    """
+
+    profiler = process_inst.get_profiler()
+
+    if not profiler:
+        return function(process_inst, script, hard_error, settings, return_status)
+
+    value = None
+
+    profiler.start_script(script)
+    try:
+        value = function(process_inst, script, hard_error, settings, return_status)
+    finally:
+        profiler.end_script(value if return_status else None)
+
+    return value
+
+
 def decorator_process_run_script(function):
     # decorator meant only to work with run_script, not to be used
 
@@ -239,7 +243,7 @@ def decorator_process_run_script(function):
                     if not cmds.ogs(q=True, pause=True):
                         cmds.ogs(pause=True)
 
-                value = function(self, script, hard_error, settings, return_status)
+                value = _run_script_function(self, function, script, hard_error, settings, return_status)
                 if not core.is_batch():
                     if cmds.ogs(q=True, pause=True):
                         cmds.ogs(pause=True)
@@ -253,7 +257,7 @@ def decorator_process_run_script(function):
             cmds.evaluationManager(mode=mode)
 
         else:
-            value = function(self, script, hard_error, settings, return_status)
+            value = _run_script_function(self, function, script, hard_error, settings, return_status)
 
         if 'reset' in locals():
 
@@ -319,6 +323,12 @@ class Process(object):
 
         self._unreal_skeletal_mesh = None
 
+        self._script_timings = {}
+
+        self._profiler = None
+
+        self._build_record = None
+
     def _reset(self):
         self.parts = []
         self.option_values = {}
@@ -611,8 +621,6 @@ class Process(object):
 
     def _source_script(self, script):
 
-        util_file.delete_pyc(script)
-
         put = None
         if self._data_override:
             put = self._data_override._put
@@ -626,6 +634,8 @@ class Process(object):
 
         module = util_file.source_python_module(script)
 
+        self._script_timings[script] = dict(util_file.CodeCache.get_timing(script))
+
         status = None
         init_passed = False
 
@@ -1215,7 +1225,7 @@ class Process(object):
             test_path = util_file.inc_path_name(test_path)
         name = util_file.get_basename(test_path)
 
-        data_folder = data.DataFolder(name, path)
+        data_folder = data.DataFolder(name, path, data_type)
         data_folder.set_data_type(data_type)
 
         return_path = data_folder.folder_path
@@ -1298,6 +1308,15 @@ class Process(object):
 
         data_folder_name = self.get_data_folder(name)
 
+        if self._build_record:
+            self._build_record.add_data(name, None, data_folder_name)
+
+            current_sub_folder = sub_folder
+            if not current_sub_folder and data_folder_name:
+                current_sub_folder = self.get_data_current_sub_folder(name)
+            if current_sub_folder:
+                self._build_record.add_data(name, current_sub_folder, self.get_data_folder(name, current_sub_folder))
+
         if not sub_folder:
             util.show('Import data in: %s' % name)
         if sub_folder:
@@ -1635,26 +1654,20 @@ class Process(object):
 
         return code_names
 
-    def get_code_children(self, code_name):
-
-        found = []
-
-        code_name = util_file.remove_extension(code_name)
-
-        scripts, states = self.get_manifest()
-
-        for script in scripts:
-            if script.find('/') == -1:
-                continue
-
-            if script.startswith(code_name + '/'):
+    def get_code_children(self, code_name, manifest_plan=None):
+        """
+        Args:
+            code_name (str): The script to get the children of.
+            manifest_plan (ManifestPlan): Use this plan instead of reading the manifest again.
 
-                sub_script = script[len(code_name + '/'):]
+        Returns:
+            list: The scripts directly under code_name in the manifest.
+        """
 
-                if not sub_script.find('/') > -1:
-                    found.append(script)
+        if not manifest_plan:
+            manifest_plan = self.get_manifest_plan()
 
-        return found
+        return manifest_plan.get_children(code_name)
 
     def get_code_type(self, name):
         """
@@ -2105,6 +2118,23 @@ class Process(object):
         """
         Get an option by name and group
         """
+
+        value, match_group = self._find_option(name, group)
+
+        if self._build_record:
+            self._build_record.add_option(name, group, value)
+
+        log.info('Get option: name: %s group: %s with value: %s' % (name, match_group, value))
+
+        util.show('Accessed - Option: %s, Group: %s, value: %s' % (name, match_group, value))
+
+        return value
+
+    def _find_option(self, name, group=None):
+        """
+        Returns:
+            tuple: The formatted option value and the group it was found in.
+        """
         self._setup_options()
 
         value = self.get_unformatted_option(name, group)
@@ -2114,7 +2144,7 @@ class Process(object):
             match_value = self.get_option_match_and_group(name, return_first=True)
 
             if not match_value:
-                return None
+                return None, group
             value = match_value[0]
             match_group = match_value[1]
 
@@ -2134,11 +2164,7 @@ class Process(object):
         else:
             value = self._format_option_value(value, name)
 
-        log.info('Get option: name: %s group: %s with value: %s' % (name, group, value))
-
-        util.show('Accessed - Option: %s, Group: %s, value: %s' % (name, group, value))
-
-        return value
+        return value, group
 
     def get_option_match_and_group(self, name, return_first=True):
         """
@@ -2245,6 +2271,24 @@ class Process(object):
         if self.option_settings:
             self.option_settings.clear()
 
+    @contextlib.contextmanager
+    def batch_options(self):
+        """
+        Write options.json once at the end of the with block, instead of once per option added or changed.
+        Options aren't loaded again from the file until the block ends.
+        """
+
+        self._setup_options()
+
+        update_options = self._update_options
+        self._update_options = False
+
+        try:
+            with self.option_settings.batch():
+                yield
+        finally:
+            self._update_options = update_options
+
     def save_default_option_history(self):
         option_file = self.get_option_file()
         version_file = util_file.VersionFile(option_file)
@@ -2348,6 +2392,16 @@ class Process(object):
 
         return manifest_dict
 
+    def get_manifest_plan(self, manifest_file=None):
+        """
+        Returns:
+            ManifestPlan: The manifest as a tree, with parent states pushed down to children.
+        """
+
+        scripts, states = self.get_manifest(manifest_file)
+
+        return ManifestPlan(scripts, states)
+
     def get_manifest_folder(self):
         """
         Returns:
@@ -2801,6 +2855,9 @@ class Process(object):
                     util.show('Could not find script: %s' % orig_script)
                     return
 
+            if self._build_record:
+                self._build_record.add_code(script)
+
             name = util_file.get_basename(script)
 
             for external_code_path in self.external_code_paths:
@@ -2839,7 +2896,11 @@ class Process(object):
                         # for legacy, if process was set to None override it with this process
                         module.process = self
 
-                    result = module.main()
+                    main_start = time.time()
+                    try:
+                        result = module.main()
+                    finally:
+                        self._add_script_execute_time(script, time.time() - main_start)
                     put = None
                     if self._data_override:
                         put = self._data_override._put
@@ -2870,6 +2931,8 @@ class Process(object):
 
         minutes, seconds = watch.end()
 
+        self._show_script_timing(script)
+
         util.global_tabs = 1
 
         message = ''
@@ -2886,6 +2949,30 @@ class Process(object):
         else:
             return result
 
+    def _add_script_execute_time(self, script, seconds):
+        timing = self._script_timings.setdefault(script, {})
+        timing['execute'] = timing.get('execute', 0) + seconds
+
+    def _show_script_timing(self, script):
+        timing = self._script_timings.get(script)
+
+        if not timing or 'compile' not in timing:
+            return
+
+        util.show('Compile: %s seconds (%s)   Execute: %s seconds' % (round(timing['compile'], 4),
+                                                                     timing.get('cache'),
+                                                                     round(timing.get('execute', 0), 4)))
+
+    def get_script_timings(self):
+        """
+        Compile and execute time of the scripts run by this process.
+        Execute includes sourcing the script and its main.
+
+        Returns:
+            dict: script path: {'compile': seconds, 'execute': seconds, 'cache': memory, disk or compiled}
+        """
+        return self._script_timings
+
     def run_option_script(self, name, group=None, hard_error=True):
 
         script = self.get_option(name, group)
@@ -2929,11 +3016,17 @@ class Process(object):
 
         return status
 
-    def run_script_group(self, script, clear_selection=True, hard_error=True):
+    def run_script_group(self, script, clear_selection=True, hard_error=True, manifest_plan=None):
         """
         This runs the script and all of its children/grandchildren.
+
+        Args:
+            manifest_plan (ManifestPlan): Passed down to child groups so the manifest is only read once.
         """
 
+        if not manifest_plan:
+            manifest_plan = self.get_manifest_plan()
+
         status_list = []
         scripts_that_error = []
         skip_children = False
@@ -2967,14 +3060,12 @@ class Process(object):
                 raise Exception(message)
 
         # processing children
-        children = self.get_code_children(script)
+        children = manifest_plan.get_children(script)
         if skip_children:
             children = []
             skip_children = False
         child_count = len(children)
 
-        manifest_dict = self.get_manifest_dict()
-
         progress_bar = None
 
         if in_maya:
@@ -2999,20 +3090,20 @@ class Process(object):
                     raise Exception(message)
                     # break
 
-            if manifest_dict[child]:
+            if manifest_plan.get_entry(child).state:
 
                 if in_maya:
                     if clear_selection:
                         cmds.select(cl=True)
 
-                children = self.get_code_children(child)
+                children = manifest_plan.get_children(child)
                 if skip_children:
                     children = []
                     skip_children = False
 
                 if children:
                     try:
-                        status = self.run_script_group(child, hard_error=True)
+                        status = self.run_script_group(child, hard_error=True, manifest_plan=manifest_plan)
                         if self._skip_children:
                             skip_children = True
                             self._skip_children = None
@@ -3092,9 +3183,124 @@ class Process(object):
 
         return childs
 
-    def run(self, start_new=False):
+    def set_profiler(self, profiler):
+        """
+        Record every script run with a build_profile.BuildProfiler. None stops recording.
+        """
+        self._profiler = profiler
+
+    def get_profiler(self):
+        return self._profiler
+
+    def _get_build_resume_position(self, manifest_plan, build_record):
+        """
+        Check the scripts this build runs against the record of the last incremental build.
+
+        Returns:
+            int: How many scripts at the start of the build are up to date and have a checkpoint to open.
+        """
+
+        position = 0
+        resume_position = 0
+
+        for entry in manifest_plan.get_entries():
+
+            if not entry.state or not entry.enabled or entry.skipped:
+                continue
+
+            reason = build_record.get_invalid_reason(position, entry.script, self.get_data_folder,
+                                                     lambda name, group: self._find_option(name, group)[0])
+
+            if reason:
+                util.show('Incremental build: %s needs to run, %s' % (entry.script, reason))
+                break
+
+            if build_record.previous_entries[position].get('skip_children'):
+                manifest_plan.skip_children(entry.script)
+
+            position += 1
+
+            if build_record.has_checkpoint(position - 1):
+                resume_position = position
+
+        manifest_plan.reset()
+
+        return resume_position
+
+    def _get_checkpoint_state(self):
+
+        put = self._put
+        if self._data_override:
+            put = self._data_override._put
+
+        put_values = {}
+        for key, value in put.__dict__.items():
+            if key != '_cache_feedback':
+                put_values[key] = value
+
+        return {'put': put_values, 'runtime_values': dict(self.runtime_values)}
+
+    def _set_checkpoint_state(self, state):
+
+        put = Put()
+        for key, value in state['put'].items():
+            put.__dict__[key] = value
+
+        if self._data_override:
+            self._data_override._put = put
+        else:
+            self._put = put
+
+        self.runtime_values = state['runtime_values']
+
+    def _open_checkpoint(self, build_record, index):
+        """
+        Open the checkpoint saved after the script at index in the last incremental build.
+        If it can't be opened, the record is cleared so the build runs every script.
+
+        Returns:
+            bool: Whether the checkpoint was opened.
+        """
+
+        script = build_record.previous_entries[index]['script']
+
+        util.show('\nOpening checkpoint after %s\n' % script)
+
+        try:
+            state = build_record.load_checkpoint(index)
+        except Exception:
+            util.error(traceback.format_exc())
+            util.warning('Could not open the checkpoint after %s. Running every script.' % script)
+
+            build_record.clear()
+
+            if in_maya:
+                core.start_new_scene()
+
+            return False
+
+        self._set_checkpoint_state(state)
+
+        return True
+
+    def clear_build_record(self):
+        """
+        Remove the record and checkpoints of incremental builds, so the next one runs every script.
+        """
+        build_cache.BuildRecord(self.get_path()).clear()
+
+    def run(self, start_new=False, profile=False, use_cprofile=False, incremental=False):
         """
         Run all the scripts in the manifest, respecting their on/off state.
+
+        Args:
+            start_new (bool): Start a new scene first.
+            profile (bool): Write a timeline of the build into the .profile folder of the process.
+                Diff two builds with python -m vtool.process_manager.build_profile diff
+            use_cprofile (bool): With profile, also save cProfile stats per script.
+            incremental (bool): Record the code, data and options each script uses and save a checkpoint after it.
+                Scripts at the start of the manifest that haven't changed since the last incremental build are skipped,
+                and the build starts from the checkpoint of the last one.
         
         Returns:
             None
@@ -3145,107 +3351,150 @@ class Process(object):
 
         scripts_that_error = []
 
-        state_dict = {}
+        manifest_plan = ManifestPlan(scripts, states)
+
+        previous_profiler = self._profiler
+        if profile:
+            self._profiler = build_profile.BuildProfiler(use_cprofile)
+            self._profiler.start_build(name)
 
         progress_bar = None
 
-        if in_maya:
-            progress_bar = core.ProgressBar('Process', len(scripts))
-            progress_bar.status('Processing: getting ready...')
+        try:
+            if in_maya:
+                progress_bar = core.ProgressBar('Process', len(scripts))
+                progress_bar.status('Processing: getting ready...')
 
-        status_list = []
-        skip_children = None
+            status_list = []
 
-        for inc in range(0, len(scripts)):
+            build_record = None
+            resume_position = 0
+            run_position = 0
 
-            state = states[inc]
-            script = scripts[inc]
-            status = 'Skipped'
+            if incremental:
+                build_record = build_cache.BuildRecord(self.get_path())
+                resume_position = self._get_build_resume_position(manifest_plan, build_record)
 
-            check_script = util_file.remove_extension(script)
+                if resume_position and not self._open_checkpoint(build_record, resume_position - 1):
+                    resume_position = 0
 
-            if skip_children:
-                if script.startswith(skip_children):
-                    state = False
+            for entry in manifest_plan.get_entries():
 
-            state_dict[check_script] = state
+                script = entry.script
+                state = entry.state and not entry.skipped
+                status = 'Skipped'
 
-            if progress_bar:
-                progress_bar.status('Processing: %s' % script)
+                if progress_bar:
+                    progress_bar.status('Processing: %s' % script)
 
-                if progress_bar.break_signaled():
-                    break
+                    if progress_bar.break_signaled():
+                        break
 
-            if state:
+                if state:
 
-                parent_state = True
+                    if not entry.enabled:
+                        util.show('\tSkipping: %s\n\n' % script)
+                        if progress_bar:
+                            progress_bar.inc()
+                        continue
 
-                for key in state_dict:
+                    if run_position < resume_position:
+                        util.show('\tUp to date: %s' % script)
 
-                    if script.find(key) > -1:
-                        parent_state = state_dict[key]
+                        build_record.add_cached(run_position)
+                        if build_record.previous_entries[run_position].get('skip_children'):
+                            manifest_plan.skip_children(script)
 
-                        if parent_state == False:
-                            break
+                        run_position += 1
 
-                if not parent_state:
-                    util.show('\tSkipping: %s\n\n' % script)
-                    if progress_bar:
-                        progress_bar.inc()
-                    continue
+                        if progress_bar:
+                            progress_bar.inc()
 
-                self._update_options = False
+                        status_list.append([script, 'Cached'])
+                        continue
 
-                if in_maya:
-                    cmds.select(cl=True)
-                try:
-                    status = self.run_script(script, hard_error=False, return_status=True)
-                    if self._skip_children:
-                        skip_children = check_script
-                        self._skip_children = None
-                except Exception:
-                    error = traceback.format_exc()
-                    util.error(error)
-                    status = 'fail'
-                self._update_options = True
-
-                if not status == 'Success':
-                    scripts_that_error.append(script)
-
-            if not states[inc]:
-                util.show('\n------------------------------------------------')
-                util.show('Skipping: %s\n\n' % script)
+                    self._update_options = False
 
-            if progress_bar:
-                progress_bar.inc()
+                    if build_record:
+                        self._build_record = build_record
+                        build_record.start_script(script)
 
-            status_list.append([script, status])
+                    skipped_children = False
 
-        minutes, seconds = watch.stop()
+                    if in_maya:
+                        cmds.select(cl=True)
+                    try:
+                        status = self.run_script(script, hard_error=False, return_status=True)
+                        if self._skip_children:
+                            manifest_plan.skip_children(script)
+                            self._skip_children = None
+                            skipped_children = True
+                    except Exception:
+                        error = traceback.format_exc()
+                        util.error(error)
+                        status = 'fail'
+                    self._update_options = True
 
-        if progress_bar:
-            progress_bar.end()
+                    if build_record:
+                        self._build_record = None
+                        build_record.end_script(status, skipped_children)
+
+                        if status == 'Success':
+                            build_record.save_checkpoint(run_position, self._get_checkpoint_state())
+
+                    run_position += 1
+
+                    if not status == 'Success':
+                        scripts_that_error.append(script)
+
+                if not entry.state:
+                    util.show('\n------------------------------------------------')
+                    util.show('Skipping: %s\n\n' % script)
+
+                if progress_bar:
+                    progress_bar.inc()
+
+                status_list.append([script, status])
 
-        if scripts_that_error:
+            minutes, seconds = watch.stop()
 
-            util.show('\n\n\nThe following scripts errored during build:\n')
-            for script in scripts_that_error:
-                util.show('\n' + script)
+            if build_record:
+                build_record.write()
 
-        if minutes is None:
-            util.show('\n\n\nProcess built in %s seconds.\n\n' % seconds)
-        if minutes is not None:
-            util.show('\n\n\nProcess built in %s minutes, %s seconds.\n\n' % (minutes, seconds))
+                if resume_position:
+                    util.show('\n\nIncremental build skipped %s up to date scripts and ran %s.' % (resume_position,
+                                                                                               run_position - resume_position))
 
-        util.show('\n\n')
-        for status_entry in status_list:
-            util.show('%s : %s' % (status_entry[1], status_entry[0]))
-        util.show('\n\n')
+            if scripts_that_error:
 
-        util.set_env('VETALA_CURRENT_PROCESS', prev_process)
+                util.show('\n\n\nThe following scripts errored during build:\n')
+                for script in scripts_that_error:
+                    util.show('\n' + script)
 
-        if manage_node_editor_inst:
-            manage_node_editor_inst.restore_add_new_nodes()
+            if minutes is None:
+                util.show('\n\n\nProcess built in %s seconds.\n\n' % seconds)
+            if minutes is not None:
+                util.show('\n\n\nProcess built in %s minutes, %s seconds.\n\n' % (minutes, seconds))
+
+            util.show('\n\n')
+            for status_entry in status_list:
+                util.show('%s : %s' % (status_entry[1], status_entry[0]))
+            util.show('\n\n')
+        finally:
+            if progress_bar:
+                progress_bar.end()
+
+            if profile:
+                # written even when the build stopped on an error, with the scripts that ran.
+                self._profiler.end_build()
+                timeline = self._profiler.write(self.get_path())
+                util.show('Build timeline: %s' % timeline)
+                self._profiler = previous_profiler
+
+            util.set_env('VETALA_CURRENT_PROCESS', prev_process)
+
+            if manage_node_editor_inst:
+                manage_node_editor_inst.restore_add_new_nodes()
 
         return status_list
 
@@ -3364,6 +3613,206 @@ class Process(object):
         return self._unreal_skeletal_mesh
 
 
+class ManifestEntry(object):
+    """
+    One script in a ManifestPlan.
+    """
+
+    def __init__(self, script, state, index):
+        self.script = script
+        self.path = util_file.remove_extension(script)
+        self.state = state
+        self.index = index
+
+        self.parent = None
+        self.children = []
+
+        # enabled is the entry's state and the state of every parent above it.
+        self.enabled = state
+        self.skipped = False
+
+
+class ManifestPlan(object):
+    """
+    The manifest parsed once into a tree. A script is the child of the script whose path is its folder, eg. rig/arm.py is a child of rig.py.
+    The enabled state of parents is pushed down to their children in one pass when the plan is made.
+    Process.run, Process.run_script_group and the process manager run use it instead of checking parents per script.
+
+    Args:
+        scripts (list): Script names from the manifest.
+        states (list): Their on/off states.
+    """
+
+    def __init__(self, scripts, states=None):
+
+        self._entries = []
+        self._entry_dict = {}
+        self._children = {}
+
+        scripts = scripts or []
+        states = states or []
+
+        for inc, script in enumerate(scripts):
+
+            state = False
+            if inc < len(states):
+                state = states[inc]
+
+            entry = ManifestEntry(script, state, inc)
+
+            self._entries.append(entry)
+            self._entry_dict[entry.path] = entry
+
+            parent_path = self._get_parent_path(entry.path)
+
+            if parent_path is not None:
+                self._children.setdefault(parent_path, []).append(entry)
+
+        for entry in self._entries:
+            entry.children = self._children.get(entry.path, [])
+            entry.parent = self._get_parent_entry(entry.path)
+
+        self._propagate()
+
+    def _get_parent_path(self, path):
+        if path.find('/') == -1:
+            return
+
+        return path[:path.rfind('/')]
+
+    def _get_parent_entry(self, path):
+        """
+        The nearest script above path in the manifest. With a and a/b/c listed but not a/b, a/b/c is under a.
+        """
+
+        parent_path = self._get_parent_path(path)
+
+        while parent_path is not None:
+            entry = self._entry_dict.get(parent_path)
+            if entry:
+                return entry
+            parent_path = self._get_parent_path(parent_path)
+
+    def _propagate(self):
+        """
+        Parents come before their children in a manifest, so one pass in order is enough.
+        A parent listed after its child is resolved when the child is reached.
+        """
+
+        resolved = set()
+
+        for entry in self._entries:
+            self._resolve(entry, resolved)
+
+    def _resolve(self, entry, resolved):
+
+        if entry.index in resolved:
+            return entry.enabled
+
+        resolved.add(entry.index)
+
+        enabled = bool(entry.state)
+
+        if entry.parent and not self._resolve(entry.parent, resolved):
+            enabled = False
+
+        entry.enabled = enabled
+
+        return enabled
+
+    def _get_path(self, script):
+        return util_file.remove_extension(script)
+
+    def get_entries(self):
+        """
+        Returns:
+            list: ManifestEntry instances in manifest order.
+        """
+        return list(self._entries)
+
+    def get_entry(self, script):
+        """
+        Args:
+            script (str): Script name, with or without .py
+
+        Returns:
+            ManifestEntry
+        """
+        return self._entry_dict.get(self._get_path(script))
+
+    def get_scripts(self):
+        return [entry.script for entry in self._entries]
+
+    def get_states(self):
+        return [entry.state for entry in self._entries]
+
+    def get_children(self, script):
+        """
+        Returns:
+            list: Names of the scripts directly under script, in manifest order.
+        """
+        return [entry.script for entry in self._children.get(self._get_path(script), [])]
+
+    def get_descendants(self, script):
+        """
+        Returns:
+            list: ManifestEntry instances of the children, grandchildren etc. of script.
+        """
+
+        found = []
+
+        stack = list(reversed(self._children.get(self._get_path(script), [])))
+
+        while stack:
+            entry = stack.pop()
+            found.append(entry)
+            stack += reversed(self._children.get(entry.path, []))
+
+        return found
+
+    def is_enabled(self, script):
+        """
+        Returns:
+            bool: Whether the script and all its parents are on.
+        """
+
+        entry = self.get_entry(script)
+
+        if not entry:
+            return False
+
+        return entry.enabled
+
+    def is_runnable(self, script):
+        """
+        Returns:
+            bool: Whether the script is enabled and wasn't skipped with skip_children.
+        """
+
+        entry = self.get_entry(script)
+
+        if not entry:
+            return False
+
+        return entry.enabled and not entry.skipped
+
+    def skip_children(self, script):
+        """
+        Skip everything under script for the rest of the run. Used when a script calls process.skip_children()
+        """
+
+        for entry in self.get_descendants(script):
+            entry.skipped = True
+
+    def reset(self):
+        """
+        Clear skip_children from a previous run.
+        """
+
+        for entry in self._entries:
+            entry.skipped = False
+
+
 class Put(dict):
     """
     keeps data between code runs
@@ -3442,78 +3891,256 @@ def copy(source_file_or_folder, target_file_or_folder, description=''):
         version.save('Copied from %s' % source_file_or_folder)
 
 
-def copy_process(source_process, target_directory=None):
+class ProcessCopy(object):
     """
-    source process is an instance of a process that you want to copy 
-    target_process is the instance of a process you want to copy to. 
-    If no target_process is specified, the target process will be set to the directory where the source process is located automatically. 
-    If there is already a process named the same in the target process, the name will be incremented. 
-    If you need to give the copy a specific name, you should rename it after copy. 
-    
+    Copy a process with its data, code, settings and sub processes.
+
+    The whole copy is planned first. Then the processes, data folders and code folders are made in the target,
+    every file is copied on the thread pool of a util_file.CopyPlan, and the first version of each data and code is saved from its copy.
+
     Args:
-        source_process (instance): The instance of a process.
-        target_directory (str): TODO: Fill description.
+        source_process (Process): The process to copy.
+        target_directory (str): Where to put the copy. Defaults to the directory of the source process.
+        threads (int): How many files to copy at once.
     """
 
-    if target_directory:
-        parent_directory = util_file.get_dirname(target_directory)
+    def __init__(self, source_process, target_directory=None, threads=None):
+        self.source_process = source_process
+        self.target_directory = target_directory
 
-        if parent_directory:
-            if parent_directory == source_process.get_path():
-                util.error('Cannot paste parent under child.  Causes recursion error')
-                return
+        if not self.target_directory:
+            self.target_directory = util_file.get_dirname(source_process.get_path())
 
-    sub_folders = source_process.get_sub_processes()
+        self.copy_plan = util_file.CopyPlan(threads)
 
-    source_name = source_process.get_name()
-    source_name = source_name.split('/')[-1]
+        self.new_name = None
 
-    if not target_directory:
-        target_directory = util_file.get_dirname(source_process.get_path())
+        # [source process, target path, data items, code items, setting files]
+        self.processes = []
 
-    if not util_file.get_permission(target_directory):
-        util.warning('Could not get permission in directory: %s' % target_directory)
-        return
+    def _get_data_items(self, source_process, parent_folder=None):
+        """
+        Returns:
+            list: [parent folder, data name, data type, sub folder, file] for every data and data sub folder.
+        """
 
-    new_name = get_unused_process_name(target_directory, source_name)
+        items = []
 
-    new_process = Process()
-    new_process.set_directory(target_directory)
-    new_process.load(new_name)
-    new_process.create()
+        source_process.set_data_parent_folder(parent_folder)
 
-    data_folders = source_process.get_data_folders()
-    code_folders = source_process.get_code_folders()
-    settings = source_process.get_setting_names()
+        data_path = source_process.get_data_path()
+        data_folders = source_process.get_data_folders()
 
-    for data_folder in data_folders:
-        copy_process_data(source_process, new_process, data_folder)
+        source_process.set_data_parent_folder(None)
 
-    manifest_found = False
+        for data_name in data_folders:
+
+            data_type = source_process.get_data_type(data_name)
+
+            if not data_type:
+                # a folder of data, same as copy_process_data only one level deep
+                if not parent_folder:
+                    items += self._get_data_items(source_process, data_name)
+                continue
+
+            instance = data.DataFolder(data_name, data_path).get_folder_data_instance()
+
+            if not instance:
+                util.warning('Could not get data folder instances for: %s' % data_name)
+                continue
+
+            items.append([parent_folder, data_name, data_type, None, instance.get_file_direct()])
+
+            sub_path = util_file.join_path(data_path, '%s/.sub' % data_name)
+
+            if util_file.is_dir(sub_path):
+                for sub_folder in util_file.get_folders(sub_path):
+                    items.append([parent_folder, data_name, data_type, sub_folder, instance.get_file_direct(sub_folder)])
+
+        return items
+
+    def _get_code_items(self, source_process):
+        """
+        Returns:
+            list: [code name, code type, file] for every code folder, the manifest last.
+        """
+
+        items = []
+
+        code_folders = source_process.get_code_folders() or []
 
-    if code_folders:
         if 'manifest' in code_folders:
             code_folders.remove('manifest')
-            manifest_found = True
+            code_folders.append('manifest')
 
-        for code_folder in code_folders:
-            copy_process_code(source_process, new_process, code_folder)
+        for code_name in code_folders:
+
+            data_type = source_process.get_code_type(code_name)
 
-    for sub_folder in sub_folders:
+            if not data_type:
+                util.warning('No data type found for %s' % code_name)
+                continue
 
-        sub_process = new_process.get_sub_process(sub_folder)
-        source_sub_process = source_process.get_sub_process(sub_folder)
+            instance = data.DataFolder(code_name, source_process.get_code_path()).get_folder_data_instance()
 
-        if not sub_process.is_process():
-            copy_process(source_sub_process, new_process.get_path())
+            if not instance:
+                continue
 
-    if manifest_found:
-        copy_process_code(source_process, new_process, 'manifest')
+            items.append([code_name, data_type, instance.get_file()])
 
-    for setting in settings:
-        copy_process_setting(source_process, new_process, setting)
+        return items
+
+    def _plan_process(self, source_process, target_path):
+
+        source_path = source_process.get_path()
+
+        data_items = self._get_data_items(source_process)
+        code_items = self._get_code_items(source_process)
+
+        settings = []
+        for setting_name in source_process.get_setting_names():
+            filepath = source_process.get_setting_file(setting_name)
+            if filepath and util_file.is_file(filepath):
+                settings.append(filepath)
+
+        self.processes.append([source_process, target_path, data_items, code_items, settings])
+
+        versioned = [item[-1] for item in data_items + code_items]
+
+        for filepath in versioned + settings:
+
+            if not util_file.exists(filepath):
+                util.warning('Nothing to copy: %s          Data was probably created but not saved to yet. '
+                             % util_file.get_dirname(filepath))
+                continue
+
+            relative = os.path.relpath(filepath, source_path).replace('\\', '/')
+            destination = util_file.join_path(target_path, relative)
+
+            self.copy_plan.add(filepath, destination)
+
+            if filepath in versioned:
+                self.copy_plan.add_version(destination, 'Copied from %s' % filepath)
+
+        for sub_name in source_process.get_sub_processes():
+            sub_process = source_process.get_sub_process(sub_name)
+            self._plan_process(sub_process, util_file.join_path(target_path, sub_name))
+
+    def _create_process(self, target_path, data_items, code_items):
+
+        target_process = Process(util_file.get_basename(target_path))
+        target_process.set_directory(util_file.get_dirname(target_path))
+        target_process.create()
+
+        for parent_folder, data_name, data_type, sub_folder, filepath in data_items:
+
+            target_process.set_data_parent_folder(parent_folder)
+
+            if not target_process.is_data_folder(data_name, sub_folder):
+                target_process.create_data(data_name, data_type, sub_folder)
+
+            target_process.set_data_parent_folder(None)
+
+        for code_name, data_type, filepath in code_items:
+            if not target_process.is_code_folder(code_name):
+                target_process.create_code(code_name, data_type)
+
+    def plan(self):
+        """
+        Work out the name of the copy and every file to copy.
+
+        Returns:
+            bool: False if the copy can't be made.
+        """
+
+        if util_file.get_dirname(self.target_directory) == self.source_process.get_path():
+            util.error('Cannot paste parent under child.  Causes recursion error')
+            return False
+
+        if not util_file.get_permission(self.target_directory):
+            util.warning('Could not get permission in directory: %s' % self.target_directory)
+            return False
+
+        source_name = self.source_process.get_name().split('/')[-1]
+
+        self.new_name = get_unused_process_name(self.target_directory, source_name)
+
+        self.processes = []
+        self._plan_process(self.source_process, util_file.join_path(self.target_directory, self.new_name))
+
+        return True
+
+    def run(self, dry_run=False, progress=None):
+        """
+        Args:
+            dry_run (bool): Only plan and show what would be copied.
+            progress (function): See util_file.CopyPlan.run
+
+        Returns:
+            dict: processes, files, bytes and versions. After a copy also skipped files, errors and seconds. None if the copy can't be made.
+        """
+
+        if not self.plan():
+            return
+
+        report = {'processes': len(self.processes),
+                  'files': self.copy_plan.get_file_count(),
+                  'bytes': self.copy_plan.get_size(),
+                  'versions': len(self.copy_plan.versions)}
+
+        if dry_run:
+            util.show('Copy of %s to %s would make %s processes, copy %s files, %s MB, and save %s versions.' % (
+                self.source_process.get_path(), util_file.join_path(self.target_directory, self.new_name),
+                report['processes'], report['files'], round(report['bytes'] / 1048576.0, 2), report['versions']))
+            return report
+
+        for source_process, target_path, data_items, code_items, settings in self.processes:
+            self._create_process(target_path, data_items, code_items)
+
+        report.update(self.copy_plan.run(progress))
+
+        util.show('Finished copying %s to %s: %s files, %s MB in %s seconds. %s files were already the same.' % (
+            self.source_process.get_path(), util_file.join_path(self.target_directory, self.new_name),
+            report['files'], round(report['bytes'] / 1048576.0, 2), report['seconds'], report['skipped']))
+
+        return report
+
+    def get_target_process(self):
+
+        target_process = Process()
+        target_process.set_directory(self.target_directory)
+        target_process.load(self.new_name)
+
+        return target_process
+
+
+def copy_process(source_process, target_directory=None, dry_run=False, threads=None):
+    """
+    source process is an instance of a process that you want to copy 
+    target_process is the instance of a process you want to copy to. 
+    If no target_process is specified, the target process will be set to the directory where the source process is located automatically. 
+    If there is already a process named the same in the target process, the name will be incremented. 
+    If you need to give the copy a specific name, you should rename it after copy. 
+    
+    Args:
+        source_process (instance): The instance of a process.
+        target_directory (str): TODO: Fill description.
+        dry_run (bool): Don't copy, show and return what the copy would do. See ProcessCopy.run
+        threads (int): How many files to copy at once.
+
+    Returns:
+        Process: The copy.
+    """
+
+    process_copy = ProcessCopy(source_process, target_directory, threads)
+
+    if dry_run:
+        return process_copy.run(dry_run=True)
+
+    if process_copy.run() is None:
+        return
 
-    return new_process
+    return process_copy.get_target_process()
 
 
 def copy_process_into(source_process, target_process, merge_sub_folders=False):
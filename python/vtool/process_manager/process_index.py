@@ -0,0 +1,402 @@
+# Copyright (C) 2022 Louis Vottero louis.vot@gmail.com    All rights reserved.
+
+"""
+An index of the process tree of a project, so browsing it doesn't list and stat every folder again.
+
+The first time a project is opened its tree is walked once with os.scandir.
+Every folder is kept as a node with its mtime, its entries and whether it is a process, and a process also keeps its data and code folder names.
+A node is trusted for max_age seconds after it was checked, then its mtime is compared again and only folders that changed are listed again.
+Folders created, deleted or renamed through util_file are dropped from the index right away.
+
+The index is saved in the temp folder and loaded the next time the project is opened.
+"""
+
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import time
+import atexit
+import hashlib
+
+from .. import util_file
+
+from vtool import logger
+
+log = logger.get_logger(__name__)
+
+
+def _get_path(directory):
+    return util_file.fix_slashes(os.path.abspath(directory))
+
+
+def _is_interesting_entry(name, is_dir):
+    """
+    Same check as process.is_interesting_folder.
+    """
+
+    if name.find('.') > -1:
+        return not name.startswith('.') and is_dir
+
+    return True
+
+
+class ProcessIndex(object):
+    """
+    Index of the processes under root.
+
+    Args:
+        root (str): The project folder.
+    """
+
+    # root: ProcessIndex
+    indexes = {}
+
+    # Seconds a checked folder is trusted before its mtime is checked again.
+    max_age = 5.0
+
+    # Seconds between saves of an index that changed.
+    save_seconds = 10.0
+
+    # build stops walking after this many folders, the rest are listed when they are first used.
+    max_build_folders = 20000
+
+    version = 1
+
+    def __init__(self, root):
+        self.root = _get_path(root)
+
+        # path: {'mtime', 'entries': [[name, is_dir]], 'is_process', 'data', 'data_mtime', 'code', 'code_mtime'}
+        self.nodes = {}
+
+        # parent path: set of node paths directly under it, so invalidate only walks the folders it drops.
+        self._children = {}
+
+        self.scans = 0
+
+        self._checked = {}
+        self._dirty = False
+        self._saved = 0
+
+    @classmethod
+    def get(cls, directory):
+        """
+        The index of the project directory is in, made and loaded or walked if there isn't one yet.
+
+        Returns:
+            ProcessIndex: None if directory isn't a folder.
+        """
+
+        path = _get_path(directory)
+
+        for root, index in cls.indexes.items():
+            if path == root or path.startswith(root + '/'):
+                return index
+
+        if not os.path.isdir(path):
+            return
+
+        index = cls(path)
+
+        if not index.load():
+            index.build()
+
+        cls.indexes[path] = index
+
+        return index
+
+    @classmethod
+    def invalidate(cls, path):
+        """
+        Forget path, everything under it and its parent folder in every index.
+        """
+
+        path = _get_path(path)
+        parent = util_file.get_dirname(path)
+
+        for index in cls.indexes.values():
+            index._remove_node(parent)
+            index._remove_tree(path)
+
+    @classmethod
+    def clear(cls):
+        cls.indexes.clear()
+
+    @classmethod
+    def save_all(cls):
+        for index in cls.indexes.values():
+            if index._dirty:
+                index.save()
+
+    def _set_nodes(self, nodes):
+        self.nodes = nodes
+        self._checked = {}
+        self._children = {}
+
+        for path in nodes:
+            self._children.setdefault(util_file.get_dirname(path), set()).add(path)
+
+    def _add_node(self, path, node):
+        if path not in self.nodes:
+            self._children.setdefault(util_file.get_dirname(path), set()).add(path)
+
+        self.nodes[path] = node
+
+    def _remove_node(self, path):
+        self._checked.pop(path, None)
+
+        if self.nodes.pop(path, None) is None:
+            return
+
+        parent = util_file.get_dirname(path)
+        children = self._children.get(parent)
+
+        if children is not None:
+            children.discard(path)
+            if not children:
+                self._children.pop(parent)
+
+        self._dirty = True
+
+    def _remove_tree(self, path):
+        """
+        Remove the node of path and every node under it, found through _children, not by checking every node.
+        """
+
+        stack = [path]
+
+        while stack:
+            node_path = stack.pop()
+
+            stack += self._children.get(node_path, ())
+
+            self._remove_node(node_path)
+
+    def _get_index_file(self):
+        name = hashlib.sha1(self.root.encode('utf-8')).hexdigest()
+        return util_file.join_path(util_file.get_temp_dir(), 'vetala_process_index/%s.json' % name)
+
+    def _list(self, directory):
+        """
+        Returns:
+            tuple: (mtime, [[name, is_dir]]) or (None, None) if the folder can't be read.
+        """
+
+        try:
+            mtime = os.stat(directory).st_mtime
+
+            if hasattr(os, 'scandir'):
+                entries = [[entry.name, entry.is_dir()] for entry in os.scandir(directory)]
+            else:
+                entries = [[name, os.path.isdir(os.path.join(directory, name))] for name in os.listdir(directory)]
+        except OSError:
+            return None, None
+
+        self.scans += 1
+
+        # A folder changed this recently could change again within the same mtime, it is listed again next time.
+        if time.time() - mtime < util_file.ScanCache.racy_seconds:
+            mtime = -1
+
+        return mtime, entries
+
+    def _list_names(self, directory):
+        mtime, entries = self._list(directory)
+
+        if entries is None:
+            return None, []
+
+        return mtime, [name for name, is_dir in entries if is_dir]
+
+    def _scan(self, directory):
+        mtime, entries = self._list(directory)
+
+        if entries is None:
+            self._remove_node(directory)
+            return
+
+        node = {'mtime': mtime,
+                'entries': entries,
+                'is_process': False}
+
+        for name, is_dir in entries:
+            if name == '.code' and is_dir:
+                node['is_process'] = True
+
+        if node['is_process']:
+            node['data_mtime'], node['data'] = self._list_names(directory + '/.data')
+            node['code_mtime'], node['code'] = self._list_names(directory + '/.code')
+
+        self._add_node(directory, node)
+        self._checked[directory] = time.time()
+        self._dirty = True
+
+        return node
+
+    def _is_current(self, mtime, path):
+        try:
+            return os.stat(path).st_mtime == mtime
+        except OSError:
+            return mtime is None
+
+    def _get_node(self, directory):
+
+        node = self.nodes.get(directory)
+
+        if node is None:
+            return self._scan(directory)
+
+        if time.time() - self._checked.get(directory, 0) < self.max_age:
+            return node
+
+        if not self._is_current(node['mtime'], directory):
+            return self._scan(directory)
+
+        if node['is_process']:
+            if not self._is_current(node['data_mtime'], directory + '/.data'):
+                node['data_mtime'], node['data'] = self._list_names(directory + '/.data')
+                self._dirty = True
+            if not self._is_current(node['code_mtime'], directory + '/.code'):
+                node['code_mtime'], node['code'] = self._list_names(directory + '/.code')
+                self._dirty = True
+
+        self._checked[directory] = time.time()
+
+        return node
+
+    def build(self):
+        """
+        Walk the whole tree under root. Folders starting with . aren't walked.
+        """
+
+        self._set_nodes({})
+
+        stack = [self.root]
+
+        while stack and len(self.nodes) < self.max_build_folders:
+            directory = stack.pop()
+
+            node = self._scan(directory)
+
+            if not node:
+                continue
+
+            for name, is_dir in node['entries']:
+                if is_dir and not name.startswith('.'):
+                    stack.append(directory + '/' + name)
+
+        log.info('Indexed %s folders in %s' % (len(self.nodes), self.root))
+
+        self.save()
+
+    def load(self):
+        """
+        Load the index saved for root. Its folders are checked again the first time they are used.
+
+        Returns:
+            bool: Whether there was an index to load.
+        """
+
+        filepath = self._get_index_file()
+
+        if not util_file.is_file(filepath):
+            return False
+
+        try:
+            saved = util_file.get_json(filepath)
+        except Exception:
+            return False
+
+        if not saved or saved.get('version') != self.version or saved.get('root') != self.root:
+            return False
+
+        self._set_nodes(saved['nodes'])
+
+        return True
+
+    def save(self):
+        filepath = self._get_index_file()
+
+        util_file.create_dir(util_file.get_dirname(filepath))
+
+        util_file.set_json(filepath, {'version': self.version, 'root': self.root, 'nodes': self.nodes}, atomic=True)
+
+        self._dirty = False
+        self._saved = time.time()
+
+    def save_if_dirty(self):
+        if self._dirty and time.time() - self._saved > self.save_seconds:
+            self.save()
+
+    def _is_process(self, path):
+        node = self._get_node(path)
+
+        if not node:
+            return False
+
+        return node['is_process']
+
+    def is_process(self, directory):
+        return self._is_process(_get_path(directory))
+
+    def find_processes(self, directory, return_also_non_process_list=False, stop_at_one=False):
+        """
+        Same as process.find_processes, answered from the index.
+        """
+
+        directory = _get_path(directory)
+
+        found = []
+        found_non = []
+
+        node = self._get_node(directory)
+
+        for name, is_dir in (node or {}).get('entries', []):
+
+            if stop_at_one:
+                if found:
+                    break
+
+                if found_non and return_also_non_process_list:
+                    break
+
+            if name.startswith('.'):
+                continue
+
+            if is_dir and self._is_process(directory + '/' + name):
+                found.append(name)
+            elif return_also_non_process_list and _is_interesting_entry(name, is_dir):
+                found_non.append(name)
+
+        self.save_if_dirty()
+
+        return found, found_non
+
+    def get_data_folders(self, process_path):
+        node = self._get_node(_get_path(process_path))
+
+        if not node or not node['is_process']:
+            return []
+
+        return [name for name in node['data'] if name != '.sub']
+
+    def get_code_folders(self, process_path):
+        node = self._get_node(_get_path(process_path))
+
+        if not node or not node['is_process']:
+            return []
+
+        return list(node['code'])
+
+    def get_processes(self):
+        """
+        Returns:
+            list: Every process path in the index, without checking the folders again.
+        """
+
+        return sorted([path for path, node in self.nodes.items() if node['is_process']])
+
+
+util_file.ScanCache.callbacks.append(ProcessIndex.invalidate)
+
+atexit.register(ProcessIndex.save_all)
@@ -426,6 +426,8 @@ class CodeCompleter(qt_ui.PythonCompleter):
         super(CodeCompleter, self).__init__()
         self._put_list = None
 
+        util_file.SymbolIndex.request(get_process_file())
+
     def keyPressEvent(self):
         return
 
@@ -514,14 +516,14 @@ class CodeCompleter(qt_ui.PythonCompleter):
                 if module_name in assign_map:
                     return []
 
-            process_file = process.__file__
+            process_file = get_process_file()
 
-            if process_file.endswith('.pyc'):
-                process_file = process_file[:-4] + '.py'
+            members = util_file.SymbolIndex.get_class_members(process_file, 'Process')
 
-            functions, _ = util_file.get_ast_class_sub_functions(process_file, 'Process')
+            if not members:
+                return
 
-            return functions
+            return members[0]
 
         if module_name == 'cmds' or module_name == 'mc':
 
@@ -547,6 +549,16 @@ class CodeCompleter(qt_ui.PythonCompleter):
                 return functions
 
 
+def get_process_file():
+
+    process_file = process.__file__
+
+    if process_file.endswith('.pyc'):
+        process_file = process_file[:-4] + '.py'
+
+    return process_file
+
+
 def get_put(text):
     puts = []
 
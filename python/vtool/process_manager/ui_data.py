@@ -2152,6 +2152,8 @@ class SaveSkinFileWidget(DataSaveFileWidget):
 
         version_up = qt.QCheckBox('Version Up on Export')
         single_file = qt.QCheckBox('Single File')
+        binary = qt.QCheckBox('Binary')
+        incremental = qt.QCheckBox('Only Write Changed Influences')
         blend_weights = qt.QCheckBox('Dual Quaternion Blend Weights')
         long_names = qt.QCheckBox('Force Long Mesh Names')
 
@@ -2160,6 +2162,8 @@ class SaveSkinFileWidget(DataSaveFileWidget):
         sub_layout1.addWidget(blend_weights)
         sub_layout1.addWidget(version_up)
         sub_layout1.addWidget(single_file)
+        sub_layout1.addWidget(binary)
+        sub_layout1.addWidget(incremental)
         sub_layout1.addWidget(long_names)
         sub_layout1.addStretch(1)
 
@@ -2178,6 +2182,8 @@ class SaveSkinFileWidget(DataSaveFileWidget):
 
         self.version_up = version_up
         self.single_file = single_file
+        self.binary = binary
+        self.incremental = incremental
         self.blend_weights = blend_weights
         self.long_names = long_names
 
@@ -2187,12 +2193,16 @@ class SaveSkinFileWidget(DataSaveFileWidget):
         blend_weights.stateChanged.connect(self._set_blend_weights)
         version_up.stateChanged.connect(self._set_version_up)
         single_file.stateChanged.connect(self._set_single_file)
+        binary.stateChanged.connect(self._set_binary)
+        incremental.stateChanged.connect(self._set_incremental)
         long_names.stateChanged.connect(self._set_long_names)
 
     def _export_data(self):
 
         version_up = True
         single_file = False
+        binary = False
+        incremental = False
         blend_weights = False
         long_names = False
 
@@ -2202,6 +2212,12 @@ class SaveSkinFileWidget(DataSaveFileWidget):
         if self.data_class.settings.has_setting('single file'):
             single_file = self.data_class.settings.get('single file')
 
+        if self.data_class.settings.has_setting('binary'):
+            binary = self.data_class.settings.get('binary')
+
+        if self.data_class.settings.has_setting('incremental'):
+            incremental = self.data_class.settings.get('incremental')
+
         if self.data_class.settings.has_setting('blend weights'):
             blend_weights = self.data_class.settings.get('blend weights')
 
@@ -2216,12 +2232,15 @@ class SaveSkinFileWidget(DataSaveFileWidget):
                 return
 
         self.data_class.export_data(comment, single_file=single_file, version_up=version_up,
-                                    blend_weights=blend_weights, long_names=long_names)
+                                    blend_weights=blend_weights, long_names=long_names, binary=binary,
+                                    incremental=incremental)
         self.file_changed.emit()
 
     def _export_selected_data(self, second_only=False):
         version_up = True
         single_file = False
+        binary = False
+        incremental = False
         blend_weights = True
         long_names = False
 
@@ -2231,6 +2250,12 @@ class SaveSkinFileWidget(DataSaveFileWidget):
         if self.data_class.settings.has_setting('single file'):
             single_file = self.data_class.settings.get('single file')
 
+        if self.data_class.settings.has_setting('binary'):
+            binary = self.data_class.settings.get('binary')
+
+        if self.data_class.settings.has_setting('incremental'):
+            incremental = self.data_class.settings.get('incremental')
+
         if self.data_class.settings.has_setting('blend weights'):
             blend_weights = self.data_class.settings.get('blend weights')
 
@@ -2257,7 +2282,9 @@ class SaveSkinFileWidget(DataSaveFileWidget):
                                     version_up=version_up,
                                     blend_weights=blend_weights,
                                     long_names=long_names,
-                                    second_only=second_only)
+                                    second_only=second_only,
+                                    binary=binary,
+                                    incremental=incremental)
         self.file_changed.emit()
 
     def _export_second_skin_cluster(self):
@@ -2304,6 +2331,16 @@ class SaveSkinFileWidget(DataSaveFileWidget):
         if single_file_state:
             self.single_file.setChecked(True)
 
+        binary_state = self.data_class.settings.get('binary')
+
+        if binary_state:
+            self.binary.setChecked(True)
+
+        incremental_state = self.data_class.settings.get('incremental')
+
+        if incremental_state:
+            self.incremental.setChecked(True)
+
         blend_weight_state = self.data_class.settings.get('blend weights')
 
         # need to check if it exists. Otherwise, it comes in false and sets the checkbox false.
@@ -2340,6 +2377,24 @@ class SaveSkinFileWidget(DataSaveFileWidget):
         else:
             self.data_class.set_single_file(False)
 
+    def _set_binary(self):
+
+        state = self.binary.checkState()
+
+        if state == qt.QtCore.Qt.Checked:
+            self.data_class.set_binary(True)
+        else:
+            self.data_class.set_binary(False)
+
+    def _set_incremental(self):
+
+        state = self.incremental.checkState()
+
+        if state == qt.QtCore.Qt.Checked:
+            self.data_class.set_incremental(True)
+        else:
+            self.data_class.set_incremental(False)
+
     def _set_long_names(self):
         state = self.long_names.checkState()
 
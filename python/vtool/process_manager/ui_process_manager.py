@@ -1426,7 +1426,7 @@ class ProcessManagerWindow(qt_ui.BasicWindow):
 
         util.show('\n\n\n\a\tRunning %s Scripts\t\a\n' % self.process.get_name())
 
-        skip_scripts = []
+        manifest_plan = process.ManifestPlan(scripts, states)
 
         code_manifest_tree = self.code_widget.script_widget.code_manifest_tree
 
@@ -1480,16 +1480,11 @@ class ProcessManagerWindow(qt_ui.BasicWindow):
 
                 if not state:
                     self.code_widget.set_process_script_state(scripts[inc], -1)
-                    skip_scripts.append(script_name)
                     skip = True
 
             if not skip:
                 # this checks if the current script is a child of a skipped script.
-                for skip_script in skip_scripts:
-                    common_path = util_file.get_common_path(script, skip_script)
-                    if common_path == skip_script:
-                        if script.startswith(skip_script):
-                            skip = True
+                skip = not manifest_plan.is_runnable(script)
 
             if skip:
                 util.show('Process skipping %s' % script_name)
@@ -1526,7 +1521,7 @@ class ProcessManagerWindow(qt_ui.BasicWindow):
                 status = self.process.run_script(script_name, False, self.settings.settings_dict, return_status=True)
                 children = self.process._skip_children
                 if children:
-                    skip_scripts.append(script_name)
+                    manifest_plan.skip_children(script_name)
                     self.process._skip_children = None
 
                 self.code_widget.script_widget.code_manifest_tree.set_process_data(self.process.runtime_values,
@@ -4052,19 +4052,21 @@ class CodeEdit(BasicWidget):
                 return
 
         version_tool = util_file.VersionFile(util_file.get_dirname(self.filepath))
-        version_file = version_tool.get_version_path(version)
 
-        in_file = qt.QtCore.QFile(version_file)
+        try:
+            text = version_tool.read_version_file(version)
+        except (IOError, OSError, KeyError):
+            text = None
 
-        if in_file.open(qt.QtCore.QFile.ReadOnly | qt.QtCore.QFile.Text):
-            text = in_file.readAll()
-            in_file.close()
+        if text is not None:
 
             if util.python_version < 3:
                 text = str(text)
             else:
                 text = str(text, 'utf-8')
 
+            text = text.replace('\r\n', '\n')
+
             self._suppress_code_changed_signal = True
             self.text_edit.setPlainText(text)
             self._suppress_code_changed_signal = False
@@ -5554,7 +5556,7 @@ class PythonCompleter(qt.QCompleter):
         get namespaces in a module.
         """
 
-        defined = util_file.get_defined(path)
+        defined = util_file.SymbolIndex.get_defined(path)
         if not defined:
             return
 
@@ -5696,6 +5698,7 @@ class PythonCompleter(qt.QCompleter):
 
             if not imports:
                 imports = util_file.get_line_imports(lines)
+                util_file.SymbolIndex.request(list(imports.values()))
 
             self.last_imports = imports
             self.last_lines = lines
@@ -5772,7 +5775,7 @@ class PythonCompleter(qt.QCompleter):
                         sub_variables = self.current_sub_variables
 
                 if not sub_functions:
-                    result = util_file.get_ast_class_sub_functions(path, sub_part)
+                    result = util_file.SymbolIndex.get_class_members(path, sub_part)
                     if result:
                         sub_functions, sub_variables = result
                         if sub_functions:
@@ -5890,6 +5893,9 @@ class PythonCompleter(qt.QCompleter):
 
         self.filepath = filepath
 
+        # index what the file imports before the first completion asks for it.
+        util_file.SymbolIndex.request_imports(filepath)
+
 
 class AddRemoveList(BasicWidget):
     item_removed = create_signal(object)
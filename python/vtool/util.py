@@ -1458,70 +1458,63 @@ def find_possible_combos(names, sort=False, one_increment=False):
 # --- sorting
 
 
-# TODO: This should likely be removed and replaced with the standard sort.
-class QuickSort(object):
+def get_sort_order(values, numpy_threshold=100000):
     """
-    Really fast method for sorting.
+    Get the indices that would sort values. The sort is stable, equal values keep their original order.
+    Large lists of numbers use numpy argsort when numpy is available.
+
+    Args:
+        values (list): Values to sort.
+        numpy_threshold (int): Lists at least this long use numpy, if it can be imported. None to never use numpy.
+
+    Returns:
+        list: Indices into values, in sorted order.
     """
 
-    def __init__(self, list_of_numbers):
+    count = len(values)
 
-        self.list_of_numbers = list_of_numbers
-        self.follower_list = []
+    if numpy_threshold is not None and count >= numpy_threshold:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
 
-    def _sort(self, list_of_numbers, follower_list=None):
+        if numpy is not None:
+            array = numpy.asarray(values)
+            if array.dtype.kind in 'iuf':
+                return numpy.argsort(array, kind='stable').tolist()
 
-        if follower_list is None:
-            follower_list = []
-        less = []
-        equal = []
-        greater = []
+    return sorted(range(count), key=values.__getitem__)
 
-        if follower_list:
-            less_follow = []
-            equal_follow = []
-            greater_follow = []
 
-        count = len(list_of_numbers)
+def co_sort(list_of_numbers, *follower_lists):
+    """
+    Sort list_of_numbers and reorder each follower list the same way.
 
-        if count > 1:
-            pivot = list_of_numbers[0]
+    Returns:
+        tuple: The sorted numbers followed by each reordered follower list.
+    """
 
-            for inc in range(0, count):
+    order = get_sort_order(list_of_numbers)
 
-                value = list_of_numbers[inc]
-                if follower_list:
-                    follower_value = follower_list[inc]
+    found = [[list_of_numbers[inc] for inc in order]]
 
-                if value < pivot:
-                    less.append(value)
-                    if follower_list:
-                        less_follow.append(follower_value)
-                elif value == pivot:
-                    equal.append(value)
-                    if follower_list:
-                        equal_follow.append(follower_value)
-                elif value > pivot:
-                    greater.append(value)
-                    if follower_list:
-                        greater_follow.append(follower_value)
+    for follower_list in follower_lists:
+        found.append([follower_list[inc] for inc in order])
 
-            if self.follower_list:
-                less_list_of_numbers, less_follower_list = self._sort(less, less_follow)
-                greater_list_of_numbers, greater_follower_list = self._sort(greater, greater_follow)
+    return tuple(found)
 
-                list_of_numbers = less_list_of_numbers + equal + greater_list_of_numbers
-                follower_list = less_follower_list + equal_follow + greater_follower_list
 
-                return list_of_numbers, follower_list
-            else:
-                return self._sort(less) + equal + self._sort(greater)
+class QuickSort(object):
+    """
+    Sort a list of numbers, optionally carrying a follower list along in the same order.
+    Uses the stable builtin sort through co_sort, so already sorted input like version numbers is not a worst case.
+    """
 
-        else:
-            if self.follower_list:
-                return list_of_numbers, follower_list
-            else:
-                return list_of_numbers
+    def __init__(self, list_of_numbers):
+
+        self.list_of_numbers = list_of_numbers
+        self.follower_list = []
 
     def set_follower_list(self, list_of_anything):
         """
@@ -1542,7 +1535,10 @@ class QuickSort(object):
         if self.follower_list and len(self.follower_list) != len(self.list_of_numbers):
             return
 
-        return self._sort(self.list_of_numbers, self.follower_list)
+        if self.follower_list:
+            return co_sort(self.list_of_numbers, self.follower_list)
+
+        return co_sort(self.list_of_numbers)[0]
 
 
 def encode(key, clear):
@@ -19,8 +19,26 @@ import threading
 import stat
 import ast
 import filecmp
+import contextlib
+import fnmatch
+import functools
 import time
 import hashlib
+import errno
+import zipfile
+import marshal
+import types
+import socket
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+if sys.version_info[0] < 3:
+    import Queue as queue
+else:
+    import queue
 
 from . import util
 from . import logger
@@ -174,2564 +192,5417 @@ class WatchDirectoryThread(threading.Thread):
             before = after
 
 
-class VersionFile(object):
+class VersionComments(object):
     """
-    Convenience to version a file or folder.
-    
+    The comments.txt log of a version folder. Each line is a json record: {"version": 1, "comment": "...", "user": "..."}
+    Older logs used python lines, version = 1; comment = "..."; user = "...". Those are still read,
+    and the log is rewritten as json records the next time a comment is added.
+    Older versions didn't remove new lines from comments, a legacy record can go over several lines.
+    Lines that aren't a record are kept as they are when the log is rewritten.
+
     Args:
-        filepath (str): The path to the file to version.
+        filepath (str): The path to comments.txt
     """
 
-    def __init__(self, filepath):
-        self.filepath = filepath
-
-        if filepath:
-            self.filename = get_basename(self.filepath)
-            self.path = get_dirname(filepath)
-
-        self.version_folder_name = '.version'
-        self.version_name = 'version'
-        self.version_folder = None
-        self.updated_old = False
-
-    def _prep_directories(self):
-        self._create_version_folder()
-        self._create_comment_file()
-
-    def _create_version_folder(self):
+    legacy_pattern = re.compile(r'^\s*version\s*=\s*(\d+)\s*;\s*comment\s*=\s*"(.*)"\s*;\s*user\s*=\s*"(.*)"\s*$',
+                                re.DOTALL)
+    legacy_start_pattern = re.compile(r'^\s*version\s*=\s*(\d+)\s*;\s*comment\s*=\s*"')
 
-        self.version_folder = create_dir(self.version_folder_name, self.path)
+    # Most lines a legacy record with new lines in its comment is looked for over.
+    legacy_max_lines = 50
 
-    def _create_comment_file(self):
-        self.comment_file = create_file('comments.txt', self.version_folder)
+    # filepath: ((mtime, size), comment_dict, has_legacy)
+    _cache = {}
 
-    def _increment_version_file_name(self):
+    def __init__(self, filepath):
+        self.filepath = filepath
 
-        path = join_path(self.version_folder, self.version_name + '.1')
+    @classmethod
+    def parse_line(cls, line):
+        """
+        Args:
+            line (str): A line from the comment log, json or legacy.
 
-        return inc_path_name(path)
+        Returns:
+            tuple: (version, comment, user, is_legacy) or None if the line isn't a comment record.
+        """
 
-    def _default_version_file_name(self):
+        line = line.strip()
 
-        if not self.version_name:
+        if not line:
             return
 
-        version_folder = self._get_version_folder()
-        path = join_path(version_folder, self.version_name + '.default')
-
-        return path
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+                return int(record['version']), record.get('comment'), record.get('user'), False
+            except (ValueError, KeyError, TypeError):
+                return
 
-    def _get_version_path(self, version_int):
-        path = join_path(self._get_version_folder(), self.version_name + '.' + str(version_int))
+        match = cls.legacy_pattern.match(line)
 
-        return path
+        if not match:
+            return
 
-    def _get_version_number(self, filepath):
+        version, comment, user = match.groups()
 
-        version_number = util.get_end_number(filepath)
+        return int(version), comment, user, True
 
-        return version_number
+    def _get_file_key(self):
+        try:
+            file_stat = os.stat(self.filepath)
+        except OSError:
+            return
 
-    def _get_version_folder(self):
-        if is_file(self.filepath):
-            dir_name = get_dirname(self.filepath)
-            path = join_path(dir_name, self.version_folder_name)
-        else:
-            path = join_path(self.filepath, self.version_folder_name)
-        return path
+        return file_stat.st_mtime, file_stat.st_size
 
-    def _get_comment_path(self):
-        folder = self._get_version_folder()
+    def _read(self):
 
-        filepath = None
+        file_key = self._get_file_key()
 
-        if folder:
-            filepath = join_path(folder, 'comments.txt')
+        if file_key is None:
+            self._cache.pop(self.filepath, None)
+            return {}, False
 
-        return filepath
+        cached = self._cache.get(self.filepath)
 
-    def _save(self, filename):
+        if cached and cached[0] == file_key:
+            return cached[1], cached[2]
 
-        self._create_version_folder()
-        self._create_comment_file()
+        found = {}
+        has_legacy = False
 
-        if is_dir(self.filepath):
-            copy_dir(self.filepath, filename)
-        if is_file(self.filepath):
-            copy_file(self.filepath, filename)
+        for record, lines in self._read_entries():
 
-    def save_comment(self, comment=None, version_file=None):
-        """
-        Save a comment to a log file.
+            if not record:
+                continue
 
-        Args:
-            comment (str)
-            version_file (str): The corresponding version file.
-        """
-        # TODO: Use splitext if the the version is being used as the extension.
-        version = version_file.split('.')
-        if version:
-            version = version[-1]
+            version, comment, user, is_legacy = record
 
-        user = getpass.getuser()
+            found[version] = (comment, user)
 
-        if not comment:
-            comment = '-'
+            if is_legacy:
+                has_legacy = True
 
-        comment.replace('"', '\"')
+        self._cache[self.filepath] = (file_key, found, has_legacy)
 
-        write_lines(self.comment_file,
-                    ['version = %s; comment = "%s"; user = "%s"' % (version, comment, user)],
-                    append=True)
+        return found, has_legacy
 
-    def save(self, comment=None):
+    def _read_entries(self):
         """
-        Save a version.
-        
-        Args:
-            comment (str): The comment to add to the version.
-        
         Returns:
-            str: The new version file name
+            list: (record, lines) in the order of the file. record is from parse_line, or None for lines that aren't one.
+                lines are the lines of the file it was read from.
         """
 
-        self._prep_directories()
-
-        if comment is not None:
-            comment.replace('\n', '   ')
-            comment.replace('\r', '   ')
-        if comment is None:
-            comment = ' '
-
-        inc_file_name = self._increment_version_file_name()
-
-        self._save(inc_file_name)
-
-        self.save_comment(comment, inc_file_name)
-
-        return inc_file_name
-
-    def save_default(self):
-
-        self._prep_directories()
+        with open(self.filepath, 'r') as open_file:
+            lines = open_file.read().splitlines()
 
-        filename = self._default_version_file_name()
+        entries = []
 
-        if filename:
-            self._save(filename)
-        else:
-            util.warning('Could not save default.')
+        inc = 0
 
-        return filename
+        while inc < len(lines):
+            line = lines[inc]
+            line_count = 1
 
-    def has_default(self):
+            record = self.parse_line(line)
 
-        if not self.version_name:
-            return False
+            if not record and self.legacy_start_pattern.match(line):
+                for end_inc in range(inc + 1, min(inc + self.legacy_max_lines, len(lines))):
+                    record = self.parse_line('\n'.join(lines[inc:end_inc + 1]))
 
-        filename = self._default_version_file_name()
-        if is_file(filename):
-            return True
+                    if record:
+                        line_count = end_inc + 1 - inc
+                        break
 
-        return False
+            entries.append((record, lines[inc:inc + line_count]))
 
-    def has_versions(self):
-        version_folder = self._get_version_folder()
-        if exists(version_folder):
-            return True
-        else:
-            return False
+            inc += line_count
 
-    def get_count(self):
-        versions = self.get_version_numbers()
-        if versions:
-            return len(versions)
-        else:
-            return 0
+        return entries
 
-    def set_version_folder(self, folder_path):
-        """
-        Set the folder where the version folder should be created.
-        
-        Args:
-            folder_path (str): Full path to where the version folder should be created.
-        """
-        self.path = folder_path
+    def _get_line(self, version, comment, user):
+        return json.dumps({'version': version, 'comment': comment, 'user': user})
 
-    def set_version_folder_name(self, name):
+    def read(self):
         """
-        Set the name of the version folder.
-        
-        Args:
-            name (str)
+        Returns:
+            dict: dict[version_number] = (comment, user). Don't edit it, it is shared with the cache.
         """
-        self.version_folder_name = name
 
-    def set_version_name(self, name):
-        """
-        Set the version name.
-        
-        Args:
-            name (str): The name of the version.
-        """
-        self.version_name = name
+        return self._read()[0]
 
-    def get_version_path(self, version_int):
+    def get(self, version):
         """
-        Get the path to a version.
-        
-        Args:
-            version_int (int): The version number.
-            
         Returns:
-            str: The path to the version.
+            tuple: (comment, user) or (None, None) if the version has no comment.
         """
-        return self._get_version_path(version_int)
 
-    def get_version_comment(self, version_int):
-        """
-        Get the version comment.
-                
-        Args:
-            version_int (int): The version number.
-            
-        Returns:
-            str: The version comment.
-        """
-        comment, user = self.get_version_data(version_int)
-        return comment
+        return self.read().get(version, (None, None))
 
-    def get_organized_version_data(self):
+    def migrate(self):
         """
+        Rewrite a log that still has legacy lines as json records.
+
         Returns:
-            version, comment, user, file_size, modified, version_file
+            bool: Whether the log was rewritten.
         """
 
-        log.info('Get organized version data')
-        versions = self.get_versions(return_version_numbers_also=True)
+        found, has_legacy = self._read()
 
-        if not versions:
-            return
-        version_paths = None
-        version_numbers = None
-        if versions:
-            version_paths = versions[0]
-            version_numbers = versions[1]
+        if not has_legacy:
+            return False
 
-        filepath = self._get_comment_path()
+        lines = []
 
-        if not filepath:
-            return []
+        for record, record_lines in self._read_entries():
+            if record:
+                version, comment, user, is_legacy = record
+                lines.append(self._get_line(version, comment, user))
+            else:
+                lines += record_lines
 
-        datas = []
+        return write_atomic(self.filepath, '\n'.join(lines))
+
+    def add(self, version, comment, user):
+        """
+        Append a comment record. Legacy logs are migrated first.
+        """
 
-        if is_file(filepath):
+        self.migrate()
 
-            lines = get_file_lines(filepath)
+        append = bool(self._get_file_key())
 
-            for line in lines:
+        write_lines(self.filepath, [self._get_line(version, comment, user)], append=append)
 
-                line_info_dict = {}
-                version = None
-                comment = None
-                user = None
-                file_size = None
-                modified = None
 
-                split_line = util.split_line(line, ';')
+class VersionIndex(object):
+    """
+    Persistent index of the versions in a version folder, stored as index.json next to the versions.
+    VersionFile keeps it up to date on save and delete_version.
+    It is rebuilt from the folder when it is missing or the folder changed without it.
+    An index written within ScanCache.racy_seconds of the folder changing isn't trusted,
+    another version could have been added without changing the folder mtime again.
+    Loading never writes, an index rebuilt while loading is kept in memory until the next add or remove writes it.
 
-                for sub_line in split_line:
+    Args:
+        version_folder (str): The .version folder.
+        version_name (str): The prefix of the version files. eg. version for version.1
+        comment_reader (function): Returns dict[version_number] = (comment, user). Used when rebuilding.
+    """
 
-                    assignment = util.split_line(sub_line, '=')
+    index_name = 'index.json'
+    index_version = 1
 
-                    if assignment and assignment[0]:
-                        name = assignment[0].strip()
-                        value = assignment[1].strip()
+    # filepath: (file_key, data) of index files read.
+    _cache = {}
 
-                        line_info_dict[name] = value
+    # version_folder: data of indexes rebuilt while loading, not written.
+    _rebuilt = {}
 
-                if 'version' not in line_info_dict:
-                    continue
+    def __init__(self, version_folder, version_name='version', comment_reader=None):
 
-                version = int(line_info_dict['version'])
+        self.version_folder = version_folder
+        self.version_name = version_name
+        self.comment_reader = comment_reader
 
-                if int(line_info_dict['version']) not in version_numbers:
-                    continue
+        self.filepath = join_path(version_folder, self.index_name)
 
-                if 'comment' in line_info_dict:
-                    comment = line_info_dict['comment']
-                    comment = comment[1:-1]
-                if 'user' in line_info_dict:
-                    user = line_info_dict['user']
-                    user = user[1:-1]
+        self._versions = None
+        self._numbers = None
 
-                version_file = version_paths[version]
-                version_file = join_path(self.filepath, '%s/%s' % (self.version_folder_name, version_file))
+    def _get_folder_mtime(self):
+        try:
+            return os.stat(self.version_folder).st_mtime
+        except OSError:
+            return None
 
-                file_size = get_filesize(version_file)
-                modified = get_last_modified_date(version_file)
+    def _get_file_key(self):
+        try:
+            file_stat = os.stat(self.filepath)
+        except OSError:
+            return None
 
-                datas.append([version, comment, user, file_size, modified, version_file])
+        return file_stat.st_mtime, file_stat.st_size
 
-        return datas
+    def _read(self):
 
-    def get_version_data(self, version_int):
-        """
-        Get the version data.  Comment and user.
-                
-        Args:
-            version_int (int): The version number.
-            
-        Returns:
-            tuple: (comment, user)
-        """
-        filepath = self._get_comment_path()
+        file_key = self._get_file_key()
 
-        if not filepath:
-            return None, None
+        if file_key is None:
+            return
 
-        if is_file(filepath):
+        cached = self._cache.get(self.filepath)
+        if cached and cached[0] == file_key:
+            return cached[1]
 
-            lines = get_file_lines(filepath)
+        try:
+            data = get_json(self.filepath)
+        except:
+            return
 
-            version = None
-            comment = None
-            user = None
+        if not data:
+            return
 
-            for line in lines:
+        self._cache[self.filepath] = (file_key, data)
 
-                start_index = line.find('"')
-                if start_index > -1:
-                    end_index = line.find('";')
+        return data
 
-                    subpart = line[start_index + 1:end_index]
+    def _set_data(self, data):
 
-                    subpart = subpart.replace('"', '\\"')
+        versions = {}
 
-                    line = line[:start_index + 1] + subpart + line[end_index:]
+        for number, entry in data.get('versions', {}).items():
+            versions[int(number)] = entry
 
-                try:
-                    exec(line)
-                except:
-                    pass
+        self._versions = versions
+        self._numbers = sorted(versions)
 
-                if version == version_int:
-                    return comment, user
+    def _get_data(self):
 
-        return None, None
+        versions = {}
+        for number in self._numbers:
+            versions[str(number)] = self._versions[number]
 
-    def get_version_numbers(self):
+        latest = None
+        if self._numbers:
+            latest = self._numbers[-1]
 
-        version_folder = self._get_version_folder()
+        return {'index_version': self.index_version,
+                'version_name': self.version_name,
+                'folder_mtime': self._get_folder_mtime(),
+                'written': time.time(),
+                'latest': latest,
+                'versions': versions}
 
-        files = get_files_and_folders(version_folder)
+    def _write(self):
 
-        if not files:
+        if not is_dir(self.version_folder):
             return
 
-        number_list = []
+        # create the file before getting the folder time, writing to an existing file does not change it.
+        if not is_file(self.filepath):
+            create_file(self.index_name, self.version_folder)
 
-        for filepath in files:
+        data = self._get_data()
 
-            if not filepath.startswith(self.version_name):
-                continue
+        set_json(self.filepath, data)
 
-            split_name = filepath.split('.')
+        self._cache[self.filepath] = (self._get_file_key(), data)
+        self._rebuilt.pop(self.version_folder, None)
 
-            if split_name[1] == 'json':
-                continue
+    def _is_current(self, data):
 
-            if split_name[1] == 'default':
-                continue
+        if data.get('index_version') != self.index_version:
+            return False
 
-            if not len(split_name) == 2:
-                continue
+        if data.get('version_name') != self.version_name:
+            return False
 
-            number = int(split_name[1])
+        folder_mtime = data.get('folder_mtime')
 
-            number_list.append(number)
+        if folder_mtime is None or folder_mtime != self._get_folder_mtime():
+            return False
 
-        number_list.sort()
+        written = data.get('written')
 
-        return number_list
+        if written is None or written - folder_mtime <= ScanCache.racy_seconds:
+            return False
 
-    def get_versions(self, return_version_numbers_also=False):
+        return True
+
+    def _load_for_edit(self):
+        if self._versions is not None:
+            return
+
+        self.load()
+
+    def load(self):
         """
-        Get filepaths of all versions.
-        
+        Load the index, rebuilding it in memory if it is missing or out of date.
+
         Returns:
-            list: List of version filepaths.
+            bool: False if there is no version folder.
         """
 
-        log.info('Get versions')
-        version_folder = self._get_version_folder()
+        if not is_dir(self.version_folder):
+            self._versions = {}
+            self._numbers = []
+            return False
 
-        files = get_files_and_folders(version_folder)
+        data = self._read()
 
-        if not files:
-            return None
+        if not data or not self._is_current(data):
+            data = self._rebuilt.get(self.version_folder)
 
-        number_list = []
-        pass_files = []
+        if data and self._is_current(data):
+            self._set_data(data)
+        else:
+            self.rebuild(write=False)
 
-        for filepath in files:
+        return True
 
-            if not filepath.startswith(self.version_name):
+    def rebuild(self, write=True):
+        """
+        Scan the version folder and the comments to recreate the index.
+
+        Args:
+            write (bool): Write index.json. Otherwise the index is only kept in memory.
+        """
+
+        log.info('Rebuilding version index %s' % self.filepath)
+
+        comments = {}
+        if self.comment_reader:
+            comments = self.comment_reader() or {}
+
+        versions = {}
+
+        for filename in get_files_and_folders(self.version_folder):
+
+            if not filename.startswith(self.version_name):
                 continue
 
-            split_name = filepath.split('.')
+            split_name = filename.split('.')
 
             if not len(split_name) == 2:
                 continue
 
             try:
                 number = int(split_name[1])
-            except:
-                util.warning('Skipping version file. It appears to be have a custom name: %s' % filepath)
+            except ValueError:
                 continue
 
-            number_list.append(number)
-            pass_files.append(filepath)
+            comment, user = comments.get(number, (None, None))
 
-        if not pass_files:
-            return
+            versions[number] = {'file': filename, 'comment': comment, 'user': user}
 
-        quick_sort = util.QuickSort(number_list)
-        quick_sort.set_follower_list(pass_files)
-        pass_files = quick_sort.run()
+        self._versions = versions
+        self._numbers = sorted(versions)
 
-        pass_dict = {}
+        if write:
+            self._write()
+        else:
+            self._rebuilt[self.version_folder] = self._get_data()
 
-        for inc in range(0, len(number_list)):
-            pass_dict[pass_files[0][inc]] = pass_files[1][inc]
+    def add(self, number, filename, comment=None, user=None):
+        self._load_for_edit()
 
-        if return_version_numbers_also:
-            return pass_dict, pass_files[0]
-        else:
-            return pass_dict
+        number = int(number)
 
-    def get_latest_version(self):
+        self._versions[number] = {'file': filename, 'comment': comment, 'user': user}
+
+        if number not in self._numbers:
+            self._numbers.append(number)
+            self._numbers.sort()
+
+        self._write()
+
+    def remove(self, numbers):
         """
-        Get the filepath to the latest version.
-        
-        Returns:
-            str: Filepath to latest version.
+        Args:
+            numbers (list): Version numbers to remove, written once. A single number works too.
         """
 
-        log.info('Get latest version')
-        versions, version_numbers = self.get_versions(return_version_numbers_also=True)
+        self._load_for_edit()
 
-        latest_version = versions[version_numbers[-1]]
+        for number in util.convert_to_sequence(numbers):
+            number = int(number)
 
-        return join_path(self.filepath, '%s/%s' % (self.version_folder_name, latest_version))
+            if number not in self._versions:
+                continue
 
-    def get_default(self):
-        filename = self._default_version_file_name()
+            self._versions.pop(number)
+            self._numbers.remove(number)
 
-        return filename
+        # written even when the versions were already gone from a rebuilt index, so index.json doesn't keep them.
+        self._write()
 
-    def delete_version(self, version_number):
+    def get_numbers(self):
+        """
+        Returns:
+            list: Version numbers, lowest first. A copy, safe to modify.
+        """
+        return list(self._numbers or [])
 
-        path = self.get_version_path(version_number)
+    def get_latest(self):
+        """
+        Returns:
+            int: The highest version number, or None.
+        """
+        if self._numbers:
+            return self._numbers[-1]
 
-        if is_file(path):
-            delete_file(path)
-        else:
-            delete_dir(path)
+    def get_entry(self, number):
+        """
+        Returns:
+            dict: keys 'file', 'comment', 'user'
+        """
+        if self._versions:
+            return self._versions.get(number)
 
+    def get_history(self, start=0, count=None, newest_first=True):
+        """
+        Get a page of version entries.
 
-class SettingsFile(object):
+        Args:
+            start (int): How many versions to skip.
+            count (int): How many versions to return. None returns the rest.
+            newest_first (bool): Page from the newest version back.
 
-    def __init__(self):
+        Returns:
+            list: [(number, entry), ...]
+        """
+        numbers = self._numbers or []
 
-        self.directory = None
-        self.filepath = None
+        if newest_first:
+            numbers = numbers[::-1]
 
-        self.settings_dict = {}
-        self.optional_dict = {}
-        self.settings_order = []
-        self.write = None
-        self._has_json = None
+        if count is None:
+            numbers = numbers[start:]
+        else:
+            numbers = numbers[start:start + count]
 
-    def _get_json_file(self):
-        directory = get_dirname(self.filepath)
+        return [(number, self._versions[number]) for number in numbers]
 
-        if not self.filepath:
-            return
 
-        name = get_basename_no_extension(self.filepath)
+class VersionStore(object):
+    """
+    Content addressed storage for versions. Each file is kept once, by its sha1, under .store/objects in the version folder.
+    A version is then a small manifest file, written where the copy of the file or folder would have gone.
+    VersionFile saves this way when deduplicate is on.
 
-        filename = name + '.json'
+    Args:
+        version_folder (str): The .version folder.
+    """
 
-        if self._has_json:
-            filepath = join_path(directory, filename)
-        else:
-            filepath = create_file(filename, directory)
+    store_folder_name = '.store'
+    manifest_header = '# vetala version manifest 1'
 
-        return filepath
+    # Seconds to wait for another save or garbage collection in the same version folder.
+    lock_timeout = 600.0
 
-    def _has_json_file(self):
+    def __init__(self, version_folder):
+        self.version_folder = version_folder
 
-        if self._has_json is not None:
-            return self._has_json
+        self.store_folder = join_path(version_folder, self.store_folder_name)
+        self.object_folder = join_path(self.store_folder, 'objects')
+        self.checkout_folder = join_path(self.store_folder, 'checkout')
 
-        if not self.filepath:
+    @classmethod
+    def is_manifest(cls, filepath):
+        try:
+            with open(filepath, 'rb') as open_file:
+                header = open_file.read(len(cls.manifest_header))
+        except (IOError, OSError):
             return False
 
-        directory = get_dirname(self.filepath)
-        name = get_basename_no_extension(self.filepath)
+        return header == cls.manifest_header.encode()
 
-        filepath = join_path(directory, name + '.json')
+    def _hash_file(self, filepath):
+        file_hash = hashlib.sha1()
 
-        if exists(filepath):
-            return True
-        else:
-            return False
+        with open(filepath, 'rb') as open_file:
+            for chunk in iter(lambda: open_file.read(1024 * 1024), b''):
+                file_hash.update(chunk)
 
-    def _read(self):
+        return file_hash.hexdigest()
 
-        if not self.filepath:
-            return
+    def _make_dirs(self, path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
 
-        lines = get_file_lines(self.filepath)
+    def _add_object(self, filepath, file_hash):
+        """
+        Returns:
+            bool: Whether the object was new to the store.
+        """
 
-        if not lines:
-            return
+        object_path = self.get_object_path(file_hash)
 
-        self.settings_dict = {}
-        self.settings_order = []
+        if os.path.isfile(object_path):
+            return False
 
-        for line in lines:
-            if not line:
-                continue
+        self._make_dirs(os.path.dirname(object_path))
 
-            split_line = line.split('=')
+        temp_path = '%s.%s.tmp' % (object_path, os.getpid())
+        shutil.copyfile(filepath, temp_path)
 
-            name = split_line[0].strip()
+        # objects are hard linked into checkouts, read only keeps an edit from changing every version.
+        os.chmod(temp_path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
 
-            value = split_line[-1]
+        try:
+            os.rename(temp_path, object_path)
+        except OSError:
+            os.chmod(temp_path, stat.S_IWRITE | stat.S_IREAD)
+            os.remove(temp_path)
 
-            if not value:
-                continue
+        return True
 
-            value = fix_slashes(value)
+    def _get_lock(self):
+        self._make_dirs(self.store_folder)
 
-            try:
-                value = eval(str(value))
-            except:
-                value = str(value)
+        return FileLock(self.object_folder)
 
-            self.settings_dict[name] = value
-            self.settings_order.append(name)
+    def _remove_path(self, path):
+        os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+        os.remove(path)
 
-    def _read_json(self):
+    def _write_manifest(self, manifest_path, manifest):
+        temp_path = manifest_path + '.tmp'
 
-        filepath = self._get_json_file()
+        with open(temp_path, 'w') as open_file:
+            open_file.write(self.manifest_header + '\n')
+            json.dump(manifest, open_file, sort_keys=True)
 
-        if not filepath:
-            return
+        # only version.default gets saved over.
+        if os.path.isfile(manifest_path):
+            os.remove(manifest_path)
+            self.remove_checkout(manifest_path)
 
-        self.filepath = filepath
+        os.rename(temp_path, manifest_path)
 
-        data = None
+    def _place_object(self, file_hash, destination, link):
+        object_path = self.get_object_path(file_hash)
 
-        try:
-            data = OrderedDict(get_json(filepath))
-        except:
-            self.settings_order = []
-            self.settings_dict = {}
+        if link:
+            try:
+                os.link(object_path, destination)
+                return
+            except (OSError, AttributeError):
+                pass
+
+        if clone_file(object_path, destination):
             return
 
-        self.settings_order = list(data.keys())
-        self.settings_dict = data
+        shutil.copyfile(object_path, destination)
 
-    def _update_old(self, filename):
+    def get_object_path(self, file_hash):
+        return join_path(self.object_folder, '%s/%s' % (file_hash[:2], file_hash[2:]))
 
-        directory = self.directory
+    def read_manifest(self, manifest_path):
+        """
+        Returns:
+            dict: type, file or folder, size in bytes, files {relative_path: [hash, size, mtime]} and folders.
+        """
 
-        if filename == 'data.json':
-            old = join_path(directory, 'data.type')
-            if is_file(old):
-                self.filepath = old
+        with open(manifest_path, 'r') as open_file:
+            open_file.readline()
+            return json.load(open_file)
 
-        if filename == 'options.json':
-            old_options = join_path(directory, 'options.txt')
-            if is_file(old_options):
-                self.filepath = old_options
+    def save(self, source, manifest_path, previous_manifest_path=None):
+        """
+        Store a file or folder and write its manifest.
 
-        if filename == 'settings.json':
-            old_settings = join_path(directory, 'settings.txt')
-            if is_file(old_settings):
-                self.filepath = old_settings
+        Args:
+            source (str): The file or folder to version.
+            manifest_path (str): Where to write the manifest, eg. .version/version.3
+            previous_manifest_path (str): Files with the same size and modified time as in this manifest reuse its hash
+                instead of being read again.
 
-        if not filename.endswith('.json'):
-            old = join_path(directory, filename)
+        Returns:
+            dict: The manifest.
+        """
 
-            if is_file(old):
-                self.filepath = old
+        previous_files = {}
+        if previous_manifest_path and self.is_manifest(previous_manifest_path):
+            previous_files = self.read_manifest(previous_manifest_path).get('files', {})
 
-        self._read()
-        self._write_json()
+        entries = []
+        folders = []
 
-    def _write(self):
+        if os.path.isfile(source):
+            source_type = 'file'
+            entries.append(('.', source))
+        else:
+            source_type = 'folder'
+            for root, dirs, filenames in os.walk(source):
+                relative_root = os.path.relpath(root, source)
 
-        self._write_json()
+                for folder in dirs:
+                    folders.append(fix_slashes(os.path.normpath(os.path.join(relative_root, folder))))
 
-    def _write_json(self):
+                for filename in filenames:
+                    relative_path = fix_slashes(os.path.normpath(os.path.join(relative_root, filename)))
+                    entries.append((relative_path, os.path.join(root, filename)))
 
-        filepath = self._get_json_file()
+        files = {}
+        total_size = 0
 
-        if not filepath:
-            return
+        store_lock = self._get_lock()
+        if not store_lock.acquire(self.lock_timeout):
+            raise RuntimeError('Timed out waiting to save into version store: %s' % self.store_folder)
 
-        out_list = []
+        try:
+            for relative_path, filepath in entries:
+                file_stat = os.stat(filepath)
 
-        for key in self.settings_order:
-            value = self.settings_dict[key]
+                file_hash = None
 
-            out_list.append([key, value])
+                previous = previous_files.get(relative_path)
+                if previous and previous[1] == file_stat.st_size and previous[2] == file_stat.st_mtime:
+                    if os.path.isfile(self.get_object_path(previous[0])):
+                        file_hash = previous[0]
 
-        out_data = OrderedDict(out_list)
+                if not file_hash:
+                    file_hash = self._hash_file(filepath)
+                    self._add_object(filepath, file_hash)
 
-        set_json(filepath, list(out_data.items()))
+                files[relative_path] = [file_hash, file_stat.st_size, file_stat.st_mtime]
+                total_size += file_stat.st_size
 
-    def set(self, name, value):
+            manifest = {'type': source_type,
+                        'size': total_size,
+                        'files': files,
+                        'folders': sorted(folders)}
 
-        log.info('Set setting %s %s' % (name, value))
+            self._write_manifest(manifest_path, manifest)
+        finally:
+            store_lock.release()
 
-        self.settings_dict[name] = value
+        return manifest
 
-        if name not in self.settings_order:
-            self.settings_order.append(name)
+    def restore(self, manifest_path, destination, link=False):
+        """
+        Recreate a version.
 
-        self._write()
+        Args:
+            manifest_path (str): The manifest of the version.
+            destination (str): The file or folder to create. It should not exist.
+            link (bool): Hard link to the stored objects. The restored files are then read only.
+                Otherwise files are cloned copy on write where possible, or copied.
 
-    def get(self, name):
+        Returns:
+            str: destination
+        """
 
-        if name in self.settings_dict:
-            return self.settings_dict[name]
+        manifest = self.read_manifest(manifest_path)
 
-    def has_setting(self, name):
+        files = manifest.get('files', {})
 
-        if name not in self.settings_dict:
-            return False
+        if manifest.get('type') == 'file':
+            self._place_object(files['.'][0], destination, link)
+            return destination
 
-        return True
+        self._make_dirs(destination)
 
-    def has_setting_match(self, name):
+        for folder in manifest.get('folders', []):
+            self._make_dirs(os.path.join(destination, folder))
 
-        for key in self.settings_dict.keys():
-            if key.endswith(name):
-                return True
+        for relative_path, file_info in files.items():
+            self._place_object(file_info[0], os.path.join(destination, relative_path), link)
 
-        return False
+        return destination
 
-    def has_settings(self):
+    def get_checkout_path(self, manifest_path):
+        return join_path(self.checkout_folder, get_basename(manifest_path))
 
-        if self.settings_order:
-            return True
+    def checkout(self, manifest_path):
+        """
+        Get a read only copy of a version, hard linked to the store. Versions don't change, so it is only made once.
 
-        return False
+        Returns:
+            str: The path to the file or folder of the version.
+        """
 
-    def get_settings(self):
+        checkout_path = self.get_checkout_path(manifest_path)
 
-        log.debug('Get settings')
+        if os.path.exists(checkout_path):
+            return checkout_path
 
-        found = []
+        self._make_dirs(self.checkout_folder)
 
-        for setting in self.settings_order:
-            found.append([setting, self.settings_dict[setting]])
+        temp_path = '%s.%s.tmp' % (checkout_path, os.getpid())
 
-        return found
+        self.restore(manifest_path, temp_path, link=True)
 
-    def get_file(self):
-        return self.filepath
+        try:
+            os.rename(temp_path, checkout_path)
+        except OSError:
+            # another process checked it out first.
+            self._remove_checkout(temp_path)
 
-    def clear(self):
+        return checkout_path
 
-        self.settings_dict = {}
-        self.settings_order = []
+    def _remove_checkout(self, checkout_path):
+        if os.path.isdir(checkout_path):
+            shutil.rmtree(checkout_path, onerror=delete_read_only_error)
+        elif os.path.isfile(checkout_path):
+            self._remove_path(checkout_path)
 
-        self._write()
+    def remove_checkout(self, manifest_path):
+        self._remove_checkout(self.get_checkout_path(manifest_path))
 
-    def reload(self):
+    def collect_garbage(self):
+        """
+        Delete objects that no manifest in the version folder uses anymore, and checkouts of deleted versions.
 
-        self._read_json()
+        Returns:
+            tuple: (removed object count, removed bytes)
+        """
 
-    def set_directory(self, directory, filename='settings.json'):
-        self.directory = directory
+        if not os.path.isdir(self.object_folder):
+            return 0, 0
 
-        # eventually after a lot of testing, can add a statement to delete old settings/data files
+        store_lock = self._get_lock()
+        if not store_lock.acquire(self.lock_timeout):
+            util.warning('Timed out waiting to collect garbage in version store: %s' % self.store_folder)
+            return 0, 0
 
-        self.filepath = join_path(self.directory, filename)
+        removed = 0
+        removed_bytes = 0
 
-        self._has_json = self._has_json_file()
+        try:
+            used = set()
+            version_names = set()
 
-        if not self._has_json:
-            self._update_old(filename)
+            for filename in os.listdir(self.version_folder):
+                filepath = join_path(self.version_folder, filename)
 
-        self._read_json()
-        # self._read()
+                version_names.add(filename)
 
-        return self.filepath
+                if not os.path.isfile(filepath) or not self.is_manifest(filepath):
+                    continue
 
+                for file_info in self.read_manifest(filepath).get('files', {}).values():
+                    used.add(file_info[0])
 
-class ControlNameFromSettingsFile(util.ControlName):
+            for prefix in os.listdir(self.object_folder):
+                prefix_folder = join_path(self.object_folder, prefix)
 
-    def __init__(self, directory=None):
-        super(ControlNameFromSettingsFile, self).__init__()
-        self._settings_inst = None
-        self.directory = None
-        if directory:
-            self.set_directory(directory)
+                for name in os.listdir(prefix_folder):
+                    if prefix + name in used:
+                        continue
 
-    def set_directory(self, directory, filename='settings.json'):
+                    object_path = join_path(prefix_folder, name)
+                    removed_bytes += os.path.getsize(object_path)
+                    self._remove_path(object_path)
+                    removed += 1
 
-        self.directory = directory
+                if not os.listdir(prefix_folder):
+                    os.rmdir(prefix_folder)
 
-        settings_inst = SettingsFile()
-        settings_inst.set_directory(directory, filename)
+            if os.path.isdir(self.checkout_folder):
+                for name in os.listdir(self.checkout_folder):
+                    if name not in version_names:
+                        self._remove_checkout(join_path(self.checkout_folder, name))
+        finally:
+            store_lock.release()
 
-        self._settings_inst = settings_inst
+        return removed, removed_bytes
 
-        control_order = settings_inst.get('control_name_order')
 
-        if control_order:
-            self.control_order = control_order
+class VersionArchive(object):
+    """
+    A version saved as one compressed zip archive, written where the copied file or folder would have gone.
+    Zip compresses each member on its own, so one member can be read without decompressing the rest.
+    VersionFile saves this way when compression is set.
 
-        self.control_alias = settings_inst.get('control_alias')
-        self.left_alias = settings_inst.get('control_left')
-        self.right_alias = settings_inst.get('control_right')
-        self.center_alias = settings_inst.get('control_center')
+    Args:
+        archive_path (str): The archive, eg. .version/version.3
+    """
 
-        if not self.control_alias:
-            self.control_alias = 'CNT'
-        if not self.left_alias:
-            self.left_alias = 'L'
-        if not self.right_alias:
-            self.right_alias = 'R'
-        if not self.center_alias:
-            self.center_alias = 'C'
+    archive_comment = b'vetala version archive 1'
 
-        self.control_uppercase = settings_inst.get('control_uppercase')
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
 
-        if self.control_uppercase is None:
-            self.control_uppercase = True
+    @classmethod
+    def get_compression_type(cls, compression):
+        """
+        Args:
+            compression (str): deflate, the gzip algorithm, or zstd. zstd needs a python with zipfile zstandard support.
 
-    def set(self, name, value):
+        Returns:
+            int: The zipfile compression constant.
+        """
 
-        if name == 'control_name_order':
-            self.control_order = value
-            if self._settings_inst:
-                self._settings_inst.set(name, value)
+        if compression == 'zstd':
+            zstd_type = getattr(zipfile, 'ZIP_ZSTANDARD', None)
+            if zstd_type is not None:
+                return zstd_type
 
-        if name == 'control_alias':
-            self.control_alias = str(value)
-            if self._settings_inst:
-                self._settings_inst.set(name, value)
+            util.warning('zstd compression is not available in this python. Using deflate.')
 
-        if name == 'control_left':
-            self.left_alias = value
-            if self._settings_inst:
-                self._settings_inst.set(name, value)
+        return zipfile.ZIP_DEFLATED
 
-        if name == 'control_right':
-            self.right_alias = value
-            if self._settings_inst:
-                self._settings_inst.set(name, value)
+    @classmethod
+    def is_archive(cls, filepath):
+        """
+        The archive comment is the last bytes of a zip file, so only the end of the file is read.
+        """
 
-        if name == 'control_center':
-            self.center_alias = value
-            if self._settings_inst:
-                self._settings_inst.set(name, value)
+        try:
+            with open(filepath, 'rb') as open_file:
+                open_file.seek(0, os.SEEK_END)
+                size = open_file.tell()
+                tail_size = min(size, 64)
+                open_file.seek(size - tail_size)
+                tail = open_file.read(tail_size)
+        except (IOError, OSError):
+            return False
 
-        if name == 'control_uppercase':
-            self.control_uppercase = value
-            if self._settings_inst:
-                self._settings_inst.set(name, value)
+        return cls.archive_comment in tail
 
+    def _get_type(self, zip_file):
+        return zip_file.comment[len(self.archive_comment) + 1:].decode()
 
-class FindUniquePath(util.FindUniqueString):
+    def save(self, source, compression='deflate'):
+        """
+        Stream a file or folder into the archive, one member at a time.
+        """
 
-    def __init__(self, directory):
+        compression_type = self.get_compression_type(compression)
 
-        if not directory:
-            directory = get_cwd()
+        temp_path = self.archive_path + '.tmp'
 
-        self.parent_path = self._get_parent_path(directory)
-        basename = get_basename(directory)
+        with zipfile.ZipFile(temp_path, 'w', compression_type, allowZip64=True) as zip_file:
 
-        super(FindUniquePath, self).__init__(basename)
+            if os.path.isfile(source):
+                zip_file.write(source, get_basename(source))
+                source_type = 'file'
+            else:
+                for root, dirs, filenames in os.walk(source):
+                    relative_root = os.path.relpath(root, source)
 
-    def _get_parent_path(self, directory):
-        return get_dirname(directory)
+                    for folder in dirs:
+                        folder_path = os.path.join(root, folder)
+                        zip_file.write(folder_path, os.path.normpath(os.path.join(relative_root, folder)))
 
-    def _get_scope_list(self):
-        return get_files_and_folders(self.parent_path)
+                    for filename in filenames:
+                        filepath = os.path.join(root, filename)
+                        zip_file.write(filepath, os.path.normpath(os.path.join(relative_root, filename)))
+                source_type = 'folder'
 
-    def _search(self):
+            zip_file.comment = self.archive_comment + b';' + source_type.encode()
 
-        end_number = self._get_number()
+        if os.path.isfile(self.archive_path):
+            os.remove(self.archive_path)
 
-        self.increment_string = self.test_string
+        os.rename(temp_path, self.archive_path)
 
-        test_path = join_path(self.parent_path, self.increment_string)
-        if not is_file(test_path) and not is_dir(test_path):
-            return test_path
+    def is_folder(self):
+        with zipfile.ZipFile(self.archive_path) as zip_file:
+            return self._get_type(zip_file) == 'folder'
 
-        unique = False
+    def get_members(self):
+        """
+        Returns:
+            list: Relative paths of the files in the archive.
+        """
 
-        scope = self._get_scope_list()
+        with zipfile.ZipFile(self.archive_path) as zip_file:
+            return [name for name in zip_file.namelist() if not name.endswith('/')]
 
-        numbers = []
-        filtered_scope = []
+    def read_member(self, name=None):
+        """
+        Args:
+            name (str): The relative path of the file in a folder version. Not needed for a file version.
 
-        if scope:
+        Returns:
+            bytes: The contents of the member.
+        """
 
-            if len(scope) > 1:
-                for thing in scope:
+        with zipfile.ZipFile(self.archive_path) as zip_file:
+            if name is None:
+                name = zip_file.namelist()[0]
 
-                    number = util.get_end_number(thing)
-                    if number:
-                        self._format_string(number)
+            return zip_file.read(name)
 
-                        if thing == self.increment_string:
-                            numbers.append(number)
-                            filtered_scope.append(thing)
+    def extract(self, destination):
+        """
+        Extract a file version to the destination file, or a folder version into the destination folder.
 
-                sort = util.QuickSort(numbers)
-                numbers = sort.run()
+        Returns:
+            str: destination
+        """
 
-        if numbers:
-            if end_number and end_number in numbers:
-                if end_number != numbers[-1]:
-                    end_number = numbers[-1]
+        with zipfile.ZipFile(self.archive_path) as zip_file:
 
-        self._format_string(end_number)
+            if self._get_type(zip_file) == 'file':
+                with zip_file.open(zip_file.namelist()[0]) as member_file:
+                    with open(destination, 'wb') as open_file:
+                        shutil.copyfileobj(member_file, open_file, 1024 * 1024)
+                return destination
 
-        inc = 0
+            zip_file.extractall(destination)
 
-        while not unique:
+        return destination
 
-            if inc > 10000:
-                break
+    def checkout(self, checkout_folder):
+        """
+        Extract once into the checkout folder. Versions don't change, so the extracted copy is reused.
 
-            inc += 1
+        Returns:
+            str: The path to the extracted file or folder.
+        """
 
-            if not scope:
-                unique = True
-                continue
+        checkout_path = join_path(checkout_folder, get_basename(self.archive_path))
 
-            if self.increment_string in scope:
-                if end_number:
-                    end_number += 1
-                else:
-                    end_number = 1
-                self._format_string(end_number)
-                continue
+        if os.path.exists(checkout_path):
+            return checkout_path
+
+        try:
+            os.makedirs(checkout_folder)
+        except OSError:
+            pass
+
+        temp_path = '%s.%s.tmp' % (checkout_path, os.getpid())
+
+        self.extract(temp_path)
+
+        try:
+            os.rename(temp_path, checkout_path)
+        except OSError:
+            # another process extracted it first.
+            if os.path.isdir(temp_path):
+                shutil.rmtree(temp_path, onerror=delete_read_only_error)
             else:
-                unique = True
-                continue
+                os.remove(temp_path)
 
-        return join_path(self.parent_path, self.increment_string)
+        return checkout_path
 
 
-class ParsePython(object):
+class VersionFile(object):
     """
-    This needs to be replaced by something that uses the AST instead.
+    Convenience to version a file or folder.
+    
+    Args:
+        filepath (str): The path to the file to version.
     """
 
     def __init__(self, filepath):
-
         self.filepath = filepath
 
-        self.main_scope = PythonScope('main')
-        self.main_scope.set_indent(0)
+        if filepath:
+            self.filename = get_basename(self.filepath)
+            self.path = get_dirname(filepath)
 
-        self.last_scope = self.main_scope
-        self.last_parent_scope = self.main_scope
+        self.version_folder_name = '.version'
+        self.version_name = 'version'
+        self.version_folder = None
+        self.updated_old = False
 
-        self.scope_types = ['class', 'def']
-        self.logic_scope_types = ['if', 'elif', 'else', 'while']
-        self.try_scope_types = ['try', 'except', 'finally']
+        self.deduplicate = os.environ.get('VETALA_VERSION_STORE') == 'True'
+        self.compression = os.environ.get('VETALA_VERSION_COMPRESSION') or None
 
-        self.indents = []
-        self.current_scope_lines = []
+    def _get_index(self, version_folder=None):
+        """
+        Args:
+            version_folder (str): Defaults to the version folder that versions are read from.
+                When saving, versions are written to the version folder next to self.filepath instead.
+        """
 
-        self._parse()
+        if not version_folder:
+            version_folder = self._get_version_folder()
 
-    def _set_scope(self, scope):
+        def read_comments():
+            return self._read_comment_data(version_folder)
 
-        self.last_scope.set_scope_lines(self.current_scope_lines)
-        self.current_scope_lines = []
-        self.last_scope = scope
+        return VersionIndex(version_folder, self.version_name, read_comments)
 
-    def _parse(self):
+    def _read_comment_data(self, version_folder):
+        """
+        Returns:
+            dict: dict[version_number] = (comment, user)
+        """
 
-        lines = []
+        return VersionComments(join_path(version_folder, 'comments.txt')).read()
 
-        if is_file(self.filepath):
-            lines = get_file_lines(self.filepath)
+    def _get_store(self, version_folder=None):
+        if not version_folder:
+            version_folder = self._get_version_folder()
 
-        for line in lines:
+        return VersionStore(version_folder)
 
-            strip_line = line.strip()
+    def _resolve_version_path(self, path, read_only=True):
+        """
+        Versions saved to the store are manifests and compressed versions are archives.
+        Returns the path to a checkout of the version instead.
 
-            if not strip_line:
-                continue
+        Args:
+            read_only (bool): Return the shared checkout, hard linked to the store.
+                Otherwise a writable copy of it that only this user gets, see _get_private_copy.
+        """
 
-            indent = 0
+        if not is_file(path):
+            return path
 
-            match = re.search('^ +(?=[^ ])', line)
+        checkout_path = None
 
-            if match:
-                indent = len(match.group(0))
+        if VersionStore.is_manifest(path):
+            checkout_path = self._get_store(get_dirname(path)).checkout(path)
 
-            if self.indents:
-                last_indent = self.indents[-1]
+        elif VersionArchive.is_archive(path):
+            checkout_path = VersionArchive(path).checkout(self._get_store(get_dirname(path)).checkout_folder)
 
-                if indent < last_indent:
-                    pass
+        if not checkout_path:
+            return path
 
-            self.find_scope_type(strip_line, indent)
+        if read_only:
+            return checkout_path
 
-            self.current_scope_lines.append(line)
+        return self._get_private_copy(path, checkout_path)
 
-    def find_scope_type(self, line, indent):
+    def _get_copy_stats(self, version_path, copy_path):
 
-        for scope_type in self.scope_types:
-            match = re.search('%s(.*?):' % scope_type, line)
+        version_stat = os.stat(version_path)
 
-            if not match:
-                continue
+        files = {}
 
-            scope_line = match.group(0)
+        if os.path.isfile(copy_path):
+            copy_stat = os.stat(copy_path)
+            files['.'] = [copy_stat.st_size, copy_stat.st_mtime]
+        else:
+            for root, dirs, filenames in os.walk(copy_path):
+                for filename in filenames:
+                    filepath = os.path.join(root, filename)
+                    copy_stat = os.stat(filepath)
+                    relative_path = fix_slashes(os.path.relpath(filepath, copy_path))
+                    files[relative_path] = [copy_stat.st_size, copy_stat.st_mtime]
 
-            match = re.search('(?<=%s)(.*?)(?=\()' % scope_type, scope_line)
+        return {'version': [version_stat.st_size, version_stat.st_mtime], 'files': files}
 
-            if not match:
-                continue
+    def _get_private_copy(self, version_path, checkout_path):
+        """
+        A writable copy of a checkout in the temp folder of this user, cloned copy on write where possible.
+        It is reused until the version is saved again or the copy is edited, then it is copied again.
 
-            scope_name = match.group(0)
-            scope_name = scope_name.strip()
+        Returns:
+            str: The copy of the version file or folder.
+        """
 
-            match = re.search('\((.*?)\)', scope_line)
+        key = hashlib.sha1(os.path.abspath(version_path).encode('utf-8')).hexdigest()
 
-            if not match:
-                continue
+        folder = join_path(get_temp_dir(), 'vetala_version_copies_%s/%s' % (get_user(), key))
+        copy_path = join_path(folder, get_basename(checkout_path))
+        stats_path = join_path(folder, 'stats.json')
 
-            scope_bracket = match.group()
+        try:
+            if os.path.isfile(stats_path) and os.path.exists(copy_path):
+                with open(stats_path, 'r') as open_file:
+                    if json.load(open_file) == self._get_copy_stats(version_path, copy_path):
+                        return copy_path
+        except (IOError, OSError, ValueError):
+            pass
 
-            parent_scope = self.main_scope
+        if os.path.isdir(folder):
+            shutil.rmtree(folder, onerror=delete_read_only_error)
 
-            if self.indents:
+        os.makedirs(folder, 0o700)
 
-                if indent > self.indents[-1]:
-                    parent_scope = self.last_scope
+        if os.path.isfile(checkout_path):
+            if not clone_file(checkout_path, copy_path):
+                copy_file_contents(checkout_path, copy_path)
+        else:
+            copy_plan = CopyPlan()
+            copy_plan.add_folder(checkout_path, copy_path)
+            copy_plan.run()
 
-                if indent == self.indents[-1]:
-                    parent_scope = self.last_parent_scope
+        with open(stats_path, 'w') as open_file:
+            json.dump(self._get_copy_stats(version_path, copy_path), open_file)
 
-                if indent < self.indents[-1]:
+        return copy_path
 
-                    if indent == 0:
-                        parent_scope = self.main_scope
+    def _get_version_row(self, number, entry):
 
-                    if indent > 0:
-                        parent_indent = self.last_scope.parent.indent
-                        parent_scope = self.last_scope.parent
+        version_file = join_path(self._get_version_folder(), entry['file'])
 
-                        # need to go up the scope until finding a matching indent
-                        """
-                        while parent_indent != indent:
-                            
-                            parent_indent = self.last_scope.parent.indent
-                            parent_scope = self.last_scope.parent
-                        """
+        if VersionStore.is_manifest(version_file):
+            version_store = self._get_store()
+            file_size = round(version_store.read_manifest(version_file)['size'] * 0.000001, 2)
+        else:
+            file_size = get_filesize(version_file)
+        modified = get_last_modified_date(version_file)
 
-            sub_scope = PythonScope(scope_name)
-            sub_scope.set_bracket(scope_bracket)
-            sub_scope.set_parent(parent_scope)
-            sub_scope.set_indent(indent)
-            sub_scope.set_scope_type(scope_type)
+        return [number, entry['comment'], entry['user'], file_size, modified, version_file]
 
-            self.last_parent_scope = parent_scope
-            self.last_scope = sub_scope
-            self.indents.append(indent)
+    def _prep_directories(self):
+        self._create_version_folder()
+        self._create_comment_file()
 
-            return True
+    def _create_version_folder(self):
 
-        return False
+        self.version_folder = create_dir(self.version_folder_name, self.path)
 
+    def _create_comment_file(self):
+        self.comment_file = create_file('comments.txt', self.version_folder)
 
-class PythonScope(object):
+    def _increment_version_file_name(self):
 
-    def __init__(self, name):
-        self.name = name
-        self.parent = None
-        self.children = []
+        path = join_path(self.version_folder, self.version_name + '.1')
 
-        self.bracket_string = '()'
-        self.docstring = ''
-        self.scope_lines = []
-        self.scope_type = ''
+        return inc_path_name(path)
 
-        self.indent = None
+    def _default_version_file_name(self):
 
-    def set_scope_type(self, scope_type_name):
-        self.scope_type = scope_type_name
+        if not self.version_name:
+            return
 
-    def set_bracket(self, bracket_string):
-        self.bracket_string = bracket_string
+        version_folder = self._get_version_folder()
+        path = join_path(version_folder, self.version_name + '.default')
 
-    def set_scope_lines(self, lines):
-        self.scope_lines = lines
+        return path
 
-    def set_parent(self, parent_scope):
-        self.parent = parent_scope
-        parent_scope.set_child(self)
+    def _get_version_path(self, version_int):
+        path = join_path(self._get_version_folder(), self.version_name + '.' + str(version_int))
 
-    def set_child(self, child_scope):
-        self.children.append(child_scope)
+        return path
 
-    def set_indent(self, indent):
-        self.indent = indent
+    def _get_version_number(self, filepath):
 
+        version_number = util.get_end_number(filepath)
 
-class ReadCache(object):
-    read_files = {}
+        return version_number
 
-    @classmethod
-    def is_read(cls, path):
+    def _get_version_folder(self):
+        if is_file(self.filepath):
+            dir_name = get_dirname(self.filepath)
+            path = join_path(dir_name, self.version_folder_name)
+        else:
+            path = join_path(self.filepath, self.version_folder_name)
+        return path
 
-        if path in ReadCache.read_files:
-            return True
+    def _get_comment_path(self):
+        folder = self._get_version_folder()
 
-        return False
+        filepath = None
 
-    @classmethod
-    def set_read_data(cls, path, data):
-        log.info('Caching %s' % path)
-        cls.read_files[path] = data
+        if folder:
+            filepath = join_path(folder, 'comments.txt')
 
-    @classmethod
-    def remove_read_data(cls, path):
-        log.info('Cache removed %s' % path)
-        if path in cls.read_files:
-            cls.read_files.pop(path, None)
+        return filepath
 
-    @classmethod
-    def cache_read_data(cls, path):
+    def _save(self, filename):
 
-        if not path:
+        self._create_version_folder()
+        self._create_comment_file()
+
+        if self.deduplicate:
+            self._save_to_store(filename)
             return
 
-        log.info('Caching %s' % path)
-        file_data = None
+        if self.compression:
+            replacing = is_file(filename)
 
-        if path.endswith('.json'):
-            file_data = get_json(path)
+            VersionArchive(filename).save(self.filepath, self.compression)
 
-        if file_data:
-            cls.read_files[path] = file_data
+            # eg. version.default saved again, its old checkout would be used instead of the new archive.
+            if replacing:
+                self._get_store().remove_checkout(filename)
+            return
 
+        if is_dir(self.filepath):
+            copy_dir(self.filepath, filename)
+        if is_file(self.filepath):
+            if not clone_file(self.filepath, filename):
+                copy_file(self.filepath, filename)
 
-def is_locked(filepath):
-    if exists(get_lock_name(filepath)):
-        return True
-
-    return False
+    def _save_to_store(self, filename):
 
+        previous_path = None
 
-def lock(filepath):
-    lock_name = get_lock_name(filepath)
+        version_index = self._get_index(self.version_folder)
+        version_index.load()
+        latest = version_index.get_latest()
 
-    create_file(lock_name)
+        if latest is not None:
+            previous_path = join_path(self.version_folder, version_index.get_entry(latest)['file'])
 
+        self._get_store(self.version_folder).save(self.filepath, filename, previous_path)
 
-def remove_lock(filepath):
-    lock = get_lock_name(filepath)
-    # if is_locked(filepath):
-    delete_file(lock)
-
+    def save_comment(self, comment=None, version_file=None):
+        """
+        Save a comment to a log file.
 
-def get_lock_name(filepath):
-    return filepath + '.lock'
+        Args:
+            comment (str)
+            version_file (str): The corresponding version file.
+        """
+        # TODO: Use splitext if the the version is being used as the extension.
+        version = version_file.split('.')
+        if version:
+            version = version[-1]
 
+        user = getpass.getuser()
 
-def queue_file_access(func):
+        if not comment:
+            comment = '-'
 
-    def wrapper(*args, **kwargs):
+        try:
+            version = int(version)
+        except (ValueError, TypeError):
+            pass
 
-        filepath = args[0]
+        VersionComments(self.comment_file).add(version, comment, user)
 
-        inc = 0
-        while is_locked(args[0]):
-            if inc == 0:
-                util.show('waiting... to use file: %s' % filepath)
+        return comment, user
 
-            if inc == 400:
-                util.show('still waiting... to use file: %s' % filepath)
+    def save(self, comment=None):
+        """
+        Save a version.
+        
+        Args:
+            comment (str): The comment to add to the version.
+        
+        Returns:
+            str: The new version file name
+        """
 
-            if inc == 800:
-                remove_lock(filepath)
+        self._prep_directories()
 
-            time.sleep(0.005)
-            inc += 1
+        if comment is not None:
+            comment.replace('\n', '   ')
+            comment.replace('\r', '   ')
+        if comment is None:
+            comment = ' '
 
-        lock(filepath)
+        inc_file_name = self._increment_version_file_name()
 
-        result = None
+        self._save(inc_file_name)
 
-        try:
-            result = func(*args, **kwargs)
-        except:
-            status = traceback.format_exc()
-            util.error(status)
+        comment, user = self.save_comment(comment, inc_file_name)
 
-        remove_lock(filepath)
-        return result
+        version_index = self._get_index(self.version_folder)
+        version_filename = get_basename(inc_file_name)
+        version_index.add(self._get_version_number(version_filename), version_filename, comment, user)
 
-    return wrapper
+        return inc_file_name
 
-# ---- get
+    def save_default(self):
 
+        self._prep_directories()
 
-def get_basename(directory):
-    """
-    Get the last part of a directory name. If the name is C:/goo/foo, this will return foo.
-    
-    Args:
-        directory(str): A directory path.
-        
-    Returns:
-        str: The last part of the directory path.
-    """
+        filename = self._default_version_file_name()
 
-    if directory:
-        return os.path.basename(directory)
+        if filename:
+            self._save(filename)
+        else:
+            util.warning('Could not save default.')
 
+        return filename
 
-def get_basename_no_extension(filepath):
-    """
-    Get the last part of a directory name. If the name is C:/goo/foo.py, this will return foo.
-    
-    Args:
-        filepath(str): A directory path.
-        
-    Returns:
-        str: The last part of the directory path, without any extensions.
-    """
+    def has_default(self):
 
-    if not filepath:
-        return
+        if not self.version_name:
+            return False
 
-    basename = get_basename(filepath)
+        filename = self._default_version_file_name()
+        if is_file(filename):
+            return True
 
-    new_name = remove_extension(basename)
+        return False
 
-    return new_name
+    def has_versions(self):
+        version_folder = self._get_version_folder()
+        if exists(version_folder):
+            return True
+        else:
+            return False
 
+    def get_count(self):
+        versions = self.get_version_numbers()
+        if versions:
+            return len(versions)
+        else:
+            return 0
 
-def get_dirname(directory):
-    """
-    Given a directory path, this will return the path above the last thing in the path.
-    If C:/goo/foo is give, C:/goo will be returned.
-    
-    Args:
-        directory (str): A directory path. 
+    def set_version_folder(self, folder_path):
+        """
+        Set the folder where the version folder should be created.
         
-    Returns:
-        str: The front portion of the path.
-    """
-    try:
-        return os.path.dirname(directory)
-    except:
-        return False
-
+        Args:
+            folder_path (str): Full path to where the version folder should be created.
+        """
+        self.path = folder_path
 
-def get_user_dir():
-    """
-    Get the path to the user directory.
-    
-    Returns:
-        str: The path to the user directory.
-    """
-    return fix_slashes(os.path.expanduser('~'))
+    def set_version_folder_name(self, name):
+        """
+        Set the name of the version folder.
+        
+        Args:
+            name (str)
+        """
+        self.version_folder_name = name
 
+    def set_deduplicate(self, bool_value):
+        """
+        Save versions to the content addressed store under the version folder. Unchanged files are stored once
+        across versions. Defaults to True when the VETALA_VERSION_STORE environment variable is True.
 
-def get_temp_dir():
-    """
-    Get path to the temp directory.
-    
-    Returns:
-        str: The path to the temp directory.
-    """
-    return fix_slashes(tempfile.gettempdir())
+        Args:
+            bool_value (bool)
+        """
+        self.deduplicate = bool_value
 
+    def set_compression(self, compression):
+        """
+        Save each version as one compressed archive. Not used when deduplicate is on.
+        Defaults to the VETALA_VERSION_COMPRESSION environment variable.
 
-def get_cwd():
-    """
-    Get the current working directory.
-    
-    Returns:
-        str: The path to the current working directory.
-    """
-    return os.getcwd()
+        Args:
+            compression (str): deflate or zstd. None saves plain copies.
+        """
+        self.compression = compression
 
+    def set_version_name(self, name):
+        """
+        Set the version name.
+        
+        Args:
+            name (str): The name of the version.
+        """
+        self.version_name = name
 
-def get_files(directory, filter_text=''):
-    """
-    Get files found in the directory.
-    
-    Args:
-        directory (str): A directory path.
-        filter_text (str): TODO: Add description.
-    
-    Returns:
-        list: A list of files in the directory.
-    """
+    def get_version_path(self, version_int):
+        """
+        Get the path to a version.
+        
+        Args:
+            version_int (int): The version number.
+            
+        Returns:
+            str: The path to the version. For versions in the store or compressed, a writable copy only this user gets.
+        """
+        return self._resolve_version_path(self._get_version_path(version_int), read_only=False)
 
-    files = os.listdir(directory)
+    def read_version_file(self, version_int, relative_path=None):
+        """
+        Read one file of a version without checking out the rest of it.
 
-    found = []
+        Args:
+            version_int (int): The version number.
+            relative_path (str): The file inside a folder version. Not needed when the version is of a file.
 
-    for filename in files:
+        Returns:
+            bytes: The file contents.
+        """
 
-        if filter_text and filename.find(filter_text) == -1:
-            continue
+        path = self._get_version_path(version_int)
 
-        file_path = join_path(directory, filename)
+        if is_file(path):
+            if VersionStore.is_manifest(path):
+                version_store = self._get_store()
+                files = version_store.read_manifest(path)['files']
+                path = version_store.get_object_path(files[relative_path or '.'][0])
 
-        if is_file(file_path):
-            found.append(filename)
+            elif VersionArchive.is_archive(path):
+                return VersionArchive(path).read_member(relative_path)
 
-    return found
+        elif relative_path:
+            path = join_path(path, relative_path)
 
+        with open(path, 'rb') as open_file:
+            return open_file.read()
 
-def get_code_folders(directory, recursive=False, base_directory=None):
-    if not exists(directory):
-        return
+    def get_version_comment(self, version_int):
+        """
+        Get the version comment.
+                
+        Args:
+            version_int (int): The version number.
+            
+        Returns:
+            str: The version comment.
+        """
+        comment, user = self.get_version_data(version_int)
+        return comment
 
-    found_folders = []
+    def get_organized_version_data(self):
+        """
+        Returns:
+            version, comment, user, file_size, modified, version_file
+        """
 
-    folders = get_folders(directory)
+        log.info('Get organized version data')
 
-    if not base_directory:
-        base_directory = directory
+        return self.get_version_history(newest_first=False)
 
-    for folder in folders:
+    def get_version_history(self, start=0, count=None, newest_first=True):
+        """
+        Get a page of version history from the version index.
 
-        if folder == 'version':
-            version = VersionFile(directory)
-            if version.updated_old:
-                continue
+        Args:
+            start (int): How many versions to skip.
+            count (int): How many versions to return. None returns the rest.
+            newest_first (bool): Page from the newest version back.
 
-        if folder.startswith('.'):
-            continue
+        Returns:
+            list: [version, comment, user, file_size, modified, version_file] per version.
+        """
 
-        if folder == '__pycache__':
-            continue
+        version_index = self._get_index()
 
-        folder_path = join_path(directory, folder)
+        if not version_index.load():
+            return
 
-        folder_name = os.path.relpath(folder_path, base_directory)
-        folder_name = fix_slashes(folder_name)
+        datas = []
 
-        found_folders.append(folder_name)
+        for number, entry in version_index.get_history(start, count, newest_first):
 
-        sub_folders = None
-        if recursive:
-            sub_folders = get_code_folders(folder_path, recursive, base_directory)
+            if entry['comment'] is None and entry['user'] is None:
+                continue
 
-        found_folders += sub_folders
+            datas.append(self._get_version_row(number, entry))
 
-    return found_folders
+        return datas
 
+    def get_version_data(self, version_int):
+        """
+        Get the version data.  Comment and user.
+                
+        Args:
+            version_int (int): The version number.
+            
+        Returns:
+            tuple: (comment, user)
+        """
+        filepath = self._get_comment_path()
+
+        if not filepath:
+            return None, None
+
+        return VersionComments(filepath).get(version_int)
+
+    def get_version_numbers(self):
+
+        version_index = self._get_index()
+
+        if not version_index.load():
+            return
+
+        return version_index.get_numbers()
+
+    def get_versions(self, return_version_numbers_also=False):
+        """
+        Get filepaths of all versions.
+        
+        Returns:
+            list: List of version filepaths.
+        """
+
+        log.info('Get versions')
+
+        version_index = self._get_index()
+        version_index.load()
+
+        version_numbers = version_index.get_numbers()
+
+        if not version_numbers:
+            return
+
+        pass_dict = {}
+
+        for number in version_numbers:
+            pass_dict[number] = version_index.get_entry(number)['file']
+
+        if return_version_numbers_also:
+            return pass_dict, version_numbers
+        else:
+            return pass_dict
+
+    def get_latest_version(self):
+        """
+        Get the filepath to the latest version.
+        
+        Returns:
+            str: Filepath to latest version.
+        """
+
+        log.info('Get latest version')
+
+        version_index = self._get_index()
+        version_index.load()
+
+        latest = version_index.get_latest()
+
+        if latest is None:
+            return
+
+        latest_version = version_index.get_entry(latest)['file']
+
+        return self._resolve_version_path(join_path(self._get_version_folder(), latest_version), read_only=False)
+
+    def get_default(self):
+        filename = self._default_version_file_name()
+
+        if filename:
+            filename = self._resolve_version_path(filename, read_only=False)
+
+        return filename
+
+    def delete_version(self, version_number, update_index=True):
+        """
+        Args:
+            update_index (bool): Remove the version from the index. When deleting many versions,
+                pass False and remove them from the index in one write afterwards.
+        """
+
+        path = self._get_version_path(version_number)
+
+        if is_file(path):
+            self._get_store().remove_checkout(path)
+            delete_file(path)
+        else:
+            delete_dir(path)
+
+        if update_index:
+            version_index = self._get_index()
+            version_index.remove(version_number)
+
+
+class SettingsFile(object):
+    """
+    Settings saved as a json list of [name, value] pairs.
+
+    Every change is written right away, unless it happens inside batch(), which writes once when it ends.
+    Writes that wouldn't change the file are skipped.
+    """
+
+    # Counts for every SettingsFile.
+    writes = 0
+    skipped_writes = 0
+
+    def __init__(self):
+
+        self.directory = None
+        self.filepath = None
+
+        self.settings_dict = {}
+        self.optional_dict = {}
+        self.settings_order = []
+        self.write = None
+        self._has_json = None
+
+        # The json text of the file as last read or written, None if it isn't known.
+        self._saved_text = None
+        # (mtime, size) of the file when _saved_text was read or written.
+        self._saved_stat = None
+        self._batch_depth = 0
+        self._dirty = False
+
+    def _get_json_file(self):
+        directory = get_dirname(self.filepath)
+
+        if not self.filepath:
+            return
+
+        name = get_basename_no_extension(self.filepath)
+
+        filename = name + '.json'
+
+        if self._has_json:
+            filepath = join_path(directory, filename)
+        else:
+            filepath = create_file(filename, directory)
+            self._has_json = bool(filepath)
+
+        return filepath
+
+    def _has_json_file(self):
+
+        if self._has_json is not None:
+            return self._has_json
+
+        if not self.filepath:
+            return False
+
+        directory = get_dirname(self.filepath)
+        name = get_basename_no_extension(self.filepath)
+
+        filepath = join_path(directory, name + '.json')
+
+        if exists(filepath):
+            return True
+        else:
+            return False
+
+    def _read(self):
+
+        if not self.filepath:
+            return
+
+        lines = get_file_lines(self.filepath)
+
+        if not lines:
+            return
+
+        self.settings_dict = {}
+        self.settings_order = []
+
+        for line in lines:
+            if not line:
+                continue
+
+            split_line = line.split('=')
+
+            name = split_line[0].strip()
+
+            value = split_line[-1]
+
+            if not value:
+                continue
+
+            value = fix_slashes(value)
+
+            try:
+                value = eval(str(value))
+            except:
+                value = str(value)
+
+            self.settings_dict[name] = value
+            self.settings_order.append(name)
+
+    def _read_json(self):
+
+        filepath = self._get_json_file()
+
+        if not filepath:
+            return
+
+        self.filepath = filepath
+        self._dirty = False
+
+        # stat before reading, if the file changes in between the stat won't match and the next write isn't skipped.
+        saved_stat = self._get_file_stat(filepath)
+
+        items, self._saved_text = SettingsCache.get(filepath)
+        self._saved_stat = saved_stat
+
+        try:
+            data = OrderedDict(items)
+        except:
+            self.settings_order = []
+            self.settings_dict = {}
+            self._saved_text = None
+            self._saved_stat = None
+            return
+
+        self.settings_order = list(data.keys())
+        self.settings_dict = data
+
+    def _update_old(self, filename):
+
+        directory = self.directory
+
+        if filename == 'data.json':
+            old = join_path(directory, 'data.type')
+            if is_file(old):
+                self.filepath = old
+
+        if filename == 'options.json':
+            old_options = join_path(directory, 'options.txt')
+            if is_file(old_options):
+                self.filepath = old_options
+
+        if filename == 'settings.json':
+            old_settings = join_path(directory, 'settings.txt')
+            if is_file(old_settings):
+                self.filepath = old_settings
+
+        if not filename.endswith('.json'):
+            old = join_path(directory, filename)
+
+            if is_file(old):
+                self.filepath = old
+
+        if not is_file(self.filepath):
+            # nothing to update, the json file is made when it is read.
+            return
+
+        self._read()
+        self._write()
+
+    def _write(self):
+
+        if self._batch_depth:
+            self._dirty = True
+            return
+
+        self._write_json()
+
+    def _get_file_stat(self, filepath):
+        try:
+            file_stat = os.stat(filepath)
+        except OSError:
+            return
+
+        return file_stat.st_mtime, file_stat.st_size
+
+    def _is_saved(self, filepath):
+        """
+        Whether the file still holds _saved_text. Other SettingsFile instances may have written it since.
+        """
+
+        if not self._saved_stat:
+            return False
+
+        if self._get_file_stat(filepath) != self._saved_stat:
+            return False
+
+        # a file changed this recently could have changed again without a new mtime, its text is compared instead.
+        if time.time() - self._saved_stat[0] <= ScanCache.racy_seconds:
+            try:
+                with open(filepath, 'r') as open_file:
+                    return open_file.read() == self._saved_text
+            except (IOError, OSError):
+                return False
+
+        return True
+
+    def _write_json(self):
+
+        self._dirty = False
+
+        filepath = self._get_json_file()
+
+        if not filepath:
+            return
+
+        out_list = []
+
+        for key in self.settings_order:
+            value = self.settings_dict[key]
+
+            out_list.append([key, value])
+
+        try:
+            text = get_json_text(out_list)
+        except:
+            util.error(traceback.format_exc())
+            util.warning('Trouble writing json file: %s' % filepath)
+            return
+
+        if text == self._saved_text and self._is_saved(filepath):
+            SettingsFile.skipped_writes += 1
+            return
+
+        get_permission(filepath)
+
+        log.info('Writing json %s' % filepath)
+
+        if write_atomic(filepath, text):
+            self._saved_text = text
+            self._saved_stat = self._get_file_stat(filepath)
+            SettingsFile.writes += 1
+
+            SettingsCache.set(filepath, out_list, text)
+        else:
+            SettingsCache.remove(filepath)
+
+    @classmethod
+    def get_write_stats(cls):
+        """
+        Returns:
+            dict: writes and skipped_writes of every SettingsFile.
+        """
+        return {'writes': cls.writes, 'skipped_writes': cls.skipped_writes}
+
+    @classmethod
+    def clear_write_stats(cls):
+        cls.writes = 0
+        cls.skipped_writes = 0
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Hold back writes until the end of the with block, then write the file once if anything changed.
+        Batches can nest, the outer one writes.
+
+        Usage:
+            with settings.batch():
+                settings.set('name', name)
+                settings.set('data_type', data_type)
+        """
+
+        self._batch_depth += 1
+
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+
+            if not self._batch_depth and self._dirty:
+                self._write_json()
+
+    def set(self, name, value):
+
+        log.info('Set setting %s %s' % (name, value))
+
+        self.settings_dict[name] = value
+
+        if name not in self.settings_order:
+            self.settings_order.append(name)
+
+        self._write()
+
+    def get(self, name):
+
+        if name in self.settings_dict:
+            return self.settings_dict[name]
+
+    def has_setting(self, name):
+
+        if name not in self.settings_dict:
+            return False
+
+        return True
+
+    def has_setting_match(self, name):
+
+        for key in self.settings_dict.keys():
+            if key.endswith(name):
+                return True
+
+        return False
+
+    def has_settings(self):
+
+        if self.settings_order:
+            return True
+
+        return False
+
+    def get_settings(self):
+
+        log.debug('Get settings')
+
+        found = []
+
+        for setting in self.settings_order:
+            found.append([setting, self.settings_dict[setting]])
+
+        return found
+
+    def get_file(self):
+        return self.filepath
+
+    def clear(self):
+
+        self.settings_dict = {}
+        self.settings_order = []
+
+        self._write()
+
+    def reload(self):
+
+        self._read_json()
+
+    def set_directory(self, directory, filename='settings.json'):
+        self.directory = directory
+
+        # eventually after a lot of testing, can add a statement to delete old settings/data files
+
+        self.filepath = join_path(self.directory, filename)
+
+        self._has_json = self._has_json_file()
+
+        if not self._has_json:
+            self._update_old(filename)
+
+        self._read_json()
+        # self._read()
+
+        return self.filepath
+
+
+class ControlNameFromSettingsFile(util.ControlName):
+
+    def __init__(self, directory=None):
+        super(ControlNameFromSettingsFile, self).__init__()
+        self._settings_inst = None
+        self.directory = None
+        if directory:
+            self.set_directory(directory)
+
+    def set_directory(self, directory, filename='settings.json'):
+
+        self.directory = directory
+
+        settings_inst = SettingsFile()
+        settings_inst.set_directory(directory, filename)
+
+        self._settings_inst = settings_inst
+
+        control_order = settings_inst.get('control_name_order')
+
+        if control_order:
+            self.control_order = control_order
+
+        self.control_alias = settings_inst.get('control_alias')
+        self.left_alias = settings_inst.get('control_left')
+        self.right_alias = settings_inst.get('control_right')
+        self.center_alias = settings_inst.get('control_center')
+
+        if not self.control_alias:
+            self.control_alias = 'CNT'
+        if not self.left_alias:
+            self.left_alias = 'L'
+        if not self.right_alias:
+            self.right_alias = 'R'
+        if not self.center_alias:
+            self.center_alias = 'C'
+
+        self.control_uppercase = settings_inst.get('control_uppercase')
+
+        if self.control_uppercase is None:
+            self.control_uppercase = True
+
+    def set(self, name, value):
+
+        if name == 'control_name_order':
+            self.control_order = value
+            if self._settings_inst:
+                self._settings_inst.set(name, value)
+
+        if name == 'control_alias':
+            self.control_alias = str(value)
+            if self._settings_inst:
+                self._settings_inst.set(name, value)
+
+        if name == 'control_left':
+            self.left_alias = value
+            if self._settings_inst:
+                self._settings_inst.set(name, value)
+
+        if name == 'control_right':
+            self.right_alias = value
+            if self._settings_inst:
+                self._settings_inst.set(name, value)
+
+        if name == 'control_center':
+            self.center_alias = value
+            if self._settings_inst:
+                self._settings_inst.set(name, value)
+
+        if name == 'control_uppercase':
+            self.control_uppercase = value
+            if self._settings_inst:
+                self._settings_inst.set(name, value)
+
+
+class FindUniquePath(util.FindUniqueString):
+
+    def __init__(self, directory):
+
+        if not directory:
+            directory = get_cwd()
+
+        self.parent_path = self._get_parent_path(directory)
+        basename = get_basename(directory)
+
+        super(FindUniquePath, self).__init__(basename)
+
+    def _get_parent_path(self, directory):
+        return get_dirname(directory)
+
+    def _get_scope_list(self):
+        return get_files_and_folders(self.parent_path)
+
+    def _search(self):
+
+        end_number = self._get_number()
+
+        self.increment_string = self.test_string
+
+        test_path = join_path(self.parent_path, self.increment_string)
+        if not is_file(test_path) and not is_dir(test_path):
+            return test_path
+
+        unique = False
+
+        scope = self._get_scope_list()
+
+        numbers = []
+        filtered_scope = []
+
+        if scope:
+
+            if len(scope) > 1:
+                for thing in scope:
+
+                    number = util.get_end_number(thing)
+                    if number:
+                        self._format_string(number)
+
+                        if thing == self.increment_string:
+                            numbers.append(number)
+                            filtered_scope.append(thing)
+
+                sort = util.QuickSort(numbers)
+                numbers = sort.run()
+
+        if numbers:
+            if end_number and end_number in numbers:
+                if end_number != numbers[-1]:
+                    end_number = numbers[-1]
+
+        self._format_string(end_number)
+
+        inc = 0
+
+        while not unique:
+
+            if inc > 10000:
+                break
+
+            inc += 1
+
+            if not scope:
+                unique = True
+                continue
+
+            if self.increment_string in scope:
+                if end_number:
+                    end_number += 1
+                else:
+                    end_number = 1
+                self._format_string(end_number)
+                continue
+            else:
+                unique = True
+                continue
+
+        return join_path(self.parent_path, self.increment_string)
+
+
+class ParsePython(object):
+    """
+    An outline of a python module: a tree of PythonScope for its classes and functions, with their line ranges.
+
+    The module is parsed with ast, one top level statement at a time.
+    update takes the new text after an edit and parses again only the top level statements the edit touched.
+    If the text doesn't parse, the outline of the last text that did is kept and error is set.
+
+    Args:
+        filepath (str): The module to parse.
+        text (str): Parse this instead of reading filepath.
+    """
+
+    scope_fields = ['body', 'orelse', 'finalbody', 'handlers', 'cases']
+
+    def __init__(self, filepath=None, text=None):
+
+        self.filepath = filepath
+
+        self.main_scope = PythonScope('main')
+        self.main_scope.set_indent(0)
+
+        self.lines = []
+
+        # Where the last parse failed, (line, message), or None.
+        self.error = None
+
+        # Lines parsed by the last update.
+        self.parsed_lines = 0
+
+        # Top level statements: {'start', 'end', 'scopes'}. None until the text parses.
+        self._blocks = None
+
+        # Lines that didn't parse after the last update, [start, end].
+        self._error_range = None
+
+        if text is None and filepath and is_file(filepath):
+            text = get_file_text(filepath)
+
+        self.update(text or '')
+
+    def _get_bracket(self, node):
+        """
+        The text in brackets after the name of a class or def, read from the source. It can span lines.
+        """
+
+        found = []
+        depth = 0
+        quote = None
+
+        # python 2 gives the line of the first decorator.
+        line_index = node.lineno - 1
+        while line_index < len(self.lines) and self.lines[line_index].lstrip().startswith('@'):
+            line_index += 1
+
+        if line_index >= len(self.lines):
+            return '()'
+
+        line = self.lines[line_index]
+        column = None
+
+        for keyword in ('class', 'def', 'async'):
+            rest = line.lstrip()
+
+            if not rest.startswith(keyword):
+                continue
+
+            rest = rest[len(keyword):].lstrip()
+            if keyword == 'async':
+                rest = rest[len('def'):].lstrip()
+
+            if rest.startswith(node.name):
+                column = len(line) - len(rest) + len(node.name)
+            break
+
+        if column is None:
+            return '()'
+
+        while line_index < len(self.lines):
+            line = self.lines[line_index]
+
+            while column < len(line):
+                character = line[column]
+                column += 1
+
+                if quote:
+                    found.append(character)
+                    if character == '\\':
+                        if column < len(line):
+                            found.append(line[column])
+                            column += 1
+                    elif character == quote:
+                        quote = None
+                    continue
+
+                if character == '(':
+                    depth += 1
+                elif not depth:
+                    if character == ':':
+                        return '()'
+                    continue
+
+                found.append(character)
+
+                if character in ('"', "'"):
+                    quote = character
+                elif character == ')':
+                    depth -= 1
+                    if not depth:
+                        return ''.join(found)
+
+            line_index += 1
+            column = 0
+
+            if line_index < len(self.lines):
+                # arguments over several lines are joined into one line.
+                column = len(self.lines[line_index]) - len(self.lines[line_index].lstrip())
+                if found and found[-1] != '(' and not quote:
+                    found.append(' ')
+
+        return '()'
+
+    def _get_end(self, node):
+        end = getattr(node, 'end_lineno', None)
+
+        if end:
+            return end
+
+        # python 2
+        return max([getattr(sub_node, 'lineno', node.lineno) for sub_node in ast.walk(node)])
+
+    def _get_start(self, node):
+        decorators = getattr(node, 'decorator_list', None)
+
+        if decorators:
+            return min([decorator.lineno for decorator in decorators] + [node.lineno])
+
+        return node.lineno
+
+    def _add_scopes(self, node, parent_scope):
+        """
+        Add a scope under parent_scope for every class and def in the statements of node.
+        """
+
+        for field in self.scope_fields:
+            statements = getattr(node, field, None)
+
+            if not statements:
+                continue
+
+            for statement in statements:
+
+                if isinstance(statement, ast.ClassDef):
+                    scope_type = 'class'
+                elif isinstance(statement, (ast.FunctionDef, getattr(ast, 'AsyncFunctionDef', ast.FunctionDef))):
+                    scope_type = 'def'
+                else:
+                    self._add_scopes(statement, parent_scope)
+                    continue
+
+                start = self._get_start(statement)
+                end = self._get_end(statement)
+
+                scope = PythonScope(statement.name)
+                scope.set_scope_type(scope_type)
+                scope.set_bracket(self._get_bracket(statement))
+                scope.set_indent(statement.col_offset)
+                scope.set_line_range(start, end)
+                scope.set_scope_lines(self.lines[start - 1:end])
+                scope.docstring = ast.get_docstring(statement) or ''
+                scope.set_parent(parent_scope)
+
+                self._add_scopes(statement, scope)
+
+    def _parse_blocks(self, start, end):
+        """
+        Parse lines start to end, a run of whole top level statements.
+
+        Returns:
+            list: Blocks for the statements. Raises SyntaxError if the lines don't parse.
+        """
+
+        text = '\n'.join(self.lines[start - 1:end]) + '\n'
+
+        # blank lines in front keep the line numbers of the nodes the same as in the module.
+        ast_tree = ast.parse('\n' * (start - 1) + text, self.filepath or '<string>', 'exec')
+
+        self.parsed_lines += end - start + 1
+
+        blocks = []
+
+        for statement in ast_tree.body:
+            holder = PythonScope('block')
+
+            module = ast.Module(body=[statement])
+            self._add_scopes(module, holder)
+
+            blocks.append({'start': self._get_start(statement),
+                           'end': self._get_end(statement),
+                           'scopes': holder.children})
+
+        return blocks
+
+    def _shift_blocks(self, blocks, offset):
+        if not offset:
+            return
+
+        for block in blocks:
+            block['start'] += offset
+            block['end'] += offset
+
+            for scope in block['scopes']:
+                scope.shift_lines(offset)
+
+    def _set_blocks(self, blocks):
+        self._blocks = blocks
+
+        self.main_scope.children = []
+
+        for block in blocks:
+            for scope in block['scopes']:
+                scope.set_parent(self.main_scope)
+
+        self.main_scope.set_line_range(1, len(self.lines))
+        self.main_scope.set_scope_lines(self.lines)
+
+    def _set_error(self, error):
+        self.error = (getattr(error, 'lineno', None), str(error))
+
+    def parse(self):
+        """
+        Parse all of the text again.
+
+        Returns:
+            bool: Whether the text parsed.
+        """
+
+        try:
+            blocks = self._parse_blocks(1, len(self.lines))
+        except (SyntaxError, ValueError, TypeError) as error:
+            self._set_error(error)
+            return False
+
+        self.error = None
+        self._error_range = None
+        self._set_blocks(blocks)
+
+        return True
+
+    def update(self, text):
+        """
+        Update the outline to text, the module after an edit.
+
+        Returns:
+            bool: Whether the text parsed. If not, the outline of the last text that parsed is kept.
+        """
+
+        old_lines = self.lines
+        new_lines = get_text_lines(text)
+
+        self.lines = new_lines
+        self.parsed_lines = 0
+
+        if self._blocks is None:
+            return self.parse()
+
+        count = min(len(old_lines), len(new_lines))
+
+        prefix = 0
+        while prefix < count and old_lines[prefix] == new_lines[prefix]:
+            prefix += 1
+
+        if prefix == len(old_lines) == len(new_lines):
+            return self.error is None
+
+        suffix = 0
+        while suffix < count - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+            suffix += 1
+
+        offset = len(new_lines) - len(old_lines)
+
+        # The changed lines of the old text are change_start to change_end, none when lines were only added.
+        change_start = prefix + 1
+        change_end = len(old_lines) - suffix
+
+        region_start = change_start
+        region_end = change_end
+
+        # lines that didn't parse last time are parsed again with the edit.
+        if self._error_range:
+            region_start = min(region_start, self._error_range[0])
+            region_end = max(region_end, self._error_range[1])
+
+        touched = [inc for inc, block in enumerate(self._blocks)
+                   if block['start'] <= region_end and block['end'] >= region_start]
+
+        # an indented line added after a block is part of it.
+        for line in new_lines[prefix:len(new_lines) - suffix]:
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+
+            if line[0].isspace():
+                before = [inc for inc, block in enumerate(self._blocks) if block['end'] < region_start]
+
+                if before and before[-1] not in touched:
+                    touched.insert(0, before[-1])
+            break
+
+        if touched:
+            first, last = touched[0], touched[-1]
+            region_start = min(self._blocks[first]['start'], region_start)
+            region_end = max(self._blocks[last]['end'], region_end)
+        else:
+            first = len([block for block in self._blocks if block['end'] < region_start])
+            last = first - 1
+
+        before = self._blocks[:first]
+        region = self._blocks[first:last + 1]
+        after = self._blocks[last + 1:]
+
+        try:
+            if region_end + offset >= region_start:
+                blocks = self._parse_blocks(region_start, region_end + offset)
+            else:
+                blocks = []
+        except (SyntaxError, ValueError, TypeError) as error:
+            # the edit may only parse with the text around it, eg. an else added after an if.
+            if self.parse():
+                return True
+
+            self._set_error(error)
+
+            # keep the outline that parsed last, moved to where its lines are now.
+            for block in region:
+                if block['start'] > change_end:
+                    self._shift_blocks([block], offset)
+                else:
+                    block['end'] = max(block['start'], block['end'] + offset)
+
+            self._shift_blocks(after, offset)
+            self._set_blocks(self._blocks)
+
+            self._error_range = [region_start, max(region_start, region_end + offset)]
+
+            return False
+
+        self.error = None
+        self._error_range = None
+
+        self._shift_blocks(after, offset)
+        self._set_blocks(before + blocks + after)
+
+        return True
+
+    def get_scope_at_line(self, line_number):
+        """
+        Returns:
+            PythonScope: The innermost class or def that line_number is in, or main_scope.
+        """
+
+        scope = self.main_scope
+
+        while True:
+            for child in scope.children:
+                if child.start_line <= line_number <= child.end_line:
+                    scope = child
+                    break
+            else:
+                return scope
+
+
+class PythonScope(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.parent = None
+        self.children = []
+
+        self.bracket_string = '()'
+        self.docstring = ''
+        self.scope_lines = []
+        self.scope_type = ''
+
+        self.indent = None
+
+        # first and last line of the scope in the module, decorators included. Counted from 1.
+        self.start_line = None
+        self.end_line = None
+
+    def set_scope_type(self, scope_type_name):
+        self.scope_type = scope_type_name
+
+    def set_bracket(self, bracket_string):
+        self.bracket_string = bracket_string
+
+    def set_scope_lines(self, lines):
+        self.scope_lines = lines
+
+    def set_line_range(self, start_line, end_line):
+        self.start_line = start_line
+        self.end_line = end_line
+
+    def shift_lines(self, offset):
+        """
+        Move the scope and its children offset lines down the module.
+        """
+
+        if self.start_line is not None:
+            self.start_line += offset
+            self.end_line += offset
+
+        for child in self.children:
+            child.shift_lines(offset)
+
+    def set_parent(self, parent_scope):
+        self.parent = parent_scope
+        parent_scope.set_child(self)
+
+    def set_child(self, child_scope):
+        self.children.append(child_scope)
+
+    def set_indent(self, indent):
+        self.indent = indent
+
+
+class ReadCache(object):
+    read_files = {}
+
+    @classmethod
+    def is_read(cls, path):
+
+        if path in ReadCache.read_files:
+            return True
+
+        return False
+
+    @classmethod
+    def set_read_data(cls, path, data):
+        log.info('Caching %s' % path)
+        cls.read_files[path] = data
+
+    @classmethod
+    def remove_read_data(cls, path):
+        log.info('Cache removed %s' % path)
+        if path in cls.read_files:
+            cls.read_files.pop(path, None)
+
+    @classmethod
+    def cache_read_data(cls, path):
+
+        if not path:
+            return
+
+        log.info('Caching %s' % path)
+        file_data = None
+
+        if path.endswith('.json'):
+            file_data = get_json(path)
+
+        if file_data:
+            cls.read_files[path] = file_data
+
+
+class ScanCache(object):
+    """
+    Cache of directory listings used by get_folders, get_files, get_code_folders and get_folders_without_prefix_dot.
+    A listing is reused while the directory's mtime hasn't changed.
+    create_dir, delete_dir, rename and move invalidate the paths they touch.
+    """
+
+    # directory: (mtime, folders, files, linked_folders)
+    scans = {}
+
+    hits = 0
+    misses = 0
+
+    # Directories modified this recently are rescanned, since a second change in the same mtime tick would be missed.
+    racy_seconds = 2.0
+
+    # Functions called with each path passed to invalidate, for other caches of the folder tree.
+    callbacks = []
+
+    @classmethod
+    def _get_key(cls, directory):
+        return os.path.abspath(directory)
+
+    @classmethod
+    def _read(cls, directory):
+        folders = []
+        files = []
+        linked_folders = []
+
+        if hasattr(os, 'scandir'):
+            for entry in os.scandir(directory):
+                if entry.is_dir():
+                    folders.append(entry.name)
+                    if entry.is_symlink():
+                        linked_folders.append(entry.name)
+                elif entry.is_file():
+                    files.append(entry.name)
+        else:
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if os.path.isdir(path):
+                    folders.append(name)
+                    if os.path.islink(path):
+                        linked_folders.append(name)
+                elif os.path.isfile(path):
+                    files.append(name)
+
+        return folders, files, linked_folders
+
+    @classmethod
+    def scan(cls, directory):
+        """
+        List the directory. Raises OSError if the directory can't be read.
+
+        Returns:
+            tuple: (folders, files, linked_folders) in directory order. Shared with the cache, don't edit them.
+        """
+
+        key = cls._get_key(directory)
+
+        mtime = os.stat(key).st_mtime
+
+        cached = cls.scans.get(key)
+
+        if cached and cached[0] == mtime:
+            cls.hits += 1
+            return cached[1:]
+
+        cls.misses += 1
+
+        result = cls._read(key)
+
+        if time.time() - mtime > cls.racy_seconds:
+            cls.scans[key] = (mtime,) + result
+        else:
+            cls.scans.pop(key, None)
+
+        return result
+
+    @classmethod
+    def invalidate(cls, path):
+        """
+        Forget the listings of path, everything under it and its parent directory.
+        """
+
+        if not path:
+            return
+
+        key = cls._get_key(path)
+
+        cls.scans.pop(key, None)
+        cls.scans.pop(os.path.dirname(key), None)
+
+        prefix = os.path.join(key, '')
+
+        for cached_key in list(cls.scans.keys()):
+            if cached_key.startswith(prefix):
+                cls.scans.pop(cached_key, None)
+
+        for callback in cls.callbacks:
+            callback(key)
+
+    @classmethod
+    def clear(cls):
+        cls.scans.clear()
+        cls.hits = 0
+        cls.misses = 0
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Returns:
+            dict: hits, misses and the number of cached directories.
+        """
+        return {'hits': cls.hits, 'misses': cls.misses, 'directories': len(cls.scans)}
+
+
+def _copy_json_value(value):
+    if isinstance(value, list):
+        return [_copy_json_value(sub_value) for sub_value in value]
+    if isinstance(value, dict):
+        return dict((key, _copy_json_value(sub_value)) for key, sub_value in value.items())
+
+    return value
+
+
+class SettingsCache(object):
+    """
+    Settings files parsed by SettingsFile, shared by every SettingsFile.
+    A file is parsed again only when its mtime or size changed.
+
+    A file changed within ScanCache.racy_seconds of when it was cached could change again without a new mtime.
+    Its text is read and compared to the cached text until the mtime is old enough, it is only parsed if the text changed.
+    """
+
+    # filepath: (mtime, size, items, text, trusted)
+    files = {}
+
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def _get_key(cls, filepath):
+        return os.path.abspath(filepath)
+
+    @classmethod
+    def _parse(cls, filepath, text):
+        """
+        Returns:
+            list: [name, value] pairs, or None if the file is empty or isn't valid json.
+        """
+
+        if not text:
+            return
+
+        try:
+            items = json.loads(text)
+        except:
+            util.error(traceback.format_exc())
+            util.warning('Trouble reading json file: %s' % filepath)
+            return
+
+        return items
+
+    @classmethod
+    def _is_trusted(cls, file_stat):
+        return time.time() - file_stat.st_mtime > ScanCache.racy_seconds
+
+    @classmethod
+    def get(cls, filepath):
+        """
+        Read a settings file, parsing it only if it changed since it was last parsed or written.
+
+        Returns:
+            tuple: (items, text). items are [name, value] pairs, a copy the caller can edit.
+                text is the json as SettingsFile writes it. Both are None if the file is empty or can't be read.
+        """
+
+        key = cls._get_key(filepath)
+
+        try:
+            file_stat = os.stat(key)
+        except OSError:
+            cls.files.pop(key, None)
+            return None, None
+
+        cached = cls.files.get(key)
+
+        if not cached or cached[0] != file_stat.st_mtime or cached[1] != file_stat.st_size:
+            cached = None
+
+        if cached and cached[4]:
+            cls.hits += 1
+            return _copy_json_value(cached[2]), cached[3]
+
+        try:
+            with open(key, 'r') as open_file:
+                file_text = open_file.read()
+        except (IOError, OSError):
+            cls.files.pop(key, None)
+            return None, None
+
+        if cached and file_text == cached[3]:
+            cls.hits += 1
+            cls.files[key] = cached[:4] + (cls._is_trusted(file_stat),)
+            return _copy_json_value(cached[2]), cached[3]
+
+        cls.misses += 1
+
+        log.info('Reading json %s' % filepath)
+
+        items = cls._parse(key, file_text)
+
+        if items is None:
+            cls.files.pop(key, None)
+            return None, None
+
+        text = get_json_text(items)
+
+        cls._set(key, file_stat, items, text)
+
+        return _copy_json_value(items), text
+
+    @classmethod
+    def _set(cls, key, file_stat, items, text):
+        cls.files[key] = (file_stat.st_mtime, file_stat.st_size, items, text, cls._is_trusted(file_stat))
+
+    @classmethod
+    def set(cls, filepath, items, text):
+        """
+        Keep items as the contents of filepath, after SettingsFile wrote text into it.
+        Until its mtime is older than ScanCache.racy_seconds, the next reads compare the file to text instead of parsing it.
+        """
+
+        key = cls._get_key(filepath)
+
+        try:
+            file_stat = os.stat(key)
+        except OSError:
+            cls.files.pop(key, None)
+            return
+
+        cls._set(key, file_stat, _copy_json_value(items), text)
+
+    @classmethod
+    def remove(cls, filepath):
+        cls.files.pop(cls._get_key(filepath), None)
+
+    @classmethod
+    def clear(cls):
+        cls.files.clear()
+        cls.hits = 0
+        cls.misses = 0
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Returns:
+            dict: hits, misses and the number of cached files.
+        """
+        return {'hits': cls.hits, 'misses': cls.misses, 'files': len(cls.files)}
+
+
+def is_process_running(pid):
+    """
+    Args:
+        pid (int): A process id on this host.
+
+    Returns:
+        bool
+    """
+
+    if util.is_windows():
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+
+        if not handle:
+            # access denied means the process exists.
+            return kernel32.GetLastError() == 5
+
+        exit_code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        kernel32.CloseHandle(handle)
+
+        # STILL_ACTIVE
+        return exit_code.value == 259
+
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno == errno.EPERM
+
+    return True
+
+
+class _FileLockEntry(object):
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.waiters = 0
+        self.handle = None
+        self.locked = False
+        self.owner = None
+
+
+class FileLock(object):
+    """
+    Lock a file against other threads and other processes. Re-entrant for the thread holding it.
+
+    Threads in one process queue on an in-memory lock. The lock on disk, a flock on filepath.lock,
+    or an O_EXCL filepath.lock where fcntl isn't available, is taken by the first holder
+    and kept while other threads in the process are still waiting for it.
+
+    With fcntl filepath.lock is kept on disk and its descriptor stays open between locks,
+    so an uncontended lock and unlock is one flock call each.
+    Without fcntl filepath.lock holds the pid and host of its owner and is deleted on release.
+    A lock file left by a process that crashed is taken over,
+    when its owner is on this host and isn't running anymore, or when it is older than stale_seconds.
+
+    Args:
+        filepath (str): The file to lock.
+    """
+
+    default_timeout = 10.0
+
+    # Seconds after which an O_EXCL lock file whose owner can't be checked is taken over.
+    stale_seconds = 300.0
+
+    # Unlocked descriptors kept open with fcntl. The least recently used are closed past this.
+    max_open_descriptors = 64
+
+    # lock_path: _FileLockEntry, shared by every FileLock in the process.
+    _table = {}
+    _table_lock = threading.Lock()
+
+    # lock_path: _FileLockEntry, entries that are unlocked but still have a descriptor open.
+    _idle = OrderedDict()
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.lock_path = os.path.abspath(get_lock_name(filepath))
+
+    def _get_entry(self):
+        with self._table_lock:
+            entry = self._table.get(self.lock_path)
+            if not entry:
+                entry = _FileLockEntry(self.lock_path)
+                self._table[self.lock_path] = entry
+
+            return entry
+
+    def _acquire_thread_lock(self, thread_lock, timeout):
+        if timeout is None:
+            return thread_lock.acquire()
+
+        if util.python_version >= 3:
+            return thread_lock.acquire(True, max(timeout, 0))
+
+        end_time = time.time() + timeout
+        while not thread_lock.acquire(False):
+            if time.time() > end_time:
+                return False
+            time.sleep(0.005)
+
+        return True
+
+    def _get_owner_text(self):
+        return '%s %s %s' % (os.getpid(), socket.gethostname(), time.time())
+
+    def _write_owner(self, handle):
+        os.write(handle, self._get_owner_text().encode())
+
+    def _flock(self, entry, blocking):
+        """
+        Lock the descriptor of entry, opening it if it isn't open yet.
+
+        Returns:
+            bool: Whether the lock was taken, False if another process holds it.
+        """
+
+        if entry.handle is None:
+            entry.handle = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+
+        flags = fcntl.LOCK_EX
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+
+        try:
+            fcntl.flock(entry.handle, flags)
+        except (IOError, OSError) as error:
+            if error.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            return False
+
+        return True
+
+    def _create_lock(self, entry):
+        """
+        Returns:
+            bool: Whether the lock file was created, False if it exists.
+        """
+
+        try:
+            handle = os.open(self.lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except (IOError, OSError) as error:
+            if error.errno not in (errno.EEXIST, errno.EACCES):
+                raise
+            return False
+
+        self._write_owner(handle)
+        entry.handle = handle
+
+        return True
+
+    def _read_owner(self, lock_path):
+        """
+        Returns:
+            tuple: (text, pid, host, modified time) of the lock file, or None if it can't be read.
+                pid and host are None for a lock file without an owner, eg. one written by an older Vetala.
+        """
+
+        try:
+            modified = os.path.getmtime(lock_path)
+            with open(lock_path, 'r') as open_file:
+                text = open_file.read()
+        except (IOError, OSError):
+            return
+
+        pid = None
+        host = None
+
+        split_text = text.split()
+        if len(split_text) >= 2 and split_text[0].isdigit():
+            pid = int(split_text[0])
+            host = split_text[1]
+
+        return text, pid, host, modified
+
+    def _is_stale(self, owner):
+        text, pid, host, modified = owner
+
+        if pid is not None and host == socket.gethostname():
+            if pid == os.getpid():
+                # this process holds the lock, in another thread or through another FileLock.
+                return False
+            return not is_process_running(pid)
+
+        return time.time() - modified > self.stale_seconds
+
+    def _reclaim_stale(self):
+        """
+        Remove the lock file if its owner crashed.
+        It is renamed first and checked again, so a lock taken in the meantime isn't removed.
+
+        Returns:
+            bool: Whether a stale lock file was removed.
+        """
+
+        owner = self._read_owner(self.lock_path)
+
+        if not owner or not self._is_stale(owner):
+            return False
+
+        stale_path = '%s.%s.stale' % (self.lock_path, os.getpid())
+
+        try:
+            os.rename(self.lock_path, stale_path)
+        except OSError:
+            return False
+
+        stale_owner = self._read_owner(stale_path)
+
+        if not stale_owner or stale_owner[0] != owner[0]:
+            # it was taken over and locked again before the rename, put it back.
+            try:
+                replace_file(stale_path, self.lock_path)
+            except (IOError, OSError):
+                pass
+            return False
+
+        try:
+            os.remove(stale_path)
+        except OSError:
+            pass
+
+        util.warning('Removed stale lock: %s' % self.lock_path)
+
+        return True
+
+    def _lock_file(self, entry, timeout):
+        """
+        Returns:
+            bool: Whether the lock was taken, False if the timeout passed.
+        """
+
+        if timeout is not None:
+            end_time = time.time() + timeout
+
+        if fcntl and timeout is None:
+            return self._flock(entry, True)
+
+        delay = 0.005
+        waiting = False
+
+        while True:
+            if fcntl:
+                locked = self._flock(entry, False)
+            else:
+                locked = self._create_lock(entry)
+
+                if not locked and self._reclaim_stale():
+                    continue
+
+            if locked:
+                return True
+
+            if not waiting:
+                util.show('waiting... to use file: %s' % self.filepath)
+                waiting = True
+
+            if timeout is not None and time.time() > end_time:
+                return False
+
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def _unlock_file(self, entry):
+        entry.locked = False
+
+        if fcntl:
+            fcntl.flock(entry.handle, fcntl.LOCK_UN)
+            self._keep_idle(entry)
+            return
+
+        handle = entry.handle
+        entry.handle = None
+
+        os.close(handle)
+        try:
+            os.remove(entry.lock_path)
+        except OSError:
+            pass
+
+    def _keep_idle(self, entry):
+        """
+        Keep the descriptor of an unlocked entry open, closing the least recently used past max_open_descriptors.
+        """
+
+        with self._table_lock:
+            self._idle.pop(entry.lock_path, None)
+            self._idle[entry.lock_path] = entry
+
+            closing = []
+            while len(self._idle) > self.max_open_descriptors:
+                closing.append(self._idle.popitem(last=False)[1])
+
+        for idle_entry in closing:
+            if not idle_entry.thread_lock.acquire(False):
+                # in use again, its next release puts it back.
+                continue
+            try:
+                if not idle_entry.locked and idle_entry.handle is not None:
+                    os.close(idle_entry.handle)
+                    idle_entry.handle = None
+            finally:
+                idle_entry.thread_lock.release()
+
+    def _release_idle(self, entry):
+        """
+        Unlock the file if the lock was kept for waiters that have all given up.
+        """
+
+        if not entry.thread_lock.acquire(False):
+            return
+
+        try:
+            with self._table_lock:
+                if entry.depth or entry.waiters or not entry.locked:
+                    return
+            self._unlock_file(entry)
+        finally:
+            entry.thread_lock.release()
+
+    def acquire(self, timeout=None):
+        """
+        Args:
+            timeout (float): Seconds to wait. None waits until the lock is free.
+
+        Returns:
+            bool: Whether the lock was acquired.
+        """
+
+        if timeout is not None:
+            end_time = time.time() + timeout
+
+        entry = self._get_entry()
+
+        with self._table_lock:
+            entry.waiters += 1
+
+        try:
+            acquired = self._acquire_thread_lock(entry.thread_lock, timeout)
+        finally:
+            with self._table_lock:
+                entry.waiters -= 1
+
+        if not acquired:
+            self._release_idle(entry)
+            return False
+
+        if not entry.locked:
+            remaining = None
+            if timeout is not None:
+                remaining = max(end_time - time.time(), 0)
+
+            try:
+                entry.locked = self._lock_file(entry, remaining)
+            except:
+                entry.thread_lock.release()
+                raise
+
+            if not entry.locked:
+                entry.thread_lock.release()
+                return False
+
+        entry.depth += 1
+        entry.owner = threading.current_thread().ident
+
+        return True
+
+    def release(self):
+        """
+        Release one acquire from the current thread.
+
+        Returns:
+            bool: False if the current thread didn't hold the lock.
+        """
+
+        entry = self._get_entry()
+
+        if not entry.depth or entry.owner != threading.current_thread().ident:
+            return False
+
+        entry.depth -= 1
+
+        try:
+            if entry.depth == 0:
+                entry.owner = None
+                with self._table_lock:
+                    keep = entry.waiters > 0
+
+                if not keep and entry.locked:
+                    self._unlock_file(entry)
+        finally:
+            entry.thread_lock.release()
+
+        return True
+
+    def is_held(self):
+        """
+        Returns:
+            bool: Whether a thread in this process holds the lock.
+        """
+
+        entry = self._table.get(self.lock_path)
+
+        return bool(entry and entry.depth)
+
+
+def is_locked(filepath):
+    """
+    Returns:
+        bool: Whether the file is locked by this process or another one.
+    """
+
+    file_lock = FileLock(filepath)
+
+    if file_lock.is_held():
+        return True
+
+    if not exists(file_lock.lock_path):
+        return False
+
+    if not fcntl:
+        owner = file_lock._read_owner(file_lock.lock_path)
+        return not owner or not file_lock._is_stale(owner)
+
+    if not file_lock.acquire(0):
+        return True
+
+    file_lock.release()
+
+    return False
+
+
+def lock(filepath, timeout=None):
+    """
+    Returns:
+        bool: Whether the lock was acquired. Release it with remove_lock.
+    """
+
+    return FileLock(filepath).acquire(timeout)
+
+
+def remove_lock(filepath):
+    FileLock(filepath).release()
+
+
+def get_lock_name(filepath):
+    return filepath + '.lock'
+
+
+def queue_file_access(func):
+    """
+    Decorator for functions that take a filepath as their first argument.
+    Calls are serialized with a FileLock on the file, across threads and processes.
+    Where the lock file can't be created, eg. in a read only folder, the call runs without it.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+
+        filepath = args[0]
+
+        file_lock = FileLock(filepath)
+
+        try:
+            acquired = file_lock.acquire(FileLock.default_timeout)
+        except (IOError, OSError):
+            return func(*args, **kwargs)
+
+        if not acquired:
+            raise RuntimeError('Timed out waiting to use file: %s' % filepath)
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            file_lock.release()
+
+    return wrapper
+
+# ---- get
+
+
+def get_basename(directory):
+    """
+    Get the last part of a directory name. If the name is C:/goo/foo, this will return foo.
+    
+    Args:
+        directory(str): A directory path.
+        
+    Returns:
+        str: The last part of the directory path.
+    """
+
+    if directory:
+        return os.path.basename(directory)
+
+
+def get_basename_no_extension(filepath):
+    """
+    Get the last part of a directory name. If the name is C:/goo/foo.py, this will return foo.
+    
+    Args:
+        filepath(str): A directory path.
+        
+    Returns:
+        str: The last part of the directory path, without any extensions.
+    """
+
+    if not filepath:
+        return
+
+    basename = get_basename(filepath)
+
+    new_name = remove_extension(basename)
+
+    return new_name
+
+
+def get_dirname(directory):
+    """
+    Given a directory path, this will return the path above the last thing in the path.
+    If C:/goo/foo is give, C:/goo will be returned.
+    
+    Args:
+        directory (str): A directory path. 
+        
+    Returns:
+        str: The front portion of the path.
+    """
+    try:
+        return os.path.dirname(directory)
+    except:
+        return False
+
+
+def get_user_dir():
+    """
+    Get the path to the user directory.
+    
+    Returns:
+        str: The path to the user directory.
+    """
+    return fix_slashes(os.path.expanduser('~'))
+
+
+def get_temp_dir():
+    """
+    Get path to the temp directory.
+    
+    Returns:
+        str: The path to the temp directory.
+    """
+    return fix_slashes(tempfile.gettempdir())
+
+
+def get_cwd():
+    """
+    Get the current working directory.
+    
+    Returns:
+        str: The path to the current working directory.
+    """
+    return os.getcwd()
+
+
+def get_files(directory, filter_text=''):
+    """
+    Get files found in the directory.
+    
+    Args:
+        directory (str): A directory path.
+        filter_text (str): TODO: Add description.
+    
+    Returns:
+        list: A list of files in the directory.
+    """
+
+    files = ScanCache.scan(directory)[1]
+
+    found = []
+
+    for filename in files:
+
+        if filter_text and filename.find(filter_text) == -1:
+            continue
+
+        found.append(filename)
+
+    return found
+
+
+def get_code_folders(directory, recursive=False, base_directory=None):
+    if not exists(directory):
+        return
+
+    found_folders = []
+
+    folders = get_folders(directory)
+
+    if not base_directory:
+        base_directory = directory
+
+    for folder in folders:
+
+        if folder.startswith('.'):
+            continue
+
+        if folder == '__pycache__':
+            continue
+
+        folder_path = join_path(directory, folder)
+
+        folder_name = os.path.relpath(folder_path, base_directory)
+        folder_name = fix_slashes(folder_name)
+
+        found_folders.append(folder_name)
+
+        sub_folders = None
+        if recursive:
+            sub_folders = get_code_folders(folder_path, recursive, base_directory)
+
+        found_folders += sub_folders
+
+    return found_folders
+
+
+def get_folders_without_prefix_dot(directory, recursive=False, base_directory=None):
+    if not exists(directory):
+        return
+
+    found_folders = []
+
+    folders = get_folders(directory)
+
+    if not base_directory:
+        base_directory = directory
+
+    for folder in folders:
+
+        if folder.startswith('.'):
+            continue
+
+        folder_path = join_path(directory, folder)
+
+        folder_name = os.path.relpath(folder_path, base_directory)
+        folder_name = fix_slashes(folder_name)
+
+        found_folders.append(folder_name)
+
+        sub_folders = None
+        if recursive:
+            sub_folders = get_folders_without_prefix_dot(folder_path, recursive, base_directory)
+
+        found_folders += sub_folders
+
+    """
+    os.walk was slower... it was retrieving everything... folders and files...
+    for root, dirs, files in os.walk(directory):
+        
+        for folder in dirs:
+            
+            if folder == 'version':
+            
+                version = VersionFile(root)
+                
+                if version.updated_old:
+                    continue
+            
+            if folder.startswith('.'):
+                continue
+            
+            folder_name = join_path(root, folder)
+            
+            folder_name = os.path.relpath(folder_name,directory)
+            folder_name = fix_slashes(folder_name)
+            
+            found_folders.append(folder_name)
+        
+        if not recursive:
+            break
+    """
+
+    return found_folders
+
+
+def get_folders(directory, recursive=False, filter_text='', skip_dot_prefix=False):
+    """
+    Get folders found in the directory.
+    
+    Args:
+        directory (str): A directory path.
+        recursive (bool): TODO: Fill in description.
+        filter_text (str): TODO: Fill in description.
+        skip_dot_prefix (bool): TODO: Fill in description.
+    
+    Returns:
+        list: A list of folders in the directory.
+    """
+
+    found_folders = []
+
+    if not directory:
+        return found_folders
+
+    if recursive:
+        try:
+            for root, dirs in _walk_folders(directory):
+
+                for folder in dirs:
+
+                    if filter_text:
+                        if folder.find(filter_text) > -1:
+                            continue
+
+                    if skip_dot_prefix:
+                        if folder.startswith('.'):
+                            continue
+
+                    folder_name = join_path(root, folder)
+
+                    folder_name = os.path.relpath(folder_name, directory)
+
+                    if filter_text:
+                        if folder_name.find(filter_text) > -1:
+                            continue
+
+                    folder_name = fix_slashes(folder_name)
+
+                    if skip_dot_prefix:
+                        if folder_name.startswith('.') or folder_name.find('/.') > -1:
+                            continue
+
+                    found_folders.append(folder_name)
+        except:
+            return found_folders
+    else:
+        # files = None
+
+        try:
+            found_folders = list(ScanCache.scan(directory)[0])
+        except:
+            found_folders = []
+
+    return found_folders
+
+
+def _walk_folders(directory):
+    """
+    Like os.walk, top down without following linked folders, but only folders and using ScanCache.
+    Unreadable folders are skipped.
+
+    Returns:
+        generator: (root, folders)
+    """
+
+    try:
+        folders, _, linked_folders = ScanCache.scan(directory)
+    except OSError:
+        return
+
+    yield directory, folders
+
+    for folder in folders:
+        if folder in linked_folders:
+            continue
+
+        for result in _walk_folders(os.path.join(directory, folder)):
+            yield result
+
+
+def get_files_and_folders(directory):
+    """
+    Get files and folders found in the directory.
+    
+    Args:
+        directory (str): A directory path.
+    
+    Returns:
+        list: A list of files and folders in the directory.
+    """
+
+    try:
+        files = os.listdir(directory)
+    except:
+        files = []
+
+    return files
+
+
+def get_folders_date_sorted(directory):
+    """
+    Get folders date sorted found in the directory.
+    
+    Args:
+        directory (str): A directory path.
+    
+    Returns:
+        list: A list of folders date sorted in the directory.
+    """
+    mtime = lambda f: os.stat(os.path.join(directory, f)).st_mtime
+
+    return list(sorted(os.listdir(directory), key=mtime))
+
+
+def get_files_date_sorted(directory, extension=None, filter_text=''):
+    """
+    Get files date sorted found in the directory.
+    
+    Args:
+        directory (str): A directory path.
+        extension (str): TODO: Fill in description.
+        filter_text (str): TODO: Fill in description.
+    
+    Returns:
+        list: A list of files date sorted in the directory.
+    """
+    if extension:
+        files = get_files_with_extension(extension, directory, filter_text=filter_text)
+    else:
+        files = get_files(directory, filter_text)
+
+    mtime = lambda f: os.stat(os.path.join(directory, f)).st_mtime
+
+    return list(sorted(files, key=mtime))
+
+
+def get_latest_file_at_path(path, filter_text=''):
+    files = get_files_date_sorted(path, filter_text)
+
+    if files:
+        filepath = join_path(path, files[-1])
+
+        return filepath
+
+
+def get_latest_file(file_paths, only_return_one_match=True):
+    last_time = 0
+    times = {}
+
+    for file_path in file_paths:
+
+        mtime = os.stat(file_path).st_mtime
+
+        if mtime not in times:
+            times[mtime] = []
+
+        times[mtime].append(file_path)
+
+        if mtime > last_time:
+            last_time = mtime
+
+    if not times.keys():
+        return
+
+    if only_return_one_match:
+        return times[mtime][0]
+    else:
+        return times[mtime]
+
+
+def get_files_with_extension(extension, directory, fullpath=False, filter_text=''):
+    """
+    Get files that have the extensions.
+    
+    Args:
+        extension (str): e.g. .py, .data, etc.
+        directory (str): A directory path.
+        fullpath (bool): Whether to return the filepath or just the file names.
+        filter_text (str): TODO: Fill in description.
+    
+    Returns:
+        list: A list of files with the extension.
+    """
+    found = []
+
+    try:
+        objects = os.listdir(directory)
+    except:
+        return found
+
+    for filename_and_extension in objects:
+        _, test_extension = os.path.splitext(filename_and_extension)
+
+        if filter_text and filename_and_extension.find(filter_text) == -1:
+            continue
+
+        if not extension.startswith('.'):
+            extension = '.' + extension
+
+        if extension == test_extension:
+            if fullpath:
+                found.append(join_path(directory, filename_and_extension))
+            else:
+                found.append(filename_and_extension)
+
+    return found
+
+
+def get_size(path, round_value=2):
+    size = 0
+
+    if is_dir(path):
+        size = get_folder_size(path, round_value)
+    if is_file(path):
+        size = get_filesize(path, round_value)
+
+    return size
+
+
+def get_filesize(filepath, round_value=2):
+    """
+    Get the size of a file.
+    
+    Args:
+        filepath (str): TODO: Fill in description.
+        round_value (int): TODO: Fill in description.
+        
+    Return
+        float: The size of the file specified by filepath.
+    """
+
+    size = os.path.getsize(filepath)
+    size_format = round(size * 0.000001, round_value)
+
+    return size_format
+
+
+def get_folder_size(path, round_value=2, skip_names=None):
+    """
+    skip_names will skip folders and files that have the same name specified in skip_names list.
+    """
+    if skip_names is None:
+        skip_names = []
+    size = 0
+
+    skip_names = util.convert_to_sequence(skip_names)
+
+    for root, dirs, files in os.walk(path):
+
+        root_name = get_basename(root)
+        if root_name in skip_names:
+            continue
+
+        for name in files:
+
+            if name in skip_names:
+                continue
+
+            size += get_filesize(join_path(root, name), round_value)
+
+    return size
+
+
+def format_date_time(python_date_time_value, separators=True):
+    date_value = python_date_time_value
+
+    year = date_value.year
+    month = date_value.month
+    day = date_value.day
+
+    hour = str(date_value.hour)
+    minute = str(date_value.minute)
+    second = date_value.second
+
+    second = str(int(second))
+
+    if len(hour) == 1:
+        hour = '0' + hour
+    if len(minute) == 1:
+        minute = '0' + minute
+    if len(second) == 1:
+        second = second + '0'
+
+    value = ''
+    if separators:
+        value = '%s-%s-%s  %s:%s:%s' % (year, month, day, hour, minute, second)
+    else:
+        value = '%s%s%s%s%s%s' % (year, month, day, hour, minute, second)
+
+    return value
+
+
+def get_date():
+    date_value = datetime.datetime.now()
+    year = date_value.year
+    month = date_value.month
+    day = date_value.day
+
+    return '%s-%s-%s' % (year, month, day)
+
+
+def get_date_and_time(separators=True):
+    date_time_value = datetime.datetime.now()
+
+    return format_date_time(date_time_value, separators)
+
+
+def get_last_modified_date(filepath):
+    """
+    Get the last date a file was modified.
+    
+    Args:
+        filepath (str)
+        
+    Returns:
+        str: A formatted date and time.
+    """
+
+    mtime = os.path.getmtime(filepath)
+
+    date_time_value = datetime.datetime.fromtimestamp(mtime)
+
+    formatted_value = format_date_time(date_time_value)
+
+    return formatted_value
+
+
+def get_user():
+    """
+    Get the current user.
+    
+    Returns:
+        str: The name of the current user.
+    """
+    return getpass.getuser()
+
+
+def get_file_text(filepath):
+    """
+    Get the text directly from a file. One long string, no parsing.
+    
+    """
+
+    # get_permission(filepath)
+
+    try:
+        with open(filepath, 'r') as open_file:
+            return open_file.read()
+    except:
+        pass
+
+
+def get_text_lines(text):
+    text = text.replace('\r', '')
+    lines = text.split('\n')
+
+    return lines
+
+
+def get_file_lines(filepath):
+    """
+    Get the text from a file. Each line is stored as a different entry in a list.
+    
+    Args:
+        filepath (str): TODO: Fill in description.
+        
+    Returns:
+        list
+    """
+    """
+    lines = []
+    try:
+        with open(filepath, 'r') as open_file:
+            for line in open_file:
+                lines.append(line)
+            #return open_file.readlines()
+    except:
+        pass
+    return lines
+    """
 
-def get_folders_without_prefix_dot(directory, recursive=False, base_directory=None):
-    if not exists(directory):
+    text = get_file_text(filepath)
+
+    if not text:
+        return []
+
+    return get_text_lines(text)
+
+
+def get_json_text(data):
+    return json.dumps(data, indent=4, sort_keys=True, separators=(',', ':'))
+
+
+@queue_file_access
+def set_json(filepath, data, append=False, atomic=False):
+    """
+    Args:
+        filepath (str): The json file.
+        data: Anything json can save.
+        append (bool): Add to the end of the file.
+        atomic (bool): Write a temp file and move it over filepath, so the file is never left half written.
+    """
+    get_permission(filepath)
+
+    log.info('Writing json %s' % filepath)
+
+    if atomic and not append:
+        try:
+            text = get_json_text(data)
+        except:
+            util.error(traceback.format_exc())
+            util.warning('Trouble writing json file: %s' % filepath)
+            return
+
+        write_atomic(filepath, text)
         return
 
-    found_folders = []
+    write_mode = 'w'
+    if append:
+        write_mode = 'a'
 
-    folders = get_folders(directory)
+    with open(filepath, write_mode) as json_file:
+        try:
+            json.dump(data, json_file, indent=4, sort_keys=True, separators=(',', ':'))
+        except:
+            util.error(traceback.format_exc())
+            util.warning('Trouble writing json file: %s' % util.show(filepath))
 
-    if not base_directory:
-        base_directory = directory
 
-    for folder in folders:
+@queue_file_access
+def get_json(filepath):
+    if ReadCache.is_read(filepath):
+        log.info('Skipping reading %s' % filepath)
+        return ReadCache.read_files[filepath]
 
-        if folder == 'version':
-            version = VersionFile(directory)
-            if version.updated_old:
-                continue
+    log.info('Reading json %s' % filepath)
 
-        if folder.startswith('.'):
-            continue
+    if os.stat(filepath).st_size == 0:
+        return
+
+    data = None
+
+    with open(filepath, 'r') as json_file:
+
+        try:
+            data = json.load(json_file)
+        except:
+
+            util.error(traceback.format_exc())
+            util.warning('Trouble reading json file: %s' % util.show(filepath))
+    return data
+
+
+def exists(directory, case_sensitive=False):
+    if not directory:
+        return False
+
+    log.debug('exists: %s' % directory)
+
+    if case_sensitive and not util.is_windows():
+        case_sensitive = False
+
+    if case_sensitive:
+        parent_folder = get_dirname(directory)
+        thing = get_basename(directory)
+        if thing in os.listdir(parent_folder):
+            return True
+        else:
+            return False
+    else:
+        try:
+            stat = os.stat(directory)
+            if stat:
+                return True
+        except:
+            return False
+    return False
+
+
+def is_dir(directory, case_sensitive=False):
+    """
+    Returns: 
+        bool
+    """
+
+    if not directory:
+        return False
+
+    log.debug('is directory: %s' % directory)
+
+    if case_sensitive and not util.is_windows():
+        case_sensitive = False
+
+    if case_sensitive:
+        parent_folder = get_dirname(directory)
+        folder = get_basename(directory)
+        try:
+            if folder in os.listdir(parent_folder):
+                return True
+        except:
+            pass
+        else:
+            return False
+    else:
+        try:
+            mode = os.stat(directory)[stat.ST_MODE]
+            if stat.S_ISDIR(mode):
+                return True
+        except:
+            return False
+
+
+def is_file(filepath):
+    """
+    Returns: 
+        bool
+    """
+
+    if not filepath:
+        return False
+
+    log.debug('is file: %s' % filepath)
+
+    try:
+        mode = os.stat(filepath)[stat.ST_MODE]
+        if stat.S_ISREG(mode):
+            return True
+
+    except:
+        return False
+
+
+def is_file_in_dir(filename, directory):
+    """
+    
+    Args:
+        filename (str): Filename including path.
+        directory (str): Directory name including path.
+    
+    Returns:
+        bool: Whether the file is in the directory.
+    """
+
+    log.debug('is file in directory')
+    filepath = join_path(directory, filename)
+
+    return os.path.isfile(filepath)
+
+
+def is_same_date(file1, file2):
+    """
+    Check if 2 files have the same date.
+    
+    Args:
+        file1 (str): Filename including path.
+        file2 (str): Filename including path.
+        
+    Returns: 
+        bool
+    """
+
+    if file1 is None and file2 is not None:
+        return False
+
+    if file1 is None and file2 is None:
+        return True
+    if file1 is not None and file2 is None:
+        return False
+
+    date1 = os.path.getmtime(file1)
+    date2 = os.path.getmtime(file2)
+
+    if date1 is None and date2 is None:
+        return True
+
+    if date1 is not None and date2 is not None:
+        value = date1 - date2
+
+        if abs(value) < 0.01:
+            return True
+
+    if date1 is None and date2 is not None:
+        return False
+
+    if date1 is not None and date2 is None:
+        return False
+
+
+def is_same_text_content(file1, file2):
+    return filecmp.cmp(file1, file2)
+
+    """
+    text1 = get_file_text(file1)
+    text2 = get_file_text(file2)
+    
+    if text1 == text2:
+        return True
+    
+    return False
+    """
+
+
+def inc_path_name(directory, padding=0):
+    """
+    Add padding to a name if it is not unique.
+    
+    Args:
+        directory (str): Directory name including path.
+        padding (int): Where the padding should start.
+        
+    Returns:
+        str: The new directory with path.
+    """
+    unique_path = FindUniquePath(directory)
+    unique_path.set_padding(padding)
+
+    return unique_path.get()
+
+
+def remove_extension(path):
+    base, _ = os.path.splitext(path)
+    return base.replace(os.path.sep, "/")
+
+
+def get_common_path(path1, path2):
+    if util.python_version >= 3:
+        paths = [path1, path2]
+        return os.path.commonpath(paths).replace(os.path.sep, '/')
+    else:
+        path1 = fix_slashes(path1)
+        path2 = fix_slashes(path2)
+
+        split_path1 = path1.split('/')
+        split_path2 = path2.split('/')
+
+        first_list = split_path1
+        second_list = split_path2
 
-        folder_path = join_path(directory, folder)
+        found = []
 
-        folder_name = os.path.relpath(folder_path, base_directory)
-        folder_name = fix_slashes(folder_name)
+        for inc in range(0, len(first_list)):
 
-        found_folders.append(folder_name)
+            if len(second_list) <= inc:
+                break
 
-        sub_folders = None
-        if recursive:
-            sub_folders = get_folders_without_prefix_dot(folder_path, recursive, base_directory)
+            if first_list[inc] == second_list[inc]:
+                found.append(first_list[inc])
 
-        found_folders += sub_folders
+            if first_list[inc] != second_list[inc]:
+                break
 
-    """
-    os.walk was slower... it was retrieving everything... folders and files...
-    for root, dirs, files in os.walk(directory):
-        
-        for folder in dirs:
-            
-            if folder == 'version':
-            
-                version = VersionFile(root)
-                
-                if version.updated_old:
-                    continue
-            
-            if folder.startswith('.'):
-                continue
-            
-            folder_name = join_path(root, folder)
-            
-            folder_name = os.path.relpath(folder_name,directory)
-            folder_name = fix_slashes(folder_name)
-            
-            found_folders.append(folder_name)
-        
-        if not recursive:
-            break
-    """
+        found = '/'.join(found)
 
-    return found_folders
+        return found
 
 
-def get_folders(directory, recursive=False, filter_text='', skip_dot_prefix=False):
+def remove_common_path(path1, path2):
     """
-    Get folders found in the directory.
+    Given path1 = pathA/pathB
+    and path2 = pathA/pathC
     
-    Args:
-        directory (str): A directory path.
-        recursive (bool): TODO: Fill in description.
-        filter_text (str): TODO: Fill in description.
-        skip_dot_prefix (bool): TODO: Fill in description.
+    or path1 = pathA
+    and path2 = pathA/pathC
     
-    Returns:
-        list: A list of folders in the directory.
+    return pathC
     """
 
-    found_folders = []
+    path1 = fix_slashes(path1)
+    path2 = fix_slashes(path2)
 
-    if not directory:
-        return found_folders
+    split_path1 = path1.split('/')
+    split_path2 = path2.split('/')
 
-    if recursive:
-        try:
-            for root, dirs, files in os.walk(directory):
+    skip = True
+    new_path = []
 
-                for folder in dirs:
+    for inc in range(0, len(split_path2)):
 
-                    if filter_text:
-                        if folder.find(filter_text) > -1:
-                            continue
+        if skip:
+            if len(split_path1) > inc:
+                if split_path1[inc] != split_path2[inc]:
+                    skip = False
 
-                    if skip_dot_prefix:
-                        if folder.startswith('.'):
-                            continue
+            if (len(split_path1) - 1) < inc:
+                skip = False
 
-                    folder_name = join_path(root, folder)
+        if not skip:
+            new_path.append(split_path2[inc])
 
-                    folder_name = os.path.relpath(folder_name, directory)
+    new_path = '/'.join(new_path)
 
-                    if filter_text:
-                        if folder_name.find(filter_text) > -1:
-                            continue
+    return new_path
 
-                    folder_name = fix_slashes(folder_name)
 
-                    if skip_dot_prefix:
-                        if folder_name.startswith('.') or folder_name.find('/.') > -1:
-                            continue
+def remove_common_path_simple(path1, path2):
+    """
+    This just subtracts a string that is the same at the beginning.
+    path1 gets subtracted from path2
+    """
 
-                    found_folders.append(folder_name)
-        except:
-            return found_folders
-    else:
-        # files = None
+    if not path2:
+        return ''
 
-        try:
-            found_folders = next(os.walk(directory))[1]
-        except:
-            found_folders = []
+    value = path2.find(path1)
+    sub_part = None
 
-    return found_folders
+    if value > -1 and value == 0:
+        sub_part = path2[len(path1):]
+
+    if sub_part:
+        if sub_part.startswith('/'):
+            sub_part = sub_part[1:]
 
+    return sub_part
 
-def get_files_and_folders(directory):
+
+def get_installed_programs():
     """
-    Get files and folders found in the directory.
-    
-    Args:
-        directory (str): A directory path.
-    
-    Returns:
-        list: A list of files and folders in the directory.
+    Not working at all, very hacky
     """
+    if util.is_windows():
+        # this is a hack for now.
 
-    try:
-        files = os.listdir(directory)
-    except:
-        files = []
+        import _winreg
+        uninstall_dir = 'HKLM\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall'
 
-    return files
+        uninstall = _winreg.OpenKey(_winreg.HKEY_CURRENT_USER, uninstall_dir)
 
+        try:
+            inc = 0
+            while 1:
+                name, value, type = _winreg.EnumValue(uninstall, inc)
 
-def get_folders_date_sorted(directory):
-    """
-    Get folders date sorted found in the directory.
-    
-    Args:
-        directory (str): A directory path.
-    
-    Returns:
-        list: A list of folders date sorted in the directory.
-    """
-    mtime = lambda f: os.stat(os.path.join(directory, f)).st_mtime
+                inc += 1
 
-    return list(sorted(os.listdir(directory), key=mtime))
+        except WindowsError:
+            pass
+
+        get_files(uninstall_dir)
 
 
-def get_files_date_sorted(directory, extension=None, filter_text=''):
+def get_comments(comment_directory, comment_filename=None):
     """
-    Get files date sorted found in the directory.
+    Get the comments from a comments.txt file.
     
     Args:
-        directory (str): A directory path.
-        extension (str): TODO: Fill in description.
-        filter_text (str): TODO: Fill in description.
-    
+        comment_directory (str): Directory where the comments.txt file lives.
+        comment_filename (str): The name of the comment file. By default, comments.txt
+        
     Returns:
-        list: A list of files date sorted in the directory.
+        dict: comment dict, keys are filename, and value is (comment, user) 
     """
-    if extension:
-        files = get_files_with_extension(extension, directory, filter_text=filter_text)
-    else:
-        files = get_files(directory, filter_text)
-
-    mtime = lambda f: os.stat(os.path.join(directory, f)).st_mtime
 
-    return list(sorted(files, key=mtime))
-
-
-def get_latest_file_at_path(path, filter_text=''):
-    files = get_files_date_sorted(path, filter_text)
+    if comment_filename:
+        comment_file = join_path(comment_directory, comment_filename)
+    else:
+        comment_file = join_path(comment_directory, 'comments.txt')
 
-    if files:
-        filepath = join_path(path, files[-1])
+    if not comment_file:
+        return
 
-        return filepath
+    comments = {}
 
+    lines = get_file_lines(comment_file)
 
-def get_latest_file(file_paths, only_return_one_match=True):
-    last_time = 0
-    times = {}
+    if lines:
+        filename = None
+        comment = None
+        user = None
 
-    for file_path in file_paths:
+        for line in lines:
 
-        mtime = os.stat(file_path).st_mtime
+            exec(line)
 
-        if mtime not in times:
-            times[mtime] = []
+            if comment_filename:
+                if comment_filename == filename:
+                    return comment, user
 
-        times[mtime].append(file_path)
+            comments[filename] = [comment, user]
 
-        if mtime > last_time:
-            last_time = mtime
+    return comments
 
-    if not times.keys():
-        return
 
-    if only_return_one_match:
-        return times[mtime][0]
+def get_default_directory():
+    if util.is_in_maya():
+        return join_path(get_user_dir(), 'process_manager')
     else:
-        return times[mtime]
+        return join_path(get_user_dir(), 'documents/process_manager')
 
 
-def get_files_with_extension(extension, directory, fullpath=False, filter_text=''):
-    """
-    Get files that have the extensions.
-    
-    Args:
-        extension (str): e.g. .py, .data, etc.
-        directory (str): A directory path.
-        fullpath (bool): Whether to return the filepath or just the file names.
-        filter_text (str): TODO: Fill in description.
-    
-    Returns:
-        list: A list of files with the extension.
-    """
-    found = []
+def get_vetala_settings_inst():
+    vetala_settings = os.environ.get('VETALA_SETTINGS')
 
-    try:
-        objects = os.listdir(directory)
-    except:
-        return found
+    if not vetala_settings:
+        vetala_settings = get_default_directory()
 
-    for filename_and_extension in objects:
-        _, test_extension = os.path.splitext(filename_and_extension)
+    settings = SettingsFile()
+    settings.set_directory(vetala_settings)
 
-        if filter_text and filename_and_extension.find(filter_text) == -1:
-            continue
+    return settings
 
-        if not extension.startswith('.'):
-            extension = '.' + extension
+# ---- edit
 
-        if extension == test_extension:
-            if fullpath:
-                found.append(join_path(directory, filename_and_extension))
-            else:
-                found.append(filename_and_extension)
 
-    return found
+def fix_slashes(directory):
+    """
+    Fix slashes in a path so they are all /
+    
+    Args:
+        directory (str): path that one wants to fix slashes on.
 
+    Returns:
+        str: The new directory path.
+    """
+    if not directory:
+        return
+    directory = os.path.normpath(directory).replace(os.path.sep, "/")
+    return directory
 
-def get_size(path, round_value=2):
-    size = 0
 
-    if is_dir(path):
-        size = get_folder_size(path, round_value)
-    if is_file(path):
-        size = get_filesize(path, round_value)
+def set_windows_slashes(directory):
+    """
+    Set all the slashes in a name, so they are all \
+    
+    Args:
+        directory (str): The directory that one wants to convert to use windows slashes.
 
-    return size
+    Returns:
+        str: The new directory path.
+    """
+    directory = os.path.normpath(directory).replace(os.path.sep, "\\")
+    return directory
 
 
-def get_filesize(filepath, round_value=2):
+def join_path(directory1, directory2):
     """
-    Get the size of a file.
+    Append directory2 to the end of directory1
     
+    Returns:
+        str: The combined directory path.
+    """
+    if not directory1 or not directory2:
+        return
+    path = os.path.join(directory1, directory2).replace(os.path.sep, "/")
+    if not path:
+        util.warning('Join path failed on %s and %s' % (directory1, directory2))
+    return path
+
+
+def rename(directory, name, make_unique=False):
+    """
     Args:
-        filepath (str): TODO: Fill in description.
-        round_value (int): TODO: Fill in description.
+        directory (str): Full path to the directory to rename.
+        name (str): The new name.
+        make_unique (bool): Whether to add a number to the name to make it unique, if needed.
         
     Return
-        float: The size of the file specified by filepath.
+        str: The path of the renamed folder, or False if rename fails. 
     """
 
-    size = os.path.getsize(filepath)
-    size_format = round(size * 0.000001, round_value)
+    basename = get_basename(directory)
 
-    return size_format
+    if basename == name:
+        return
 
+    parentpath = get_dirname(directory)
 
-def get_folder_size(path, round_value=2, skip_names=None):
-    """
-    skip_names will skip folders and files that have the same name specified in skip_names list.
-    """
-    if skip_names is None:
-        skip_names = []
-    size = 0
+    renamepath = join_path(parentpath, name)
 
-    skip_names = util.convert_to_sequence(skip_names)
+    if make_unique:
+        renamepath = inc_path_name(renamepath)
 
-    for root, dirs, files in os.walk(path):
+    if exists(renamepath, case_sensitive=True):
+        return False
 
-        root_name = get_basename(root)
-        if root_name in skip_names:
-            continue
+    try:
 
-        for name in files:
+        get_permission(directory)
 
-            if name in skip_names:
-                continue
+        message = 'rename: ' + directory + '   to   ' + renamepath
+        util.show(message)
 
-            size += get_filesize(join_path(root, name), round_value)
+        os.rename(directory, renamepath)
+    except:
+        time.sleep(.1)
+        try:
+            os.rename(directory, renamepath)
+        except:
+            util.error(traceback.format_exc())
+            return False
+    finally:
+        ScanCache.invalidate(directory)
+        ScanCache.invalidate(renamepath)
 
-    return size
+    return renamepath
 
 
-def format_date_time(python_date_time_value, separators=True):
-    date_value = python_date_time_value
+def move(path1, path2):
+    """
+    Move the folder or file pointed to by path1 under the directory path2
+    
+    Args:
+        path1 (str): File or folder including path.
+        path2 (str): Path where path1 should move to.
+        
+    Returns:
+        bool: Whether the move was successful.
+    """
+    try:
+        shutil.move(path1, path2)
+    except:
+        util.warning('Failed to move %s to %s' % (path1, path2))
+        return False
+    finally:
+        ScanCache.invalidate(path1)
+        ScanCache.invalidate(join_path(path2, get_basename(path1)))
 
-    year = date_value.year
-    month = date_value.month
-    day = date_value.day
+    return True
 
-    hour = str(date_value.hour)
-    minute = str(date_value.minute)
-    second = date_value.second
 
-    second = str(int(second))
+def write_lines(filepath, lines, append=False):
+    """
+    Write a list of text lines to a file. Every entry in the list is a new line.
+    
+    Args:
+        filepath (str): filename and path
+        lines (list): A list of text lines. Each entry is a new line.
+        append (bool): Whether to append the text or if not replace it.
+    
+    """
 
-    if len(hour) == 1:
-        hour = '0' + hour
-    if len(minute) == 1:
-        minute = '0' + minute
-    if len(second) == 1:
-        second = second + '0'
+    permission = get_permission(filepath)
 
-    value = ''
-    if separators:
-        value = '%s-%s-%s  %s:%s:%s' % (year, month, day, hour, minute, second)
-    else:
-        value = '%s%s%s%s%s%s' % (year, month, day, hour, minute, second)
+    lines = util.convert_to_sequence(lines)
 
-    return value
+    write_string = 'w'
 
+    text = '\n'.join(map(str, lines))
 
-def get_date():
-    date_value = datetime.datetime.now()
-    year = date_value.year
-    month = date_value.month
-    day = date_value.day
+    if append:
+        write_string = 'a'
+        text = '\n' + text
 
-    return '%s-%s-%s' % (year, month, day)
+    with open(filepath, write_string) as open_file:
+        open_file.write(text)
 
 
-def get_date_and_time(separators=True):
-    date_time_value = datetime.datetime.now()
+def replace_file(source, destination):
+    """
+    Move source over destination. Where the platform allows it this happens in one step,
+    so nothing reading destination finds it half written.
+    """
 
-    return format_date_time(date_time_value, separators)
+    if hasattr(os, 'replace'):
+        try:
+            os.replace(source, destination)
+            return
+        except OSError:
+            # windows won't replace a file another program has open.
+            pass
+    elif not util.is_windows():
+        os.rename(source, destination)
+        return
 
+    shutil.copyfile(source, destination)
+    os.remove(source)
 
-def get_last_modified_date(filepath):
+
+def write_atomic(filepath, text):
     """
-    Get the last date a file was modified.
-    
-    Args:
-        filepath (str)
-        
+    Write text to a temp file next to filepath, then move it over filepath.
+
     Returns:
-        str: A formatted date and time.
+        bool
     """
 
-    mtime = os.path.getmtime(filepath)
-
-    date_time_value = datetime.datetime.fromtimestamp(mtime)
+    directory, name = os.path.split(filepath)
+    temp_path = os.path.join(directory, '.%s.%s_%s.tmp' % (name, os.getpid(), threading.current_thread().ident))
 
-    formatted_value = format_date_time(date_time_value)
+    try:
+        with open(temp_path, 'w') as open_file:
+            open_file.write(text)
 
-    return formatted_value
+        replace_file(temp_path, filepath)
+    except (IOError, OSError):
+        util.warning('Could not write: %s' % filepath)
 
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
 
-def get_user():
-    """
-    Get the current user.
-    
-    Returns:
-        str: The name of the current user.
-    """
-    return getpass.getuser()
+        return False
 
+    return True
 
-def get_file_text(filepath):
-    """
-    Get the text directly from a file. One long string, no parsing.
-    
-    """
 
-    # get_permission(filepath)
+def write_replace(filepath, stuff_to_write):
+    open_file = open(filepath, 'w')
 
     try:
-        with open(filepath, 'r') as open_file:
-            return open_file.read()
+        open_file.write(stuff_to_write)
     except:
-        pass
-
+        util.warning('Could not write: %s' % stuff_to_write)
 
-def get_text_lines(text):
-    text = text.replace('\r', '')
-    lines = text.split('\n')
+    open_file.close()
 
-    return lines
+# ---- create
 
 
-def get_file_lines(filepath):
+def create_dir(name, directory=None, make_unique=False):
     """
-    Get the text from a file. Each line is stored as a different entry in a list.
-    
     Args:
-        filepath (str): TODO: Fill in description.
+        name (str): The name of the new directory.
+        directory (str): TODO: Fill in description.
+        make_unique (bool): Whether to pad the name with a number to make it unique. Only if the name is taken.
         
     Returns:
-        list
-    """
-    """
-    lines = []
-    try:
-        with open(filepath, 'r') as open_file:
-            for line in open_file:
-                lines.append(line)
-            #return open_file.readlines()
-    except:
-        pass
-    return lines
-    """
-
-    text = get_file_text(filepath)
-
-    if not text:
-        return []
+        str: The folder name with path. False if create_dir failed.
+    """
 
-    return get_text_lines(text)
+    full_path = None
+    if directory is None:
+        full_path = name
 
+    if not name and directory:
+        full_path = directory
 
-# @queue_file_access
-def set_json(filepath, data, append=False):
-    get_permission(filepath)
+    if name and directory:
+        full_path = join_path(directory, name)
 
-    log.info('Writing json %s' % filepath)
-    write_mode = 'w'
-    if append:
-        write_mode = 'a'
+    if not full_path:
+        util.warning(''.join(traceback.format_stack()[:-1]))
+        util.warning('Could not create directory. No path from name: %s and directory: %s' % (name, directory))
+        return False
 
-    with open(filepath, write_mode) as json_file:
-        try:
-            json.dump(data, json_file, indent=4, sort_keys=True, separators=(',', ':'))
-        except:
-            util.error(traceback.format_exc())
-            util.warning('Trouble writing json file: %s' % util.show(filepath))
+    if make_unique:
+        full_path = inc_path_name(full_path)
 
+    if is_dir(full_path, case_sensitive=True):
+        return full_path
 
-# @queue_file_access
-def get_json(filepath):
-    if ReadCache.is_read(filepath):
-        log.info('Skipping reading %s' % filepath)
-        return ReadCache.read_files[filepath]
+    try:
+        os.makedirs(full_path)
+    except:
+        util.error(traceback.format_exc())
+        return False
+    finally:
+        ScanCache.invalidate(full_path)
 
-    log.info('Reading json %s' % filepath)
+    get_permission(full_path)
 
-    if os.stat(filepath).st_size == 0:
-        return
+    return full_path
 
-    data = None
 
-    with open(filepath, 'r') as json_file:
+def delete_dir(name, directory=None):
+    """
+    Delete the folder by name in the directory.
+    
+    Args:
+        name (str): The name of the folder to delete.  Name can also be the full path, with no need to supply directory.
+        directory (str): The directory path where the folder lives.
+        
+    Returns:
+        str: The folder that was deleted with path.
+    """
 
-        try:
-            data = json.load(json_file)
-        except:
+    util.clean_file_string(name)
 
-            util.error(traceback.format_exc())
-            util.warning('Trouble reading json file: %s' % util.show(filepath))
-    return data
+    full_path = name
 
+    if directory:
+        full_path = join_path(directory, name)
 
-def exists(directory, case_sensitive=False):
-    if not directory:
-        return False
+    if not exists(full_path):
+        util.show('%s was not deleted. It does not exist.' % full_path)
 
-    log.debug('exists: %s' % directory)
+        return full_path
 
-    if case_sensitive and not util.is_windows():
-        case_sensitive = False
+    try:
+        shutil.rmtree(full_path, onerror=delete_read_only_error)
+    except:
+        util.warning('Could not remove children of path %s' % full_path)
+    finally:
+        ScanCache.invalidate(full_path)
 
-    if case_sensitive:
-        parent_folder = get_dirname(directory)
-        thing = get_basename(directory)
-        if thing in os.listdir(parent_folder):
-            return True
-        else:
-            return False
-    else:
-        try:
-            stat = os.stat(directory)
-            if stat:
-                return True
-        except:
-            return False
-    return False
+    return full_path
 
 
-def is_dir(directory, case_sensitive=False):
+def delete_read_only_error(action, name, exc):
     """
-    Returns: 
-        bool
+    Helper to delete read only files.
     """
 
-    if not directory:
-        return False
+    get_permission(name)
+    action(name)
 
-    log.debug('is directory: %s' % directory)
 
-    if case_sensitive and not util.is_windows():
-        case_sensitive = False
+def refresh_dir(directory, delete_directory=True):
+    """
+    Delete everything in the directory.
+    """
 
-    if case_sensitive:
-        parent_folder = get_dirname(directory)
-        folder = get_basename(directory)
+    base_name = get_basename(directory)
+    dir_name = get_dirname(directory)
+
+    if exists(directory):
         try:
-            if folder in os.listdir(parent_folder):
-                return True
+            files = get_files_and_folders(directory)
         except:
-            pass
-        else:
-            return False
+            files = []
+        if files:
+            for filename in files:
+                delete_file(filename, directory)
+        if delete_directory:
+            delete_dir(base_name, dir_name)
     else:
-        try:
-            mode = os.stat(directory)[stat.ST_MODE]
-            if stat.S_ISDIR(mode):
-                return True
-        except:
-            return False
+        create_dir(base_name, dir_name)
 
 
-def is_file(filepath):
+def create_file(name, directory=None, make_unique=False):
     """
-    Returns: 
-        bool
+    Args:
+        name (str): The name of the new file.
+        directory (str): TODO: Fill in description.
+        make_unique (bool): Whether to pad the name with a number to make it unique. Only if the name is taken.
+        
+    Returns:
+        str: The filename with path. False if create_dir failed.
     """
 
-    if not filepath:
-        return False
+    if directory is None:
+        directory = get_dirname(name)
+        name = get_basename(name)
 
-    log.debug('is file: %s' % filepath)
+    name = util.clean_file_string(name)
+    full_path = join_path(directory, name)
 
-    try:
-        mode = os.stat(filepath)[stat.ST_MODE]
-        if stat.S_ISREG(mode):
-            return True
+    if make_unique:
+        full_path = inc_path_name(full_path)
+
+    open_file = None
 
+    try:
+        open_file = open(full_path, 'a')
+        open_file.close()
     except:
+        if open_file:
+            open_file.close()
+        # turn on when troubleshooting
+        # util.warning( traceback.format_exc() )
         return False
 
+    get_permission(full_path)
 
-def is_file_in_dir(filename, directory):
+    return full_path
+
+
+def delete_file(name, directory=None, show_warning=True):
     """
+    Delete the file by name in the directory.
     
     Args:
-        filename (str): Filename including path.
-        directory (str): Directory name including path.
-    
+        name (str): The name of the file to delete.
+        directory (str): The dirpath where the file lives.
+        show_warning (bool): TODO: Fill in description.
+        
     Returns:
-        bool: Whether the file is in the directory.
+        str: The filepath that was deleted.
     """
 
-    log.debug('is file in directory')
-    filepath = join_path(directory, filename)
+    if directory:
+        full_path = join_path(directory, name)
+    else:
+        full_path = name
 
-    return os.path.isfile(filepath)
+    try:
+        get_permission(full_path)
+    except:
+        pass
+    try:
+        os.remove(full_path)
+    except:
+        pass
 
+        # util.error( traceback.format_exc() )
+        # util.warning('trouble removing %s' % full_path)
+        # raise
 
-def is_same_date(file1, file2):
-    """
-    Check if 2 files have the same date.
-    
-    Args:
-        file1 (str): Filename including path.
-        file2 (str): Filename including path.
-        
-    Returns: 
-        bool
-    """
+    return full_path
 
-    if file1 is None and file2 is not None:
-        return False
 
-    if file1 is None and file2 is None:
-        return True
-    if file1 is not None and file2 is None:
-        return False
+def copy_with_subprocess(cmd):
+    """
+    Run a copy command.
 
-    date1 = os.path.getmtime(file1)
-    date2 = os.path.getmtime(file2)
+    Args:
+        cmd (list): The command and its arguments. A str runs through the shell.
 
-    if date1 is None and date2 is None:
-        return True
+    Returns:
+        bool: Whether the command exited without an error.
+    """
 
-    if date1 is not None and date2 is not None:
-        value = date1 - date2
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=util.is_str(cmd))
+    msg, err = proc.communicate()
+    # if msg:print msg
 
-        if abs(value) < 0.01:
-            return True
+    failed = proc.returncode != 0
 
-    if date1 is None and date2 is not None:
-        return False
+    # robocopy exit codes below 8 mean success
+    if not util.is_str(cmd) and cmd and cmd[0] == 'robocopy':
+        failed = proc.returncode >= 8
 
-    if date1 is not None and date2 is None:
+    if failed:
+        print(err)
         return False
 
+    return True
 
-def is_same_text_content(file1, file2):
-    return filecmp.cmp(file1, file2)
 
+def fast_copy(directory, directory_destination, ignore_patterns=None, progress=None, threads=None):
     """
-    text1 = get_file_text(file1)
-    text2 = get_file_text(file2)
-    
-    if text1 == text2:
-        return True
-    
-    return False
+    Copy the contents of directory into directory_destination with a CopyPlan.
+
+    Returns:
+        dict: The stats from CopyPlan.run
     """
 
+    copy_plan = CopyPlan(threads)
+    copy_plan.add_folder(directory, directory_destination, ignore_patterns)
+
+    stats = copy_plan.run(progress)
 
-def inc_path_name(directory, padding=0):
+    if copy_plan.errors:
+        util.warning('%s files could not be copied from %s to %s' % (len(copy_plan.errors), directory, directory_destination))
+
+    return stats
+
+
+def copy_dir(directory, directory_destination, ignore_patterns=None, progress=None):
     """
-    Add padding to a name if it is not unique.
+    Copy the directory to a new directory.
     
     Args:
-        directory (str): Directory name including path.
-        padding (int): Where the padding should start.
+        directory (str): The directory to copy with path.
+        directory_destination (str): The destination directory.
+        ignore_patterns (list): Add txt, py or extensions to ingore them from copying. 
+        E.g. if py is added to the ignore patterns list, all *.py files will be ignored from the copy.
+        Glob patterns like *.pyc or .version work too.
+        progress (function): See CopyPlan.run
         
     Returns:
-        str: The new directory with path.
+        str: The destination directory
     """
-    unique_path = FindUniquePath(directory)
-    unique_path.set_padding(padding)
-
-    return unique_path.get()
 
+    if not is_dir(directory):
+        return
 
-def remove_extension(path):
-    base, _ = os.path.splitext(path)
-    return base.replace(os.path.sep, "/")
+    fast_copy(directory, directory_destination, ignore_patterns, progress)
 
+    return directory_destination
 
-def get_common_path(path1, path2):
-    if util.python_version >= 3:
-        paths = [path1, path2]
-        return os.path.commonpath(paths).replace(os.path.sep, '/')
-    else:
-        path1 = fix_slashes(path1)
-        path2 = fix_slashes(path2)
 
-        split_path1 = path1.split('/')
-        split_path2 = path2.split('/')
+def clone_file(source, destination):
+    """
+    Copy on write clone on linux file systems that support it, like btrfs and xfs.
+    The clone shares the blocks of source until either file is written to.
 
-        first_list = split_path1
-        second_list = split_path2
+    Returns:
+        bool: Whether the clone worked.
+    """
 
-        found = []
+    if not fcntl or not sys.platform.startswith('linux'):
+        return False
 
-        for inc in range(0, len(first_list)):
+    # FICLONE from linux/fs.h
+    ficlone = 0x40049409
 
-            if len(second_list) <= inc:
-                break
+    try:
+        with open(source, 'rb') as source_file:
+            with open(destination, 'wb') as destination_file:
+                fcntl.ioctl(destination_file.fileno(), ficlone, source_file.fileno())
+    except (IOError, OSError):
+        if os.path.isfile(destination):
+            os.remove(destination)
+        return False
 
-            if first_list[inc] == second_list[inc]:
-                found.append(first_list[inc])
+    return True
 
-            if first_list[inc] != second_list[inc]:
-                break
 
-        found = '/'.join(found)
+def copy_file_contents(source, destination, size=None):
+    """
+    Copy the bytes of source into destination inside the kernel with copy_file_range or sendfile where available,
+    otherwise through python. Metadata isn't copied, same as shutil.copyfile
 
-        return found
+    Some file systems, like procfs and some FUSE, NFS and CIFS mounts, return 0 from copy_file_range or sendfile
+    without copying. A call that returns 0 before size bytes are copied falls back to the next way of copying.
 
+    Args:
+        size (int): Bytes to copy. Defaults to the size of source when it is opened.
 
-def remove_common_path(path1, path2):
-    """
-    Given path1 = pathA/pathB
-    and path2 = pathA/pathC
-    
-    or path1 = pathA
-    and path2 = pathA/pathC
-    
-    return pathC
+    Returns:
+        int: Bytes copied.
     """
 
-    path1 = fix_slashes(path1)
-    path2 = fix_slashes(path2)
+    binary = getattr(os, 'O_BINARY', 0)
 
-    split_path1 = path1.split('/')
-    split_path2 = path2.split('/')
+    copied = 0
+    chunk = 64 * 1024 * 1024
 
-    skip = True
-    new_path = []
+    source_handle = os.open(source, os.O_RDONLY | binary)
 
-    for inc in range(0, len(split_path2)):
+    try:
+        if size is None:
+            size = os.fstat(source_handle).st_size
 
-        if skip:
-            if len(split_path1) > inc:
-                if split_path1[inc] != split_path2[inc]:
-                    skip = False
+        destination_handle = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | binary, 0o666)
 
-            if (len(split_path1) - 1) < inc:
-                skip = False
+        try:
+            if hasattr(os, 'copy_file_range'):
+                try:
+                    while copied < size:
+                        sent = os.copy_file_range(source_handle, destination_handle, chunk, copied, copied)
+                        if not sent:
+                            break
+                        copied += sent
+                except OSError:
+                    # cross device on older kernels, or a file system without support.
+                    pass
 
-        if not skip:
-            new_path.append(split_path2[inc])
+            if copied < size and hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+                try:
+                    while copied < size:
+                        os.lseek(destination_handle, copied, os.SEEK_SET)
+                        sent = os.sendfile(destination_handle, source_handle, copied, chunk)
+                        if not sent:
+                            break
+                        copied += sent
+                except OSError:
+                    pass
 
-    new_path = '/'.join(new_path)
+            # an empty size could be a file like those in procfs, that only have contents when read.
+            if size and copied >= size:
+                return copied
 
-    return new_path
+            # read until the end of the file, it could have grown since size was taken.
+            os.lseek(source_handle, copied, os.SEEK_SET)
+            os.lseek(destination_handle, copied, os.SEEK_SET)
+            os.ftruncate(destination_handle, copied)
 
+            while True:
+                block = os.read(source_handle, 1024 * 1024)
+                if not block:
+                    break
 
-def remove_common_path_simple(path1, path2):
-    """
-    This just subtracts a string that is the same at the beginning.
-    path1 gets subtracted from path2
-    """
+                view = memoryview(block)
+                while view:
+                    view = view[os.write(destination_handle, view):]
 
-    if not path2:
-        return ''
+                copied += len(block)
+        finally:
+            os.close(destination_handle)
+    finally:
+        os.close(source_handle)
 
-    value = path2.find(path1)
-    sub_part = None
+    return copied
 
-    if value > -1 and value == 0:
-        sub_part = path2[len(path1):]
 
-    if sub_part:
-        if sub_part.startswith('/'):
-            sub_part = sub_part[1:]
+def _is_same_file_contents(source, destination, size):
+    """
+    Whether destination already holds source, compared by size, then by contents if their mtimes differ.
+    """
 
-    return sub_part
+    try:
+        if os.path.getsize(destination) != size:
+            return False
+    except OSError:
+        return False
 
+    return filecmp.cmp(source, destination, shallow=True)
 
-def get_installed_programs():
+
+def _get_ignore_function(ignore_patterns):
     """
-    Not working at all, very hacky
+    Args:
+        ignore_patterns (list): Glob patterns of names to leave out, like *.pyc or .version.
+            A pattern that is only letters and numbers, like py, is an extension.
+
+    Returns:
+        function: Takes a file or folder name and returns whether to leave it out.
     """
-    if util.is_windows():
-        # this is a hack for now.
 
-        import _winreg
-        uninstall_dir = 'HKLM\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall'
+    if not ignore_patterns:
+        return None
 
-        uninstall = _winreg.OpenKey(_winreg.HKEY_CURRENT_USER, uninstall_dir)
+    if util.is_str(ignore_patterns):
+        ignore_patterns = [ignore_patterns]
 
-        try:
-            inc = 0
-            while 1:
-                name, value, type = _winreg.EnumValue(uninstall, inc)
+    patterns = []
 
-                inc += 1
+    for pattern in ignore_patterns:
+        if pattern.isalnum():
+            pattern = '*.%s' % pattern
+        patterns.append(pattern)
 
-        except WindowsError:
-            pass
+    def ignore(name):
+        for pattern in patterns:
+            if fnmatch.fnmatch(name, pattern):
+                return True
+        return False
 
-        get_files(uninstall_dir)
+    return ignore
 
 
-def get_comments(comment_directory, comment_filename=None):
+def _scan_for_copy(folder):
     """
-    Get the comments from a comments.txt file.
-    
-    Args:
-        comment_directory (str): Directory where the comments.txt file lives.
-        comment_filename (str): The name of the comment file. By default, comments.txt
-        
     Returns:
-        dict: comment dict, keys are filename, and value is (comment, user) 
+        list: [name, path, is_dir, is_link, size] for each entry in folder. size is None for folders.
     """
 
-    if comment_filename:
-        comment_file = join_path(comment_directory, comment_filename)
-    else:
-        comment_file = join_path(comment_directory, 'comments.txt')
+    found = []
 
-    if not comment_file:
-        return
+    if hasattr(os, 'scandir'):
+        for entry in os.scandir(folder):
+            is_link = entry.is_symlink()
+            is_dir = entry.is_dir()
 
-    comments = {}
+            size = None
+            if not is_dir:
+                size = entry.stat(follow_symlinks=False).st_size
 
-    lines = get_file_lines(comment_file)
+            found.append([entry.name, entry.path, is_dir, is_link, size])
 
-    if lines:
-        filename = None
-        comment = None
-        user = None
+        return found
 
-        for line in lines:
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        is_dir = os.path.isdir(path)
 
-            exec(line)
+        size = None
+        if not is_dir:
+            size = os.lstat(path).st_size
 
-            if comment_filename:
-                if comment_filename == filename:
-                    return comment, user
+        found.append([name, path, is_dir, os.path.islink(path), size])
 
-            comments[filename] = [comment, user]
+    return found
 
-    return comments
 
+class CopyPlan(object):
+    """
+    File copies planned up front, then run on a pool of threads.
+    A file is skipped when its destination already has the same size and contents.
+    Versions added with add_version are saved after the copies, on the same pool.
 
-def get_default_directory():
-    if util.is_in_maya():
-        return join_path(get_user_dir(), 'process_manager')
-    else:
-        return join_path(get_user_dir(), 'documents/process_manager')
+    Folders are walked with os.scandir. Links are copied as links, except on Windows where the file they point to is copied.
+    A file that fails doesn't stop the others, the failures are in errors after run.
 
+    Args:
+        threads (int): How many files to copy at once.
+    """
 
-def get_vetala_settings_inst():
-    vetala_settings = os.environ.get('VETALA_SETTINGS')
+    default_threads = 8
 
-    if not vetala_settings:
-        vetala_settings = get_default_directory()
+    # Seconds between calls to the progress function.
+    progress_seconds = 0.1
 
-    settings = SettingsFile()
-    settings.set_directory(vetala_settings)
+    def __init__(self, threads=None):
+        self.threads = threads or self.default_threads
 
-    return settings
+        # [source, destination, size]
+        self.copies = []
+        # [link target, destination]
+        self.links = []
+        # folders to make, even if nothing is copied into them
+        self.folders = []
+        # [filepath, comment]
+        self.versions = []
+        # [path, error message]
+        self.errors = []
 
-# ---- edit
+        self._stats = {}
+        self._new_folders = set()
+        self._lock = threading.Lock()
 
+    def add_file(self, source, destination):
+        try:
+            size = os.path.getsize(source)
+        except OSError:
+            util.warning('Nothing to copy: %s' % source)
+            return
 
-def fix_slashes(directory):
-    """
-    Fix slashes in a path so they are all /
-    
-    Args:
-        directory (str): path that one wants to fix slashes on.
+        self.copies.append([source, destination, size])
 
-    Returns:
-        str: The new directory path.
-    """
-    if not directory:
-        return
-    directory = os.path.normpath(directory).replace(os.path.sep, "/")
-    return directory
+    def add_folder(self, source, destination, ignore_patterns=None):
+        """
+        Plan a copy of everything inside source into destination.
 
+        Args:
+            source (str): The folder to copy.
+            destination (str): The folder the contents go into. Made if it doesn't exist.
+            ignore_patterns (list): See _get_ignore_function
+        """
 
-def set_windows_slashes(directory):
-    """
-    Set all the slashes in a name, so they are all \
-    
-    Args:
-        directory (str): The directory that one wants to convert to use windows slashes.
+        if not is_dir(source):
+            util.warning('Nothing to copy: %s' % source)
+            return
 
-    Returns:
-        str: The new directory path.
-    """
-    directory = os.path.normpath(directory).replace(os.path.sep, "\\")
-    return directory
+        ignore = _get_ignore_function(ignore_patterns)
+        keep_links = not util.is_windows()
 
+        stack = [(source, destination)]
 
-def join_path(directory1, directory2):
-    """
-    Append directory2 to the end of directory1
-    
-    Returns:
-        str: The combined directory path.
-    """
-    if not directory1 or not directory2:
-        return
-    path = os.path.join(directory1, directory2).replace(os.path.sep, "/")
-    if not path:
-        util.warning('Join path failed on %s and %s' % (directory1, directory2))
-    return path
+        while stack:
+            folder, target = stack.pop()
 
+            self.folders.append(target)
 
-def rename(directory, name, make_unique=False):
-    """
-    Args:
-        directory (str): Full path to the directory to rename.
-        name (str): The new name.
-        make_unique (bool): Whether to add a number to the name to make it unique, if needed.
-        
-    Return
-        str: The path of the renamed folder, or False if rename fails. 
-    """
+            try:
+                entries = _scan_for_copy(folder)
+            except OSError as error:
+                self.errors.append([folder, str(error)])
+                continue
 
-    basename = get_basename(directory)
+            for name, path, is_dir_entry, is_link, size in entries:
 
-    if basename == name:
-        return
+                if ignore and ignore(name):
+                    continue
 
-    parentpath = get_dirname(directory)
+                target_path = target + '/' + name
 
-    renamepath = join_path(parentpath, name)
+                if is_link and keep_links:
+                    self.links.append([os.readlink(path), target_path])
+                    continue
 
-    if make_unique:
-        renamepath = inc_path_name(renamepath)
+                if is_dir_entry:
+                    stack.append((path, target_path))
+                    continue
 
-    if exists(renamepath, case_sensitive=True):
-        return False
+                if is_link:
+                    try:
+                        size = os.path.getsize(path)
+                    except OSError as error:
+                        self.errors.append([path, str(error)])
+                        continue
 
-    try:
+                self.copies.append([path, target_path, size])
 
-        get_permission(directory)
+    def add(self, source, destination, ignore_patterns=None):
+        if is_dir(source):
+            self.add_folder(source, destination, ignore_patterns)
+        else:
+            self.add_file(source, destination)
 
-        message = 'rename: ' + directory + '   to   ' + renamepath
-        util.show(message)
+    def add_version(self, filepath, comment=None):
+        """
+        Save a version of filepath once the copies are done.
+        """
+        self.versions.append([filepath, comment])
+
+    def get_file_count(self):
+        return len(self.copies) + len(self.links)
+
+    def get_size(self):
+        """
+        Returns:
+            int: Bytes to copy.
+        """
+        return sum([copy[2] for copy in self.copies])
 
-        os.rename(directory, renamepath)
-    except:
-        time.sleep(.1)
-        try:
-            os.rename(directory, renamepath)
-        except:
-            util.error(traceback.format_exc())
-            return False
+    def _add_error(self, path):
+        error = traceback.format_exc()
+        util.warning('Error copying %s\n%s' % (path, error))
 
-    return renamepath
+        with self._lock:
+            self.errors.append([path, error.strip().split('\n')[-1]])
 
+    def _run_threads(self, jobs, function, progress=None):
 
-def move(path1, path2):
-    """
-    Move the folder or file pointed to by path1 under the directory path2
-    
-    Args:
-        path1 (str): File or folder including path.
-        path2 (str): Path where path1 should move to.
-        
-    Returns:
-        bool: Whether the move was successful.
-    """
-    try:
-        shutil.move(path1, path2)
-    except:
-        util.warning('Failed to move %s to %s' % (path1, path2))
-        return False
+        jobs = list(reversed(jobs))
 
-    return True
+        def work():
+            while True:
+                with self._lock:
+                    if not jobs:
+                        return
+                    job = jobs.pop()
 
+                try:
+                    function(job)
+                except Exception:
+                    self._add_error(job[0])
 
-def write_lines(filepath, lines, append=False):
-    """
-    Write a list of text lines to a file. Every entry in the list is a new line.
-    
-    Args:
-        filepath (str): filename and path
-        lines (list): A list of text lines. Each entry is a new line.
-        append (bool): Whether to append the text or if not replace it.
-    
-    """
+        threads = [threading.Thread(target=work) for _ in range(min(self.threads, len(jobs)))]
 
-    permission = get_permission(filepath)
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
 
-    lines = util.convert_to_sequence(lines)
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(self.progress_seconds)
+                if progress:
+                    self._call_progress(progress)
 
-    write_string = 'w'
+    def _call_progress(self, progress):
+        progress(self._stats['bytes'] + self._stats['skipped_bytes'], self._total_bytes,
+                 self._stats['files'] + self._stats['skipped'], self._total_files)
 
-    text = '\n'.join(map(str, lines))
+    def _copy(self, job):
+        source, destination, size = job
 
-    if append:
-        write_string = 'a'
-        text = '\n' + text
+        if os.path.dirname(destination) not in self._new_folders and _is_same_file_contents(source, destination, size):
+            with self._lock:
+                self._stats['skipped'] += 1
+                self._stats['skipped_bytes'] += size
+            return
 
-    with open(filepath, write_string) as open_file:
-        open_file.write(text)
+        copied = copy_file_contents(source, destination, size)
 
+        if copied != size:
+            raise IOError('Copied %s of %s bytes of %s' % (copied, size, source))
 
-def write_replace(filepath, stuff_to_write):
-    open_file = open(filepath, 'w')
+        with self._lock:
+            self._stats['files'] += 1
+            self._stats['bytes'] += copied
 
-    try:
-        open_file.write(stuff_to_write)
-    except:
-        util.warning('Could not write: %s' % stuff_to_write)
+    def _save_version(self, job):
+        filepath, comment = job
 
-    open_file.close()
+        VersionFile(filepath).save(comment)
 
-# ---- create
+        with self._lock:
+            self._stats['versions'] += 1
 
+    def run(self, progress=None):
+        """
+        Args:
+            progress (function): Called every progress_seconds from the thread that called run, so a Qt UI can update in it.
+                It gets bytes done, total bytes, files done and total files.
 
-def create_dir(name, directory=None, make_unique=False):
-    """
-    Args:
-        name (str): The name of the new directory.
-        directory (str): TODO: Fill in description.
-        make_unique (bool): Whether to pad the name with a number to make it unique. Only if the name is taken.
-        
-    Returns:
-        str: The folder name with path. False if create_dir failed.
-    """
+        Returns:
+            dict: files and bytes copied, files and bytes skipped because they matched, links, versions saved, errors and seconds.
+        """
 
-    full_path = None
-    if directory is None:
-        full_path = name
+        self._stats = {'files': 0, 'bytes': 0, 'skipped': 0, 'skipped_bytes': 0, 'links': 0, 'versions': 0}
+        self._total_bytes = self.get_size()
+        self._total_files = len(self.copies)
 
-    if not name and directory:
-        full_path = directory
+        start = time.time()
 
-    if name and directory:
-        full_path = join_path(directory, name)
+        # files going into folders made by this run can't be there already.
+        self._new_folders = set()
 
-    if not full_path:
-        util.warning(''.join(traceback.format_stack()[:-1]))
-        util.warning('Could not create directory. No path from name: %s and directory: %s' % (name, directory))
-        return False
+        folders = set(self.folders)
+        for source, destination, size in self.copies:
+            folders.add(os.path.dirname(destination))
+        for link, destination in self.links:
+            folders.add(os.path.dirname(destination))
 
-    if make_unique:
-        full_path = inc_path_name(full_path)
+        for folder in sorted(folders):
+            if not os.path.isdir(folder):
+                try:
+                    os.makedirs(folder)
+                except OSError:
+                    self._add_error(folder)
+                    continue
+                self._new_folders.add(folder)
+                ScanCache.invalidate(folder)
 
-    if is_dir(full_path, case_sensitive=True):
-        return full_path
+        for link, destination in self.links:
+            try:
+                if os.path.lexists(destination):
+                    os.remove(destination)
+                os.symlink(link, destination)
+                self._stats['links'] += 1
+            except OSError:
+                self._add_error(destination)
 
-    try:
-        os.makedirs(full_path)
-    except:
-        util.error(traceback.format_exc())
-        return False
+        self._run_threads(self.copies, self._copy, progress)
+        self._run_threads(self.versions, self._save_version)
 
-    get_permission(full_path)
+        if progress:
+            self._call_progress(progress)
 
-    return full_path
+        self._stats['errors'] = len(self.errors)
+        self._stats['seconds'] = round(time.time() - start, 4)
 
+        return self._stats
 
-def delete_dir(name, directory=None):
+
+def copy_file(filepath, filepath_destination):
     """
-    Delete the folder by name in the directory.
+    Copy the file to a new directory.
     
     Args:
-        name (str): The name of the folder to delete.  Name can also be the full path, with no need to supply directory.
-        directory (str): The directory path where the folder lives.
+        filepath (str): The file to copy with path.
+        filepath_destination (str): The destination directory. 
         
     Returns:
-        str: The folder that was deleted with path.
+        str: The destination directory
     """
 
-    util.clean_file_string(name)
+    get_permission(filepath)
+    # uid = os.getuid()
+    # gid = os.getgid()
+    # os.chown(filepath_destination, uid, gid)
 
-    full_path = name
+    if is_file(filepath):
 
-    if directory:
-        full_path = join_path(directory, name)
+        if is_dir(filepath_destination):
+            filename = get_basename(filepath)
+            filepath_destination = join_path(filepath_destination, filename)
 
-    if not exists(full_path):
-        util.show('%s was not deleted. It does not exist.' % full_path)
+        shutil.copyfile(filepath, filepath_destination)
 
-        return full_path
+    return filepath_destination
 
-    try:
-        shutil.rmtree(full_path, onerror=delete_read_only_error)
-    except:
-        util.warning('Could not remove children of path %s' % full_path)
 
-    return full_path
+def delete_versions(folder, keep=1):
+    version_inst = VersionFile(folder)
 
+    version_list = version_inst.get_version_numbers()
 
-def delete_read_only_error(action, name, exc):
-    """
-    Helper to delete read only files.
-    """
+    if not version_list:
+        return
 
-    get_permission(name)
-    action(name)
+    count = len(version_list)
 
+    if count <= keep:
+        util.warning('Removing no versions.  Asked to keep more versions than there are.')
+        return
 
-def refresh_dir(directory, delete_directory=True):
-    """
-    Delete everything in the directory.
-    """
+    deleted = []
 
-    base_name = get_basename(directory)
-    dir_name = get_dirname(directory)
+    for version in version_list:
 
-    if exists(directory):
-        try:
-            files = get_files_and_folders(directory)
-        except:
-            files = []
-        if files:
-            for filename in files:
-                delete_file(filename, directory)
-        if delete_directory:
-            delete_dir(base_name, dir_name)
-    else:
-        create_dir(base_name, dir_name)
+        version_inst.delete_version(version, update_index=False)
 
+        deleted.append(version)
 
-def create_file(name, directory=None, make_unique=False):
-    """
-    Args:
-        name (str): The name of the new file.
-        directory (str): TODO: Fill in description.
-        make_unique (bool): Whether to pad the name with a number to make it unique. Only if the name is taken.
-        
-    Returns:
-        str: The filename with path. False if create_dir failed.
-    """
+        if count - len(deleted) == keep:
+            break
 
-    if directory is None:
-        directory = get_dirname(name)
-        name = get_basename(name)
+    version_inst._get_index().remove(deleted)
 
-    name = util.clean_file_string(name)
-    full_path = join_path(directory, name)
+    collect_version_garbage(folder)
 
-    if make_unique:
-        full_path = inc_path_name(full_path)
 
-    open_file = None
+def collect_version_garbage(folder):
+    """
+    Remove stored files that no version of folder uses anymore.
 
-    try:
-        open_file = open(full_path, 'a')
-        open_file.close()
-    except:
-        if open_file:
-            open_file.close()
-        # turn on when troubleshooting
-        # util.warning( traceback.format_exc() )
-        return False
+    Returns:
+        tuple: (removed file count, removed bytes)
+    """
 
-    get_permission(full_path)
+    version_inst = VersionFile(folder)
+    version_folder = version_inst._get_version_folder()
 
-    return full_path
+    if not is_dir(version_folder):
+        return 0, 0
 
+    return VersionStore(version_folder).collect_garbage()
 
-def delete_file(name, directory=None, show_warning=True):
+# ---- python
+
+
+class CodeCache(object):
     """
-    Delete the file by name in the directory.
-    
-    Args:
-        name (str): The name of the file to delete.
-        directory (str): The dirpath where the file lives.
-        show_warning (bool): TODO: Fill in description.
-        
-    Returns:
-        str: The filepath that was deleted.
+    Compiled code of sourced scripts, kept in memory and in the temp folder, keyed by path and a hash of the source.
+    An edit changes the hash, so the script is compiled again. Every source still runs in a new module.
     """
 
-    if directory:
-        full_path = join_path(directory, name)
-    else:
-        full_path = name
+    # filepath: (source_hash, code)
+    codes = {}
 
-    try:
-        get_permission(full_path)
-    except:
-        pass
-    try:
-        os.remove(full_path)
-    except:
-        pass
+    # filepath: {'compile': seconds, 'execute': seconds, 'cache': 'memory', 'disk' or 'compiled'}
+    timings = {}
 
-        # util.error( traceback.format_exc() )
-        # util.warning('trouble removing %s' % full_path)
-        # raise
+    folder_name = 'vetala_code_cache'
 
-    return full_path
+    @classmethod
+    def _get_folder(cls):
+        # The temp folder can be shared by every user on the host, each user gets their own cache.
+        return join_path(get_temp_dir(), '%s_%s' % (cls.folder_name, get_user()))
 
+    @classmethod
+    def _is_safe_folder(cls, folder):
+        """
+        Code in the folder is executed, so it has to belong to this user and only they can write to it.
+        Windows gives every user their own temp folder, there it only has to exist.
 
-def copy_with_subprocess(cmd):
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-    msg, err = proc.communicate()
-    # if msg:print msg
+        Returns:
+            bool
+        """
 
-    if err:
-        print(err)
-        return False
+        try:
+            folder_stat = os.lstat(folder)
+        except OSError:
+            return False
 
-    return True
+        if not stat.S_ISDIR(folder_stat.st_mode):
+            return False
 
+        if not hasattr(os, 'getuid'):
+            return True
 
-def fast_copy(directory, directory_destination):
-    win = linux = False
-    if util.is_linux():
-        linux = True
-    elif util.is_windows():
-        win = True
-
-    cmd = None
-    if linux:
-        source_name = get_basename(directory)
-        destination_name = get_basename(directory_destination)
-        if source_name == destination_name:
-            directory_destination = get_dirname(directory_destination)
-        if not os.path.isdir(directory_destination):
-            os.makedirs(directory_destination)
-        # cmd = ['rsync', directory, directory_destination, '-ar']
-        cmd = ['cp', directory, directory_destination, '-r']
-    elif win:
-        cmd = ['robocopy', directory, directory_destination, "/S", "/Z", "/MIR"]
-        cmd[1] = cmd[1].replace('/', '\\')
-        cmd[2] = cmd[2].replace('/', '\\')
-
-    if cmd:
-        result = copy_with_subprocess(cmd)
-        if result:
-            return
-        if linux:
-            cmd = 'cp -r %s %s' % (directory, directory_destination)
-            copy_with_subprocess(cmd)
+        if folder_stat.st_uid != os.getuid():
+            return False
 
+        if folder_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            return False
 
-def copy_dir(directory, directory_destination, ignore_patterns=None):
-    """
-    Copy the directory to a new directory.
-    
-    Args:
-        directory (str): The directory to copy with path.
-        directory_destination (str): The destination directory.
-        ignore_patterns (list): Add txt, py or extensions to ingore them from copying. 
-        E.g. if py is added to the ignore patterns list, all *.py files will be ignored from the copy.
-        
-    Returns:
-        str: The destination directory
-    """
+        return True
 
-    if ignore_patterns is None:
-        ignore_patterns = []
-    if not is_dir(directory):
-        return
+    @classmethod
+    def _get_disk_path(cls, filepath, source_hash):
+        key = hashlib.sha1((filepath + source_hash).encode() + imp.get_magic()).hexdigest()
 
-    if ignore_patterns:
-        shutil.copytree(directory,
-                        directory_destination,
-                        ignore=shutil.ignore_patterns(ignore_patterns))
-    else:
-        fast_copy(directory, directory_destination)
-        # if not exists(directory_destination):
-        #    shutil.copytree(directory,
-        #                    directory_destination)
+        return join_path(cls._get_folder(), key + '.code')
 
-    return directory_destination
+    @classmethod
+    def _load(cls, disk_path):
+        if not cls._is_safe_folder(cls._get_folder()):
+            return
 
+        try:
+            with open(disk_path, 'rb') as open_file:
+                return marshal.load(open_file)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return
 
-def copy_file(filepath, filepath_destination):
-    """
-    Copy the file to a new directory.
-    
-    Args:
-        filepath (str): The file to copy with path.
-        filepath_destination (str): The destination directory. 
-        
-    Returns:
-        str: The destination directory
-    """
+    @classmethod
+    def _save(cls, disk_path, code):
+        folder = cls._get_folder()
 
-    get_permission(filepath)
-    # uid = os.getuid()
-    # gid = os.getgid()
-    # os.chown(filepath_destination, uid, gid)
+        try:
+            if not os.path.lexists(folder):
+                os.makedirs(folder, 0o700)
 
-    if is_file(filepath):
+            if not cls._is_safe_folder(folder):
+                log.info('Code cache folder %s is not private to this user, code is only cached in memory' % folder)
+                return
 
-        if is_dir(filepath_destination):
-            filename = get_basename(filepath)
-            filepath_destination = join_path(filepath_destination, filename)
+            temp_path = '%s.%s.tmp' % (disk_path, os.getpid())
+            with open(temp_path, 'wb') as open_file:
+                marshal.dump(code, open_file)
 
-        shutil.copyfile(filepath, filepath_destination)
+            if os.path.isfile(disk_path):
+                os.remove(disk_path)
+            os.rename(temp_path, disk_path)
+        except (IOError, OSError):
+            log.info('Could not write code cache %s' % disk_path)
 
-    return filepath_destination
+    @classmethod
+    def get_code(cls, filepath):
+        """
+        Args:
+            filepath (str): A python file.
 
+        Returns:
+            tuple: (code, where it came from: memory, disk or compiled)
+        """
 
-def delete_versions(folder, keep=1):
-    version_inst = VersionFile(folder)
+        with open(filepath, 'rb') as open_file:
+            source = open_file.read()
 
-    version_list = version_inst.get_version_numbers()
+        source_hash = hashlib.sha1(source).hexdigest()
 
-    if not version_list:
-        return
+        cached = cls.codes.get(filepath)
+        if cached and cached[0] == source_hash:
+            return cached[1], 'memory'
 
-    count = len(version_list)
+        disk_path = cls._get_disk_path(filepath, source_hash)
 
-    if count <= keep:
-        util.warning('Removing no versions.  Asked to keep more versions than there are.')
-        return
+        code = cls._load(disk_path)
+        cache = 'disk'
 
-    deleted = 0
+        if code is None:
+            code = compile(source, filepath, 'exec', 0, True)
+            cache = 'compiled'
 
-    for version in version_list:
+            if cached:
+                # the previous version of the script won't be used again.
+                old_disk_path = cls._get_disk_path(filepath, cached[0])
+                if os.path.isfile(old_disk_path):
+                    delete_file(old_disk_path)
 
-        version_inst.delete_version(version)
+            cls._save(disk_path, code)
 
-        deleted += 1
+        cls.codes[filepath] = (source_hash, code)
 
-        if count - deleted == keep:
-            break
+        return code, cache
 
-# ---- python
+    @classmethod
+    def set_timing(cls, filepath, name, seconds):
+        cls.timings.setdefault(filepath, {})[name] = seconds
+
+    @classmethod
+    def get_timing(cls, filepath):
+        """
+        Returns:
+            dict: compile and execute seconds of the last source of the file, and which cache the code came from.
+        """
+        return cls.timings.get(filepath, {})
+
+    @classmethod
+    def clear(cls):
+        cls.codes.clear()
+        cls.timings.clear()
+
+        folder = cls._get_folder()
+        if is_dir(folder):
+            delete_dir(folder)
 
 
 def delete_pyc(python_script):
@@ -2779,30 +5650,38 @@ def remove_sourced_code(code_directory):
 
 
 def source_python_module(code_directory):
+    """
+    Run a python file in a new module. The compiled code comes from CodeCache.
+
+    Returns:
+        module: The module, or the traceback as a string if the file failed to compile or run.
+    """
     get_permission(code_directory)
 
     try:
-        try:
-            remove_sourced_code(code_directory)
+        remove_sourced_code(code_directory)
 
-            fin = open(code_directory, 'r')
+        start = time.time()
+        code, cache = CodeCache.get_code(code_directory)
 
-            module_inst = imp.load_source(hashlib.md5(code_directory.encode()).hexdigest(), code_directory, fin)
+        CodeCache.timings[code_directory] = {'compile': time.time() - start, 'cache': cache}
 
-            return module_inst
+        module_name = hashlib.md5(code_directory.encode()).hexdigest()
 
-        except:
-            return traceback.format_exc()
+        module_inst = types.ModuleType(module_name)
+        module_inst.__file__ = code_directory
+        sys.modules[module_name] = module_inst
 
+        start = time.time()
+        try:
+            exec(code, module_inst.__dict__)
         finally:
-            try:
-                fin.close()
-            except:
-                pass
+            CodeCache.set_timing(code_directory, 'execute', time.time() - start)
 
-    except ImportError:
-        traceback.print_exc(file=sys.stderr)
-        return None
+        return module_inst
+
+    except:
+        return traceback.format_exc()
 
 
 def load_python_module(module_name, directory):
@@ -2847,8 +5726,6 @@ def load_python_module(module_name, directory):
 
 
 def run_python_module(script_path):
-    delete_pyc(script_path)
-
     util.reset_code_builtins()
     util.setup_code_builtins()
 
@@ -2971,7 +5848,7 @@ def get_line_imports(lines):
                     if module_prefix:
                         module = '%s.%s' % (module_prefix, module)
 
-                    module_path = get_package_path_from_name(module, return_module_path=True)
+                    module_path = SymbolIndex.get_module_path(module, return_module_path=True)
 
                     module_dict[namespace] = module_path
 
@@ -2988,11 +5865,19 @@ def get_defined(module_path, name_only=False):
     if not file_text:
         return
 
+    ast_tree = ast.parse(file_text, 'string', 'exec')
+
+    return get_ast_defined(ast_tree, name_only)
+
+
+def get_ast_defined(ast_tree, name_only=False):
+    """
+    Get classes and definitions from a parsed module.
+    """
+
     functions = []
     classes = []
 
-    ast_tree = ast.parse(file_text, 'string', 'exec')
-
     for node in ast_tree.body:
 
         # if node:
@@ -3038,11 +5923,15 @@ def get_defined_classes(module_path):
     if not file_text:
         return None, None
 
+    ast_tree = ast.parse(file_text)
+
+    return get_ast_defined_classes(ast_tree)
+
+
+def get_ast_defined_classes(ast_tree):
     defined = []
     defined_dict = {}
 
-    ast_tree = ast.parse(file_text)
-
     for node in ast_tree.body:
         if isinstance(node, ast.ClassDef):
             defined.append(node.name)
@@ -3075,12 +5964,11 @@ def get_ast_function_args(function_node):
     if not function_node.args:
         return found_args
 
-    defaults = function_node.args.defaults
+    # reversed copies, the node can be read again.
+    defaults = list(reversed(function_node.args.defaults))
 
-    args = function_node.args.args
+    args = list(reversed(function_node.args.args))
 
-    args.reverse()
-    defaults.reverse()
     for inc, arg in enumerate(args):
 
         if util.python_version < 3:
@@ -3139,7 +6027,19 @@ def get_ast_class_sub_functions(module_path, class_name):
     if not defined:
         return None, None
 
-    if class_name in defined:
+    return get_ast_class_node_sub_functions(defined_dict, class_name)
+
+
+def get_ast_class_node_sub_functions(defined_dict, class_name):
+    """
+    Args:
+        defined_dict (dict): class name: class node, from get_ast_defined_classes
+
+    Returns:
+        tuple: (functions, variables) of the class and its parents in the module, or None if the class isn't in defined_dict.
+    """
+
+    if class_name in defined_dict:
         class_node = defined_dict[class_name]
 
         parents = []
@@ -3318,6 +6218,339 @@ def get_ast_assignment(text, line_number, assignment):
 
     return line_assign_dict
 
+
+class SymbolIndex(object):
+    """
+    Classes, functions and their signatures of python modules, for PythonCompleter.
+    Modules are parsed on a worker thread and kept until their mtime or size changes,
+    so a completion looks them up instead of parsing them.
+
+    A module saved within ScanCache.racy_seconds of when it was parsed could change again without a new mtime.
+    Until its mtime is old enough, a lookup hashes its text and compares it to the hash of the parsed text.
+    """
+
+    # filepath: {'mtime', 'size', 'hash', 'trusted', 'defined', 'classes', 'seconds'}
+    modules = {}
+
+    # (module_name, return_module_path): (time found, path)
+    module_paths = {}
+
+    # Seconds a module path found from its name is trusted.
+    module_path_seconds = 5.0
+
+    # Seconds a lookup waits for the worker to parse a module that isn't indexed yet.
+    wait_seconds = 0.05
+
+    hits = 0
+    misses = 0
+
+    _queue = None
+    _thread = None
+    _events = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_key(cls, filepath):
+        return os.path.abspath(filepath)
+
+    @classmethod
+    def _start(cls):
+
+        if cls._thread and cls._thread.is_alive():
+            return
+
+        cls._queue = queue.Queue()
+
+        cls._thread = threading.Thread(target=cls._work, name='vetala_symbol_index')
+        cls._thread.daemon = True
+        cls._thread.start()
+
+    @classmethod
+    def _work(cls):
+
+        while True:
+            kind, key = cls._queue.get()
+
+            try:
+                if kind == 'imports':
+                    cls.request(list(get_line_imports(get_file_lines(key)).values()))
+                else:
+                    cls.parse(key)
+            except Exception:
+                log.debug(traceback.format_exc())
+            finally:
+                with cls._lock:
+                    event = cls._events.pop((kind, key), None)
+
+                if event:
+                    event.set()
+
+    @classmethod
+    def _put(cls, kind, key):
+
+        with cls._lock:
+            event = cls._events.get((kind, key))
+
+            if event:
+                return event
+
+            event = threading.Event()
+            cls._events[(kind, key)] = event
+
+        cls._start()
+        cls._queue.put((kind, key))
+
+        return event
+
+    @classmethod
+    def _get_current(cls, key, file_stat=None):
+
+        entry = cls.modules.get(key)
+
+        if not entry:
+            return
+
+        if file_stat is None:
+            try:
+                file_stat = os.stat(key)
+            except OSError:
+                return
+
+        if entry['mtime'] != file_stat.st_mtime or entry['size'] != file_stat.st_size:
+            return
+
+        if entry['trusted']:
+            return entry
+
+        try:
+            text_hash = cls._get_hash(key)
+        except (IOError, OSError):
+            return
+
+        if text_hash != entry['hash']:
+            return
+
+        entry['trusted'] = cls._is_trusted(file_stat)
+
+        return entry
+
+    @classmethod
+    def _get_hash(cls, key):
+        with open(key, 'rb') as open_file:
+            return hashlib.sha1(open_file.read()).hexdigest()
+
+    @classmethod
+    def _is_trusted(cls, file_stat):
+        return time.time() - file_stat.st_mtime > ScanCache.racy_seconds
+
+    @classmethod
+    def _get_entry(cls, filepath, wait=None):
+
+        if not filepath:
+            return
+
+        key = cls._get_key(filepath)
+
+        entry = cls._get_current(key)
+
+        if entry:
+            cls.hits += 1
+            return entry
+
+        if not os.path.isfile(key):
+            return
+
+        cls.misses += 1
+
+        if wait is None:
+            wait = cls.wait_seconds
+
+        event = cls._put('module', key)
+
+        if wait:
+            event.wait(wait)
+
+        return cls._get_current(key)
+
+    @classmethod
+    def parse(cls, filepath):
+        """
+        Parse a module now, on the calling thread, unless it is already indexed and hasn't changed.
+
+        Returns:
+            dict: The index entry of the module. defined is None if the module couldn't be parsed.
+        """
+
+        key = cls._get_key(filepath)
+
+        try:
+            file_stat = os.stat(key)
+        except OSError:
+            cls.modules.pop(key, None)
+            return
+
+        entry = cls._get_current(key, file_stat)
+
+        if entry:
+            return entry
+
+        start = time.time()
+
+        defined = None
+        classes = {}
+
+        try:
+            with open(key, 'rb') as open_file:
+                source = open_file.read()
+        except (IOError, OSError):
+            cls.modules.pop(key, None)
+            return
+
+        try:
+            ast_tree = ast.parse(source, key, 'exec')
+        except (SyntaxError, ValueError, TypeError):
+            ast_tree = None
+
+        if ast_tree:
+            defined = get_ast_defined(ast_tree)
+
+            class_names, defined_dict = get_ast_defined_classes(ast_tree)
+
+            for class_name in class_names:
+                try:
+                    classes[class_name] = get_ast_class_node_sub_functions(defined_dict, class_name)
+                except Exception:
+                    # class bodies with assignments the ast helpers can't read yet.
+                    classes[class_name] = None
+
+        entry = {'mtime': file_stat.st_mtime,
+                 'size': file_stat.st_size,
+                 'hash': hashlib.sha1(source).hexdigest(),
+                 'trusted': cls._is_trusted(file_stat),
+                 'defined': defined,
+                 'classes': classes,
+                 'seconds': time.time() - start}
+
+        cls.modules[key] = entry
+
+        log.debug('Indexed %s in %.3f seconds' % (key, entry['seconds']))
+
+        return entry
+
+    @classmethod
+    def request(cls, filepaths):
+        """
+        Queue modules to be parsed on the worker thread, if they aren't indexed or changed.
+        """
+
+        for filepath in util.convert_to_sequence(filepaths):
+            if not filepath:
+                continue
+
+            key = cls._get_key(filepath)
+
+            if os.path.isfile(key) and not cls._get_current(key):
+                cls._put('module', key)
+
+    @classmethod
+    def request_imports(cls, filepath):
+        """
+        Queue the modules imported by filepath, found and parsed on the worker thread.
+        """
+
+        if filepath and os.path.isfile(filepath):
+            cls._put('imports', cls._get_key(filepath))
+
+    @classmethod
+    def get_defined(cls, filepath, wait=None):
+        """
+        Same as get_defined, from the index.
+
+        Args:
+            wait (float): Seconds to wait if the module isn't indexed yet. Defaults to wait_seconds.
+
+        Returns:
+            list: Classes then functions with their arguments. None if the module isn't indexed yet or didn't parse.
+        """
+
+        entry = cls._get_entry(filepath, wait)
+
+        if entry and entry['defined'] is not None:
+            return list(entry['defined'])
+
+    @classmethod
+    def get_class_members(cls, filepath, class_name, wait=None):
+        """
+        Same as get_ast_class_sub_functions, from the index.
+
+        Returns:
+            tuple: (functions, variables), or None if the class isn't found or the module isn't indexed yet.
+        """
+
+        entry = cls._get_entry(filepath, wait)
+
+        if not entry:
+            return
+
+        members = entry['classes'].get(class_name)
+
+        if not members:
+            return
+
+        functions, variables = members
+
+        return list(functions or []), list(variables or [])
+
+    @classmethod
+    def get_module_path(cls, module_name, return_module_path=False):
+        """
+        get_package_path_from_name, remembered for module_path_seconds.
+        """
+
+        key = (module_name, return_module_path)
+
+        found = cls.module_paths.get(key)
+
+        if found and time.time() - found[0] < cls.module_path_seconds:
+            return found[1]
+
+        path = get_package_path_from_name(module_name, return_module_path)
+
+        cls.module_paths[key] = (time.time(), path)
+
+        return path
+
+    @classmethod
+    def get_parse_seconds(cls, filepath):
+        """
+        Returns:
+            float: How long the module took to parse the last time it was indexed, or None if it isn't indexed.
+        """
+
+        entry = cls.modules.get(cls._get_key(filepath))
+
+        if entry:
+            return entry['seconds']
+
+    @classmethod
+    def clear(cls):
+        cls.modules.clear()
+        cls.module_paths.clear()
+        cls.hits = 0
+        cls.misses = 0
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Returns:
+            dict: hits, misses, the number of indexed modules and the seconds spent parsing them.
+        """
+
+        return {'hits': cls.hits,
+                'misses': cls.misses,
+                'modules': len(cls.modules),
+                'parse_seconds': sum([entry['seconds'] for entry in list(cls.modules.values())])}
+
 # --- applications
 
 
@@ -0,0 +1,35 @@
+# Copyright (C) 2022 Louis Vottero louis.vot@gmail.com    All rights reserved.
+
+"""
+Weight file decoding for the worker processes of data.WeightFileDecoder.
+Workers import this module on its own, so it only uses the standard library. vtool.data imports maya_lib,
+which can't be imported in a mayapy worker that hasn't initialized maya.standalone.
+"""
+
+from __future__ import absolute_import
+
+import json
+import time
+
+
+def decode_weight_file(file_path):
+    """
+    Decode one .weights file.
+
+    Returns:
+        tuple: (file_path, weights, seconds)
+    """
+    start = time.time()
+
+    weights = None
+
+    try:
+        with open(file_path, 'r') as open_file:
+            line = open_file.readline()
+    except (IOError, OSError):
+        line = None
+
+    if line and line.strip():
+        weights = json.loads(line)
+
+    return file_path, weights, time.time() - start